@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark AddressSpace on large images with many ORG regions.
+
+Emits --words words spread over --regions ORG'd regions, retracting a word
+after every --undo-every words (as macro definitions do), and compares the
+occupancy-map AddressSpace with the previous list-of-ranges version.
+
+Usage: python benchmarks/bench_address_space.py [--words N] [--regions N]
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.assembler.address_space import AddressSpace
+
+
+class ListAddressSpace:
+    """The previous implementation: one range per advance, linear collision scan."""
+
+    def __init__(self):
+        self.current_word_addr = 0
+        self.used_ranges: List[Tuple[int, int]] = []
+        self.current_section = ".code"
+
+    def set_org(self, address):
+        if address < self.current_word_addr and self.current_section == ".code":
+            raise ValueError("backward")
+        if self._check_collision(address):
+            raise ValueError("collision")
+        self.current_word_addr = address
+
+    def advance(self, size=1):
+        prev_addr = self.current_word_addr
+        self.current_word_addr += size
+        self.used_ranges.append((prev_addr, prev_addr + size))
+        return prev_addr
+
+    def undo_advance(self, size=1):
+        for _ in range(size):
+            start, end = self.used_ranges.pop()
+            self.current_word_addr = start
+
+    def _check_collision(self, address):
+        for start, end in self.used_ranges:
+            if start <= address < end:
+                return True
+        return False
+
+
+def fill(space_class, words, regions, undo_every):
+    """Emit the image and return the address space."""
+    per_region = words // regions
+    stride = 0x10000 // regions
+    space = space_class()
+    for region in range(regions):
+        space.set_org(region * stride)
+        for i in range(per_region):
+            space.advance()
+            if undo_every and i % undo_every == undo_every - 1:
+                space.undo_advance()
+                space.advance()
+    return space
+
+
+def measure(space_class, words, regions, undo_every):
+    """Return (seconds, peak bytes) of filling an image."""
+    start = time.perf_counter()
+    fill(space_class, words, regions, undo_every)
+    elapsed = time.perf_counter() - start
+
+    # Memory is measured in a separate run so tracing doesn't skew the timing
+    tracemalloc.start()
+    fill(space_class, words, regions, undo_every)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", "-w", type=int, default=32768,
+                        help="Words to emit")
+    parser.add_argument("--regions", "-r", type=int, default=1024,
+                        help="Number of ORG regions")
+    parser.add_argument("--undo-every", "-u", type=int, default=8,
+                        help="Retract one word after this many (0 = never)")
+    args = parser.parse_args()
+
+    print(f"{args.words} words in {args.regions} ORG regions")
+    results = {}
+    for name, space_class in [("list of ranges", ListAddressSpace),
+                              ("occupancy map", AddressSpace)]:
+        elapsed, peak = measure(space_class, args.words, args.regions, args.undo_every)
+        results[name] = elapsed
+        print(f"{name:15s} {elapsed * 1e3:10.1f} ms   peak {peak / 1024:8.1f} KiB")
+    print(f"speed-up: {results['list of ranges'] / results['occupancy map']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
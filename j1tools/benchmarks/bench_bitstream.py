@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark putting a program into the prebuilt bitstream (j1patch).
+
+Times each step of a patch of ../bitstream/j1_base.bit: reading the
+bitstream and its .mmi, extracting the built-in image, patching in a
+firmware image with the incrementally updated CRC and writing the result,
+next to recomputing the CRC over the whole bitstream.
+
+Usage: python benchmarks/bench_bitstream.py [--image HEX] [--repeat N]
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.bitstream import Bitstream, BramMap, read_mmi
+from j1tools.memory.convert import read_image
+
+REPO = Path(__file__).resolve().parent.parent.parent
+BIT = REPO / "bitstream" / "j1_base.bit"
+MMI = REPO / "bitstream" / "j1_base.mmi"
+
+
+def best(function, repeat):
+    """Fastest of repeat runs of function, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", type=Path, default=REPO / "firmware" / "blinky" / "blinky.hex")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    image = read_image(args.image)
+    out = Path(tempfile.mkdtemp()) / "patched.bit"
+
+    def patch():
+        bram = BramMap(read_mmi(MMI), Bitstream.read(BIT))
+        bram.patch(image)
+        bram.bitstream.write(out)
+        return bram
+
+    bitstream = Bitstream.read(BIT)
+    rows = [
+        ("read .bit", lambda: Bitstream.read(BIT)),
+        ("read .mmi", lambda: read_mmi(MMI)),
+        ("extract", lambda: BramMap(read_mmi(MMI), Bitstream.read(BIT)).extract()),
+        ("read, patch, write", patch),
+        ("full CRC recompute", bitstream.compute_crc),
+    ]
+    print(f"{'STEP':<20} {'MS':>8}")
+    for name, function in rows:
+        print(f"{name:<20} {best(function, args.repeat):8.1f}")
+    out.unlink()
+    out.parent.rmdir()
+
+
+if __name__ == "__main__":
+    main()
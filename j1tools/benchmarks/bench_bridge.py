@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the emulator's UART bridge.
+
+Runs terminal_io echo firmware (key emit) behind a local TCP bridge and
+measures, from an asyncio client in the same process, the round-trip
+latency of single bytes and the throughput of --size byte transfers.
+
+Usage: python benchmarks/bench_bridge.py [--bytes N] [--size N] [--slice N] [--blocks]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import BlockJ1, J1
+from j1tools.sim.bridge import UartBridge
+from j1tools.sim.devices import Board
+
+SOURCE = """
+ORG $0000
+JMP 'start
+
+include "core/j1_base_macros.asm"
+include "io/terminal_io.asm"
+
+: start
+    key emit
+    JMP 'start
+"""
+
+
+def build():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(SOURCE, "bench_bridge.asm"))
+    return assembler.memory_image()
+
+
+async def measure(args):
+    board = Board(build(), engine=BlockJ1 if args.blocks else J1)
+    bridge = UartBridge(board, slice_cycles=args.slice)
+    server = await bridge.serve_tcp()
+    port = server.sockets[0].getsockname()[1]
+    running = asyncio.ensure_future(bridge.run())
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    latencies = []
+    for n in range(args.bytes):
+        start = time.perf_counter()
+        writer.write(bytes([n & 0xFF]))
+        await reader.readexactly(1)
+        latencies.append(time.perf_counter() - start)
+
+    payload = bytes(range(256)) * (args.size // 256)
+    start = time.perf_counter()
+    writer.write(payload)
+    await reader.readexactly(len(payload))
+    elapsed = time.perf_counter() - start
+    cycles = board.cpu.cycles
+
+    writer.close()
+    bridge.stop()
+    await running
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    print(f"round trip    median {statistics.median(latencies) * 1e6:8.0f} us"
+          f"   p99 {latencies[int(len(latencies) * 0.99)] * 1e6:8.0f} us")
+    print(f"throughput    {len(payload) / elapsed / 1e3:8.1f} kB/s"
+          f"   ({len(payload) * 10 / elapsed / 115200:.1f}x 115200 baud)")
+    print(f"emulated      {cycles / 1e6:8.1f} M cycles")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--bytes", type=int, default=200, help="Single-byte round trips")
+    parser.add_argument("--size", type=int, default=16384, help="Bytes in the bulk transfer")
+    parser.add_argument("--slice", type=int, default=2000, help="Cycles per emulator slice")
+    parser.add_argument("--blocks", action="store_true", help="Use the basic-block emulator")
+    args = parser.parse_args()
+    asyncio.run(measure(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory-format conversion on multi-megaword images.
+
+Writes a random --words word image of each --width as hex and MIF, then
+times hex->coe, hex->mif and mif->mem with the previous per-line
+converters (list of lines, character-by-character validation, one print()
+per word) and with the streaming converter.
+
+Usage: python benchmarks/bench_convert.py [--words N] [--width 16,32,64]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.memory.convert import convert
+
+
+def legacy_hex_to_coe(hex_file):
+    with open(hex_file, "r") as f:
+        hex_data = [line.split("//")[0].strip() for line in f]
+        hex_data = [line for line in hex_data if line]
+    valid_chars = set("0123456789abcdefABCDEF")
+    for hex_str in hex_data:
+        if not all(c in valid_chars for c in hex_str):
+            raise ValueError(f"Invalid hexadecimal value: {hex_str}")
+        int(hex_str, 16)
+    print("memory_initialization_radix=16;")
+    print("memory_initialization_vector=")
+    for value in hex_data[:-1]:
+        print(f"{value},")
+    print(f"{hex_data[-1]};")
+
+
+def legacy_hex_to_mif(hex_file, width):
+    with open(hex_file, "r") as f:
+        hex_data = [line.split("//")[0].strip() for line in f]
+        hex_data = [line for line in hex_data if line]
+    for value in hex_data:
+        print(format(int(value, 16), f"0{width}b"))
+
+
+def legacy_mif_to_mem(mif_file, width):
+    with open(mif_file, "r") as f:
+        binary_data = [line.strip() for line in f if line.strip()]
+    for addr, binary in enumerate(binary_data):
+        print(f"@{addr:04X} {int(binary, 2):0{width // 4}X}")
+
+
+def timed(func, output):
+    start = time.perf_counter()
+    with open(output, "w") as f, contextlib.redirect_stdout(f):
+        func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", "-w", type=int, default=1 << 21,
+                        help="Words per image")
+    parser.add_argument("--width", default="16,32,64",
+                        help="Comma-separated word widths")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for width in map(int, args.width.split(",")):
+            words = [rng.getrandbits(width) for _ in range(args.words)]
+            hex_file = tmp / "image.hex"
+            mif_file = tmp / "image.mif"
+            hex_file.write_text("".join(f"{w:0{width // 4}x}\n" for w in words))
+            mif_file.write_text("".join(f"{w:0{width}b}\n" for w in words))
+            size = hex_file.stat().st_size / 2**20
+            print(f"{args.words} x {width}-bit words ({size:.1f} MiB hex)")
+
+            cases = [
+                ("hex->coe", hex_file, "coe", lambda: legacy_hex_to_coe(hex_file)),
+                ("hex->mif", hex_file, "mif", lambda: legacy_hex_to_mif(hex_file, width)),
+                ("mif->mem", mif_file, "mem", lambda: legacy_mif_to_mem(mif_file, width)),
+            ]
+            for name, source, fmt, legacy in cases:
+                old_out, new_out = tmp / f"old.{fmt}", tmp / f"new.{fmt}"
+                old = timed(legacy, old_out)
+                start = time.perf_counter()
+                convert(source, new_out, fmt)
+                new = time.perf_counter() - start
+                same = "identical" if old_out.read_bytes() == new_out.read_bytes() else "DIFFERENT"
+                print(f"  {name}  per-line {old:7.2f} s   streaming {new:7.2f} s"
+                      f"   {old / new:5.1f}x  ({same})")
+            os.remove(hex_file)
+            os.remove(mif_file)
+
+
+if __name__ == "__main__":
+    main()
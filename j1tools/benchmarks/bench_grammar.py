@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark J1Assembler construction with and without the shared parser cache.
+
+Usage: python benchmarks/bench_grammar.py [--count N]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lark import Lark
+from j1tools.assembler.asm import J1Assembler
+from j1tools.assembler.grammar import GRAMMAR_PATH, clear_parser_cache, get_parser
+
+
+def time_per_call(func, count):
+    """Return average seconds per call of func over count calls."""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", "-c", type=int, default=200,
+                        help="Number of assembler instances to construct")
+    args = parser.parse_args()
+
+    # Old behaviour: every instance compiled the grammar itself
+    compile_time = time_per_call(
+        lambda: Lark.open(GRAMMAR_PATH, start="start"), max(1, args.count // 20)
+    )
+
+    # First instance in a fresh process pays the compile once
+    clear_parser_cache()
+    start = time.perf_counter()
+    J1Assembler()
+    first_time = time.perf_counter() - start
+
+    # Every later instance reuses the shared parser
+    warm_time = time_per_call(J1Assembler, args.count)
+
+    # LALR tables are also persisted on disk; time a load from that cache
+    get_parser("lalr")
+    clear_parser_cache()
+    start = time.perf_counter()
+    get_parser("lalr")
+    disk_time = time.perf_counter() - start
+
+    print(f"grammar compile (per instance, uncached): {compile_time * 1e3:9.3f} ms")
+    print(f"first J1Assembler() in process:           {first_time * 1e3:9.3f} ms")
+    print(f"J1Assembler() with shared parser:         {warm_time * 1e6:9.3f} us")
+    print(f"LALR parser load from disk cache:         {disk_time * 1e3:9.3f} ms")
+    print(f"speed-up per instance:                    {compile_time / warm_time:9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
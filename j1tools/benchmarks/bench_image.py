@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark building and writing the memory image of a sparse program.
+
+Assembles a program of --regions ORG'd regions of --words words each, then
+compares the previous sorted-dict walk with zero-by-zero gap fill against
+the array-backed MemoryImage, for both get_bytecodes() and writing the
+.hex output.
+
+Usage: python benchmarks/bench_image.py [--regions N] [--words N]
+"""
+
+import io
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.assembler.asm import J1Assembler, WORD_TYPES
+
+
+def synthetic_source(regions, words):
+    """Return `regions` blocks of `words` words spread over the address space."""
+    stride = 0x2000 // regions
+    out = []
+    for region in range(regions):
+        out.append(f"ORG ${region * stride:04X}")
+        out.extend(["T N"] * (words // 2))
+    return "\n".join(out) + "\n"
+
+
+def walk_bytecodes(assembler):
+    """The previous get_bytecodes(): sorted walk with zero-by-zero gap fill."""
+    bytecodes = []
+    prev_word_addr = 0
+    for word_addr in sorted(assembler.instruction_metadata.keys()):
+        inst = assembler.instruction_metadata[word_addr]
+        while prev_word_addr < word_addr:
+            bytecodes.append(0x0000)
+            prev_word_addr += 1
+        if inst.type in WORD_TYPES:
+            bytecodes.append(inst.value)
+            prev_word_addr = word_addr + 1
+    return bytecodes
+
+
+def walk_output(assembler):
+    f = io.StringIO()
+    for code in walk_bytecodes(assembler):
+        print(f"{code:04x}", file=f)
+    return f.getvalue()
+
+
+def image_bytecodes(assembler):
+    assembler._memory_image = None
+    return assembler.get_bytecodes()
+
+
+def image_output(assembler):
+    assembler._memory_image = None
+    f = io.StringIO()
+    assembler.memory_image().write("hex", f)
+    return f.getvalue()
+
+
+def best_of(func, assembler, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(assembler)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--regions", "-r", type=int, default=16,
+                        help="Number of ORG regions")
+    parser.add_argument("--words", "-w", type=int, default=64,
+                        help="Words per region")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Repetitions (best time is reported)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(synthetic_source(args.regions, args.words),
+                                        "synthetic.asm"))
+    print(f"{len(assembler.instruction_metadata)} words in {args.regions} regions, "
+          f"image size {len(assembler.memory_image())} words")
+
+    for name, old, new in [("get_bytecodes", walk_bytecodes, image_bytecodes),
+                           ("hex output", walk_output, image_output)]:
+        old_time, old_result = best_of(old, assembler, args.repeat)
+        new_time, new_result = best_of(new, assembler, args.repeat)
+        assert old_result == new_result
+        print(f"{name:14s} walk {old_time * 1e3:8.2f} ms   image {new_time * 1e3:8.2f} ms"
+              f"   speed-up {old_time / new_time:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark assembling programs with a cold and a warm include cache.
+
+Every firmware program (and test program) that pulls in the standard
+library is assembled with the include cache disabled, then again with a
+cache that was filled by a first run, and the per-build times compared.
+
+Usage: python benchmarks/bench_includes.py [--count N]
+"""
+
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from j1tools.assembler.asm import J1Assembler
+from j1tools.assembler.include_cache import IncludeCache
+
+CORPUS_DIRS = [ROOT.parent / "firmware", ROOT / "tests" / "test_files"]
+
+
+def corpus_files():
+    """Return programs with a reference .hex file that include something."""
+    files = []
+    for base in CORPUS_DIRS:
+        for asm in sorted(base.glob("**/*.asm")):
+            if asm.with_suffix(".hex").exists() and "include" in asm.read_text():
+                files.append(asm)
+    return files
+
+
+def assemble(path, source, cache):
+    assembler = J1Assembler(include_cache=cache)
+    assembler.transform(assembler.parse(source, str(path)))
+    return assembler.get_bytecodes()
+
+
+def time_builds(files, cache, count):
+    """Return average seconds per build of every file, and the outputs."""
+    sources = [(path, path.read_text()) for path in files]
+    outputs = []
+    start = time.perf_counter()
+    for _ in range(count):
+        outputs = [assemble(path, source, cache) for path, source in sources]
+    return (time.perf_counter() - start) / (count * len(sources)), outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", "-c", type=int, default=20,
+                        help="Number of times to assemble the corpus")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    files = corpus_files()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm up the shared parser so only include handling is compared
+        time_builds(files, IncludeCache(enabled=False), 1)
+
+        cold_time, cold_out = time_builds(files, IncludeCache(enabled=False), args.count)
+
+        cache = IncludeCache(directory=Path(tmp))
+        time_builds(files, cache, 1)
+        warm_time, warm_out = time_builds(files, cache, args.count)
+
+    assert cold_out == warm_out, "cached builds differ from uncached builds"
+
+    print(f"programs with includes:        {len(files):9d}")
+    print(f"build, include cache disabled: {cold_time * 1e3:9.3f} ms")
+    print(f"build, warm include cache:     {warm_time * 1e3:9.3f} ms")
+    print(f"speed-up:                      {cold_time / warm_time:9.1f}x")
+    print(f"cache hits / misses:           {cache.hits} / {cache.misses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark parse time and peak memory of the LALR and Earley parsers.
+
+Runs every .asm program in the firmware and test corpus, then a synthetic
+source of --lines lines, through J1Assembler with each parser and reports
+wall time and tracemalloc peak memory.
+
+Usage: python benchmarks/bench_parser.py [--lines N] [--earley-lines N]
+"""
+
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from j1tools.assembler.asm import J1Assembler
+
+CORPUS_DIRS = [ROOT / "tests" / "test_files", ROOT.parent / "firmware"]
+
+SYNTHETIC_BODY = [
+    "    #$2A #10 +        // literal and macro call",
+    "    dup swap over drop",
+    "    T+N[T->N,d-1]",
+    "    io[T][IORD] drop",
+    "    CALL 'helper",
+]
+
+
+def corpus_files():
+    """Return every assembly program that has a reference .hex file."""
+    files = []
+    for base in CORPUS_DIRS:
+        for asm in sorted(base.glob("**/*.asm")):
+            if asm.with_suffix(".hex").exists():
+                files.append(asm)
+    return files
+
+
+def synthetic_source(lines):
+    """Return a synthetic program of roughly the given number of lines."""
+    out = ['include "core/j1_base_macros.asm"', ": helper", "    T[RET,r-1]"]
+    label = 0
+    while len(out) < lines:
+        if len(out) % 50 == 0:
+            out.append(f": block_{label}")
+            label += 1
+        out.append(SYNTHETIC_BODY[len(out) % len(SYNTHETIC_BODY)])
+    return "\n".join(out) + "\n"
+
+
+def assemble(parser, source, filename):
+    assembler = J1Assembler(parser=parser)
+    assembler.transform(assembler.parse(source, filename))
+    return assembler
+
+
+def measure(parser, sources):
+    """Return (seconds, peak bytes) to assemble all (source, filename) pairs."""
+    # Warm the shared parser so grammar compilation is not measured
+    assemble(parser, "T", "<warmup>")
+
+    start = time.perf_counter()
+    for source, filename in sources:
+        assemble(parser, source, filename)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for source, filename in sources:
+        assemble(parser, source, filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def report(name, parser, lines, elapsed, peak):
+    print(f"{name:<22} {parser:<7} {lines:>8} lines {elapsed * 1e3:10.1f} ms "
+          f"{lines / elapsed:10.0f} lines/s  peak {peak / 1024:10.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", "-l", type=int, default=100000,
+                        help="Size of the synthetic source for LALR")
+    parser.add_argument("--earley-lines", type=int, default=2000,
+                        help="Size of the synthetic source for Earley (it is much slower)")
+    args = parser.parse_args()
+
+    # The corpus deliberately contains programs that warn (warn_ijk)
+    logging.disable(logging.WARNING)
+
+    corpus = [(f.read_text(), str(f)) for f in corpus_files()]
+    corpus_lines = sum(src.count("\n") for src, _ in corpus)
+
+    for parser_type in ("lalr", "earley"):
+        elapsed, peak = measure(parser_type, corpus)
+        report(f"corpus ({len(corpus)} files)", parser_type, corpus_lines, elapsed, peak)
+
+    for parser_type, lines in (("lalr", args.lines), ("earley", args.earley_lines)):
+        source = synthetic_source(lines)
+        elapsed, peak = measure(parser_type, [(source, "<synthetic>")])
+        report("synthetic", parser_type, lines, elapsed, peak)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the peephole optimizer (j1asm -O) on the firmware corpus.
+
+Assembles each firmware/*/*.asm with and without -O and reports, per
+program, the words saved and the cycles saved in a --cycles run of the
+unoptimized image on the emulated board (each rewrite saves its cycles
+every time its first word executes, counted with ProfilingJ1).  Programs
+that don't assemble are skipped.  The
+optimized image is run for as long and must send at least the same UART
+output, then the per-rule hits over the whole corpus are listed.
+
+Usage: python benchmarks/bench_peephole.py [--cycles N] [--send TEXT] [--rules FILE]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.assembler.asm import J1Assembler
+from j1tools.assembler.peephole import DEFAULT_RULES, format_stats, load_rules, optimize
+from j1tools.sim.devices import Board
+from j1tools.sim.profile import ProfilingJ1
+
+FIRMWARE = Path(__file__).resolve().parent.parent.parent / "firmware"
+
+
+def build(path: Path) -> J1Assembler:
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(path.read_text(), str(path)))
+    return assembler
+
+
+def run(image, cycles: int, send: bytes, engine=ProfilingJ1) -> Board:
+    board = Board(image, engine=engine)
+    board.uart.receive(send)
+    board.run(cycles)
+    return board
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--cycles", type=int, default=200_000)
+    parser.add_argument("--send", default="hello\r")
+    parser.add_argument("--rules", type=Path, default=DEFAULT_RULES)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rules = load_rules(args.rules)
+    print(f"{len(rules)} rules loaded in {(time.perf_counter() - start) * 1e3:.1f} ms\n")
+
+    send = args.send.encode()
+    every = []
+    print(f"{'PROGRAM':<16} {'WORDS':>6} {'-O':>6} {'SAVED':>6} {'CYCLES SAVED':>13}  OUTPUT")
+    for path in sorted(FIRMWARE.glob("*/*.asm")):
+        try:
+            plain = build(path)
+        except Exception as e:
+            print(f"{path.stem:<16} does not assemble: {str(e).splitlines()[0]}")
+            continue
+        before = run(plain.memory_image(), args.cycles, send)
+        optimized = build(path)
+        start = time.perf_counter()
+        rewrites = optimize(optimized, rules)
+        elapsed = (time.perf_counter() - start) * 1e3
+        after = run(optimized.memory_image(), args.cycles, send)
+        every += rewrites
+        cycles = sum(before.cpu.hits[rewrite.word_addr] * rewrite.cycles for rewrite in rewrites)
+        expected = before.uart.take_tx()
+        same = "same" if after.uart.take_tx().startswith(expected) else "DIFFERS"
+        words = len(plain.memory_image())
+        print(
+            f"{path.stem:<16} {words:>6} {len(optimized.memory_image()):>6} "
+            f"{sum(rewrite.words for rewrite in rewrites):>6} "
+            f"{cycles:>7} ({cycles / args.cycles:>4.1%})  {same}  [{elapsed:.1f} ms]"
+        )
+
+    print()
+    print(format_stats(every), end="")
+
+
+if __name__ == "__main__":
+    main()
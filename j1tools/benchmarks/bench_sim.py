@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the J1 emulator's instruction rate.
+
+Runs a loop of calls, literals, ALU operations and DO/LOOP return-stack
+traffic for --steps instructions on the dispatch-table, basic-block and
+profiling emulators, and a slice of it on the bit-level reference model for
+comparison.
+
+Usage: python benchmarks/bench_sim.py [--steps N] [--repeat N]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import BlockJ1, J1, reference_step
+from j1tools.sim.profile import ProfilingJ1
+
+SOURCE = """
+ORG $0000
+JMP 'start
+
+include "core/j1_base_macros.asm"
+
+: inc ( n -- n+1 )
+    #1 + ;
+
+: start
+    #0
+    #1000 #0 DO
+        inc dup #$FF and drop
+        over over xor drop
+    LOOP
+    drop
+    JMP 'start
+"""
+
+
+def build():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(SOURCE, "bench_sim.asm"))
+    return assembler.memory_image()
+
+
+def best_rate(run, steps, repeat):
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(steps)
+        best = max(best, steps / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--steps", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    image = build()
+    cpu = J1(image)
+    cpu.run(10_000)  # compile the ALU handlers the loop uses
+    fast = best_rate(cpu.run, args.steps, args.repeat)
+
+    blocks = BlockJ1(image)
+    blocks.run(10_000)  # translate the loop
+    block = best_rate(blocks.run, args.steps, args.repeat)
+
+    profiling = ProfilingJ1(image)
+    profiling.run(10_000)
+    profiled = best_rate(profiling.run, args.steps, args.repeat)
+
+    reference = J1(image)
+
+    def run_reference(steps):
+        for _ in range(steps):
+            reference_step(reference)
+
+    slow = best_rate(run_reference, args.steps // 20, args.repeat)
+    print(f"{'reference model':<20} {slow / 1e6:8.2f} M instructions/s")
+    print(f"{'dispatch table':<20} {fast / 1e6:8.2f} M instructions/s  ({fast / slow:.0f}x)")
+    print(f"{'basic blocks':<20} {block / 1e6:8.2f} M instructions/s  ({block / slow:.0f}x, {block / fast:.1f}x dispatch)")
+    print(f"{'profiling':<20} {profiled / 1e6:8.2f} M instructions/s  ({fast / profiled:.2f}x slower than dispatch)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark execution traces: size, recording rate and seek time.
+
+Traces the 3n+1 loop for --steps cycles, then reports the file size per
+step next to the size of the same steps as a list of tuples, the
+recording rate, and the time to read a --window step window at random
+cycles, which depends on --chunk but not on the length of the trace.
+
+Usage: python benchmarks/bench_trace.py [--steps N] [--chunk N] [--window N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import J1
+from j1tools.sim.trace import TraceReader, TraceWriter, trace
+
+SOURCE = """
+ORG $0000
+JMP 'start
+
+include "core/j1_base_macros.asm"
+
+: start
+    #27
+    BEGIN
+        dup #1 and IF dup 2* + #1 + ELSE 2/ #$7FFF and THEN
+        dup #1 =
+    UNTIL
+    drop
+    JMP 'start
+"""
+
+
+def build():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(SOURCE, "bench_trace.asm"))
+    return assembler.memory_image()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=4096)
+    parser.add_argument("--window", type=int, default=100)
+    args = parser.parse_args()
+
+    image = build()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.j1t"
+        start = time.perf_counter()
+        with TraceWriter(path, chunk_steps=args.chunk) as writer:
+            trace(J1(image), args.steps, writer)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        sample = min(args.steps, 100_000)
+        cpu = J1(image)
+        tracemalloc.start()
+        steps = []
+        for _ in range(sample):
+            steps.append((cpu.cycles, cpu.pc, cpu.st0, cpu.dsp, cpu.rsp))
+            cpu.step()
+        listed = tracemalloc.get_traced_memory()[0] / sample
+        tracemalloc.stop()
+
+        print(f"{'trace file':<12} {size / args.steps:8.3f} bytes/step")
+        print(f"{'tuple list':<12} {listed:8.1f} bytes/step")
+        print(f"{'recording':<12} {args.steps / elapsed / 1e3:8.1f} k steps/s")
+
+        rng = random.Random(21)
+        with TraceReader(path) as reader:
+            seeks = 200
+            start = time.perf_counter()
+            for _ in range(seeks):
+                cycle = rng.randrange(reader.first_cycle, reader.first_cycle + len(reader))
+                for _ in reader.window(cycle, cycle + args.window):
+                    pass
+            seek = (time.perf_counter() - start) / seeks
+        print(f"{'window':<12} {seek * 1e3:8.3f} ms per {args.window}-step window")
+
+
+if __name__ == "__main__":
+    main()
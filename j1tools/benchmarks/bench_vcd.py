@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming VCD reader.
+
+Writes a synthetic dump of --cycles clock cycles with the J1 signals and
+--noise other busy signals, then reports the rate of reading the J1
+timelines next to the rate of just reading the file in chunks.
+
+Usage: python benchmarks/bench_vcd.py [--cycles N] [--noise N]
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from j1tools.vcd import VCDFile, samples
+from j1tools.vcd.reader import CHUNK_SIZE
+
+J1_VARS = [("clk", 1), ("pc", 16), ("insn", 16), ("st0", 16), ("dsp", 5), ("rsp", 5),
+           ("io_addr", 16), ("io_wr", 1)]
+
+
+def write_dump(path, cycles, noise):
+    rng = random.Random(22)
+    names = J1_VARS + [(f"n{i}", 16) for i in range(noise)]
+    codes = {name: f"{i + 33:c}" if i < 90 else f"{i // 90 + 33:c}{i % 90 + 33:c}"
+             for i, (name, _) in enumerate(names)}
+    header = ["$timescale 1ps $end\n$scope module j1_tb $end\n"]
+    header += [f"$var wire {w} {codes[n]} {n} $end\n" for n, w in names]
+    header.append("$upscope $end\n$enddefinitions $end\n")
+    busy = [codes[n] for n, _ in names[len(J1_VARS):]]
+    with open(path, "w") as f:
+        f.write("".join(header))
+        for k in range(cycles):
+            lines = [f"#{10 * k}\n1!\n"]
+            for name in ("pc", "insn", "st0"):
+                lines.append(f"b{rng.randrange(0x10000):b} {codes[name]}\n")
+            for code in busy:
+                lines.append(f"b{rng.randrange(0x10000):b} {code}\n")
+            lines.append(f"#{10 * k + 5}\n0!\n")
+            f.write("".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--cycles", type=int, default=100_000)
+    parser.add_argument("--noise", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.vcd"
+        write_dump(path, args.cycles, args.noise)
+        size = path.stat().st_size
+
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            while f.read(CHUNK_SIZE):
+                pass
+        raw = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vcd = VCDFile(path)
+        count = sum(1 for _ in samples(vcd.read()))
+        parse = time.perf_counter() - start
+
+    print(f"{size / 1e6:.1f} MB dump, {count} clock edges")
+    print(f"{'file read':<14} {size / raw / 1e6:8.1f} MB/s")
+    print(f"{'J1 timelines':<14} {size / parse / 1e6:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
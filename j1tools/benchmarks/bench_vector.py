@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark the lockstep NumPy emulator against the scalar emulator.
+
+Runs a data-dependent loop (odd: 3n+1, even: n/2) on --instances copies
+of the image, first with the same input everywhere (pure lockstep) and
+then with a different input per instance (divergent branches), and
+reports aggregate instructions per second next to running a slice of the
+instances one after another on the scalar J1.
+
+Usage: python benchmarks/bench_vector.py [--instances N] [--steps N] [--repeat N]
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import J1
+from j1tools.sim.vector import VectorJ1
+
+SOURCE = """
+ORG $0000
+JMP 'start
+
+include "core/j1_base_macros.asm"
+
+: start     ( n -- )
+    BEGIN
+        dup #1 and IF dup 2* + #1 + ELSE 2/ #$7FFF and THEN
+        #0
+    UNTIL
+"""
+
+
+def build():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(SOURCE, "bench_vector.asm"))
+    return assembler.memory_image()
+
+
+def best_time(setup, run, repeat):
+    """Best time of run(setup()) over repeat runs, not counting setup."""
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--instances", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image = build()
+    rng = random.Random(16)
+    inputs = {
+        "lockstep": [27] * args.instances,
+        "divergent": [rng.randrange(1, 0x8000) for _ in range(args.instances)],
+    }
+    total = args.instances * args.steps
+
+    # A slice of the instances, one after another
+    count = max(1, args.instances // 16)
+
+    def setup():
+        cpus = []
+        for n in inputs["divergent"][:count]:
+            cpu = J1(image)
+            cpu.dsp = 1
+            cpu.ds[1], cpu.st0 = cpu.st0, n
+            cpus.append(cpu)
+        return cpus
+
+    def run_scalar(cpus):
+        for cpu in cpus:
+            cpu.run(args.steps)
+
+    scalar = count * args.steps / best_time(setup, run_scalar, args.repeat)
+    print(f"{'J1 (one by one)':<22} {scalar / 1e6:8.2f} M instructions/s")
+
+    for name, values in inputs.items():
+        def setup():
+            vector = VectorJ1(image, instances=args.instances)
+            vector.push(np.array(values))
+            return vector
+
+        rate = total / best_time(setup, lambda vector: vector.run(args.steps), args.repeat)
+        print(f"{'VectorJ1 ' + name:<22} {rate / 1e6:8.2f} M instructions/s  ({rate / scalar:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
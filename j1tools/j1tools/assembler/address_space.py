@@ -2,62 +2,83 @@
 Manages memory layout with ORG directives and collision detection
 """
 
+import re
 import logging
 from typing import Dict, List, Tuple
 from pathlib import Path
 
+# Runs of used words in the occupancy map
+_USED_RUN = re.compile(b"\x01+")
+
 class AddressSpace:
+    """
+    Tracks the current address and which words have been emitted.
+
+    Occupancy is a bytearray with one flag per word, grown on demand up to
+    the highest address used, so collision checks and retractions are
+    constant time per word and memory use doesn't depend on how many
+    instructions were emitted.
+    """
+
     def __init__(self):
         self.current_word_addr = 0x0000
-        self.used_ranges: List[Tuple[int, int]] = []
+        self._used = bytearray()  # 1 = word already emitted
         self.base_address = 0x0000
         self.sections: Dict[str, Dict] = {
             '.code': {'start': 0x0000, 'current': 0x0000},
             '.data': {'start': None, 'current': None}
         }
         self.current_section = '.code'
+        self.origins: List[int] = []  # Addresses set by ORG, in order
         self.logger = logging.getLogger("j1asm.addr")
 
+    @property
+    def used_ranges(self) -> List[Tuple[int, int]]:
+        """Used words as coalesced, sorted (start, end) ranges"""
+        return [(m.start(), m.end()) for m in _USED_RUN.finditer(self._used)]
+
     def set_org(self, address: int) -> None:
         """Set new origin address with collision checking"""
         if address < self.current_word_addr and self.current_section == '.code':
             raise ValueError(f"ORG {address:04x} attempts to move backward in .code section")
-            
+
         if self._check_collision(address):
             raise ValueError(f"Address collision at {address:04x}")
-            
+
         self.current_word_addr = address
         self.sections[self.current_section]['current'] = address
+        self.origins.append(address)
         self.logger.debug(f"ORG set to {address:04x} in {self.current_section}")
 
     def advance(self, size: int = 1) -> int:
         """Advance address pointer and return previous address"""
         prev_addr = self.current_word_addr
-        self.current_word_addr += size
-        self.used_ranges.append((prev_addr, prev_addr + size))
+        end = prev_addr + size
+        self.current_word_addr = end
+        if end > len(self._used):
+            self._used.extend(bytes(end - len(self._used)))
+        if size == 1:
+            self._used[prev_addr] = 1
+        else:
+            self._used[prev_addr:end] = b"\x01" * size
         return prev_addr
 
     def undo_advance(self, size: int = 1) -> None:
-        """Undo previous advance operation(s)"""
-        if not self.used_ranges:
-            raise ValueError("No addresses to retract")
-        
-        # Remove the last 'size' number of ranges
-        for _ in range(size):
-            if not self.used_ranges:
-                raise ValueError("Cannot retract more addresses than were advanced")
-            
-            start, end = self.used_ranges.pop()
-            self.current_word_addr = start  # Reset to start of removed range
-        
+        """Retract the last 'size' words emitted before the current address"""
+        start = self.current_word_addr - size
+        # Past the end of the map the slice is short, and all() of it vacuous
+        if (start < 0 or self.current_word_addr > len(self._used)
+                or not all(self._used[start:self.current_word_addr])):
+            raise ValueError("Cannot retract more addresses than were advanced")
+
+        self._used[start:self.current_word_addr] = bytes(size)
+        self.current_word_addr = start  # Reset to start of removed range
+
         self.logger.debug(f"Retracted to address {self.current_word_addr:04x}")
 
     def _check_collision(self, address: int) -> bool:
-        """Check if address range is already used"""
-        for start, end in self.used_ranges:
-            if start <= address < end:
-                return True
-        return False
+        """Check if address is already used"""
+        return address < len(self._used) and self._used[address] == 1
 
     def get_word_address(self) -> int:
         """Get current word address"""
@@ -65,4 +86,4 @@ class AddressSpace:
 
     def get_byte_address(self) -> int:
         """Get current byte address"""
-        return self.current_word_addr * 2
\ No newline at end of file
+        return self.current_word_addr * 2
@@ -3,8 +3,10 @@
 import sys
 import logging
 import argparse
+import pickle
+import contextvars
 import lark
-from lark import Lark, Transformer, Tree, Token
+from lark import Transformer, Tree, Token
 from pathlib import Path
 from .instructionset_16kb_dualport import (
     ALU_OPS,
@@ -28,10 +30,58 @@ from .macro_processor import MacroProcessor
 from .config import AssemblerConfig
 from .address_space import AddressSpace
 from .control_structures import ControlStructures
+from .grammar import get_parser, GRAMMAR_PATH, PARSERS
+from ..memory.image import MemoryImage, parse_formats
+from .include_cache import (
+    IncludeCache,
+    IncludeRecord,
+    IncludeRecording,
+    content_hash,
+    macro_fingerprint,
+)
+
+
+# The assembler whose source the shared LALR parser is currently parsing
+_active_assembler: contextvars.ContextVar = contextvars.ContextVar("j1asm_active_assembler")
+
+# Instruction types that occupy a word of the memory image
+WORD_TYPES = frozenset({
+    InstructionType.BYTE_CODE,
+    InstructionType.JUMP,
+    InstructionType.NUMBER,
+    InstructionType.LABEL_REF,
+})
+
+
+class _InlineCallbacks:
+    """
+    Routes LALR reductions to the J1Assembler that is currently parsing.
+
+    The LALR parser is built once per process, so its callbacks cannot be
+    bound to a single assembler instance.  Each rule callback looks up the
+    active assembler and calls its method of the same name.
+    """
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not callable(getattr(J1Assembler, name, None)):
+            raise AttributeError(name)
+
+        def callback(children):
+            return getattr(_active_assembler.get(), name)(children)
+
+        return callback
+
+
+_INLINE_CALLBACKS = _InlineCallbacks()
 
 
 class J1Assembler(Transformer):
-    def __init__(self, debug: bool = False):
+    def __init__(
+        self,
+        debug: bool = False,
+        parser: str = "lalr",
+        include_cache: Optional[IncludeCache] = None,
+    ):
         super().__init__()
         self.labels: Dict[str, int] = {}  # label_name -> address
         self.current_address: int = 0
@@ -69,16 +119,17 @@ class J1Assembler(Transformer):
         # Initialize macro processor
         self.macro_processor = MacroProcessor(self.addr_space, debug=debug)
 
-        # Load the grammar
-        grammar_path = Path(__file__).parent / "j1.lark"
-        if not grammar_path.exists():
-            raise FileNotFoundError(f"Grammar file not found: {grammar_path}")
-
-        try:
-            self.parser = Lark.open(grammar_path, start="start")
-            self.logger.debug(f"Loaded grammar from {grammar_path}")
-        except Exception as e:
-            raise Exception(f"Failed to load grammar: {e}")
+        # Get the shared parser (compiled once per process)
+        # LALR runs our callbacks inline while parsing; Earley builds a
+        # parse tree that transform() walks afterwards.
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser type: {parser}")
+        self.parser_type = parser
+        if parser == "lalr":
+            self.parser = get_parser("lalr", transformer=_INLINE_CALLBACKS)
+        else:
+            self.parser = get_parser("earley")
+        self.logger.debug(f"Using shared {parser} parser for {GRAMMAR_PATH}")
 
         # Add config instance
         self.config = AssemblerConfig(debug=debug)
@@ -94,8 +145,32 @@ class J1Assembler(Transformer):
         # Initialize control structures handler
         self.control_structures = ControlStructures(self.state, self.addr_space, debug)
 
-    def parse(self, source: str, filename: str = "<unknown>") -> Tree:
-        """Parse source code with optional filename for error reporting."""
+        # Cache of assembled include files, and the includes being recorded
+        # for it (innermost last)
+        self.include_cache = include_cache if include_cache is not None else IncludeCache()
+        self._recordings: List[IncludeRecording] = []
+
+        # Content hashes of files read this run
+        # Key: resolved path, Value: content hash
+        self._file_hashes: Dict[str, str] = {}
+
+        # Memory image, built on first use after assembly
+        self.is_assembled = False
+        self._memory_image: Optional[MemoryImage] = None
+
+        # Peephole rewrites made by -O (peephole.Rewrite records), and the
+        # rule file and its includes
+        self.rewrites: List = []
+        self.rule_files: List[Path] = []
+
+    def parse(self, source: str, filename: str = "<unknown>") -> Optional[Tree]:
+        """
+        Parse source code with optional filename for error reporting.
+
+        With the LALR parser the program is transformed while it is parsed,
+        no tree is kept and None is returned.  With the Earley parser the
+        parse tree is returned.  Either result can be passed to transform().
+        """
         if self.main_file == "<unknown>":
             self.main_file = filename
         self.state.current_file = filename  # Update state instead of direct attribute
@@ -104,7 +179,9 @@ class J1Assembler(Transformer):
         self.state.source_lines = [line.rstrip() for line in source.splitlines()]
         
         logging.getLogger("lark").setLevel(logging.DEBUG)
-        tree = self.parser.parse(source)
+        tree = self._parse_source(source)
+        if tree is None:
+            return None
 
         self.logger.debug(tree.pretty())
 
@@ -115,10 +192,35 @@ class J1Assembler(Transformer):
 
         return tree
 
+    def _parse_source(self, source: str) -> Optional[Tree]:
+        """Run the parser over source, transforming inline for LALR."""
+        if self.parser_type != "lalr":
+            return self.parser.parse(source)
+
+        token = _active_assembler.set(self)
+        try:
+            self.parser.parse(source)
+        finally:
+            _active_assembler.reset(token)
+        return None
+
+    def transform(self, tree: Optional[Tree]):
+        """Transform a parse tree (a None tree was already transformed inline)."""
+        if tree is None:
+            return None
+        return super().transform(tree)
+
     def program(
         self, statements: List[Union[InstructionMetadata, List[InstructionMetadata]]]
     ) -> None:
         """Process all statements and resolve labels."""
+        # Record the unresolved statements of an include for the include cache
+        if self._recordings:
+            self._record_event(
+                ("program", self.state.current_file,
+                 pickle.dumps(statements, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+
         # First pass: collect labels and instructions
         for stmt in statements:
             if isinstance(stmt, InstructionMetadata):
@@ -231,6 +333,7 @@ class J1Assembler(Transformer):
                 self.logger.debug(f"Resolved label reference '{inst.label_name}' to address {target:04x}")
 
         self.is_assembled = True
+        self._memory_image = None
 
     def statement(
         self, items: List[Union[InstructionMetadata, Tuple[str, str]]]
@@ -432,12 +535,6 @@ class J1Assembler(Transformer):
                 )
             machine_code = value | 0x8000
             
-            # Create metadata with safe source line handling
-            try:
-                source_line = self.state.source_lines[token.line - 1] if token.line > 0 and token.line <= len(self.state.source_lines) else ""
-            except IndexError:
-                source_line = ""
-                
             return InstructionMetadata(
                 type=InstructionType.BYTE_CODE,
                 value=machine_code,
@@ -445,7 +542,7 @@ class J1Assembler(Transformer):
                 filename=self.state.current_file,
                 line=token.line if hasattr(token, 'line') else 0,
                 column=token.column if hasattr(token, 'column') else 0,
-                source_line=source_line,
+                lines=self.state.source_lines,
                 instr_text=str(token),  # Use token string directly
                 num_value=value,
                 word_addr=self.addr_space.get_word_address(),
@@ -467,12 +564,6 @@ class J1Assembler(Transformer):
                 # ]
             machine_code = 0x8000 | value
 
-            # Create metadata with safe source line handling
-            try:
-                source_line = self.state.source_lines[token.line - 1] if token.line > 0 and token.line <= len(self.state.source_lines) else ""
-            except IndexError:
-                source_line = ""
-                
             return InstructionMetadata(
                 type=InstructionType.BYTE_CODE,
                 value=machine_code,
@@ -480,7 +571,7 @@ class J1Assembler(Transformer):
                 filename=self.state.current_file,
                 line=token.line if hasattr(token, 'line') else 0,
                 column=token.column if hasattr(token, 'column') else 0,
-                source_line=source_line,
+                lines=self.state.source_lines,
                 instr_text=str(token),  # Use token string directly
                 num_value=value,
                 word_addr=self.addr_space.get_word_address(),
@@ -499,7 +590,7 @@ class J1Assembler(Transformer):
                 filename=self.state.current_file,
                 line=token.line if hasattr(token, 'line') else 0,
                 column=token.column if hasattr(token, 'column') else 0,
-                source_line=self.state.source_lines[token.line - 1] if token.line > 0 and token.line <= len(self.state.source_lines) else "",
+                lines=self.state.source_lines,
                 instr_text=str(token),
                 num_value=value,
                 word_addr=self.addr_space.get_word_address(),
@@ -536,12 +627,6 @@ class J1Assembler(Transformer):
             raise ValueError(f"Unknown token type: {token.type}")
             
         # Raw numbers don't become instructions, they're just values
-        # Create metadata with safe source line handling
-        try:
-            source_line = self.state.source_lines[token.line - 1] if token.line > 0 and token.line <= len(self.state.source_lines) else ""
-        except IndexError:
-            source_line = ""
-            
         return InstructionMetadata(
             type=InstructionType.NUMBER,  # This is a raw number value, not an instruction
             value=value & 0xFFFF,  # Ensure 16-bit value
@@ -549,7 +634,7 @@ class J1Assembler(Transformer):
             filename=self.state.current_file,
             line=token.line if hasattr(token, 'line') else 0,
             column=token.column if hasattr(token, 'column') else 0,
-            source_line=source_line,
+            lines=self.state.source_lines,
             instr_text=str(token),  # Use token string directly
             num_value=value,
         )
@@ -636,6 +721,14 @@ class J1Assembler(Transformer):
             else:
                 comment_part = macro_note
 
+        # Add optimization annotation in front of it
+        if metadata.opt_name:
+            opt_note = f"(opt: {metadata.opt_name})"
+            if comment_part:
+                comment_part = f"{opt_note} {comment_part}"
+            else:
+                comment_part = opt_note
+
         # Format line:col with fixed width
         line_col = f"{metadata.line:3d}:{metadata.column:<3d}"
 
@@ -702,39 +795,101 @@ class J1Assembler(Transformer):
             for symbol, addr in sorted_symbols:
                 print(f"{addr:04x} {symbol}", file=f)
 
-    def get_bytecodes(self) -> List[int]:
-        """Return a list of resolved bytecodes for testing."""
+    def generate_depfile(self, output_file: str, target: str):
+        """
+        Generate a make dependency file listing the main source and every
+        resolved include (standard library included) as prerequisites of
+        target, then, under -O, the peephole rule file and its includes.
+        Each of those also gets an empty rule so make doesn't fail when it
+        is deleted or renamed.
+        """
         if not self.is_assembled:
-            raise ValueError("Cannot get bytecodes before assembling")
+            raise ValueError("Cannot generate dependencies before assembling")
 
-        bytecodes = []
-        prev_word_addr = 0
+        def escape(path) -> str:
+            return str(path).replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
 
-        # Process instructions in order by address
-        for word_addr in sorted(self.instruction_metadata.keys()):
-            inst = self.instruction_metadata[word_addr]
-            
-            # Fill gaps with zeros
-            while prev_word_addr < word_addr:
-                bytecodes.append(0x0000)
-                prev_word_addr += 1
+        includes = [escape(path) for path in self.included_files()]
+        includes += [escape(path) for path in self.rule_files if escape(path) not in includes]
+        with open(output_file, "w") as f:
+            prerequisites = [escape(self.main_file)] + includes
+            print(f"{escape(target)}: " + " \\\n ".join(prerequisites), file=f)
+            for include in includes:
+                print(f"\n{include}:", file=f)
 
-            if inst.type == InstructionType.BYTE_CODE or inst.type == InstructionType.JUMP or inst.type == InstructionType.NUMBER or inst.type == InstructionType.LABEL_REF:
-                bytecodes.append(inst.value)
-                prev_word_addr = word_addr + 1
+    def memory_image(self) -> MemoryImage:
+        """
+        Return the program's memory image, built once after label resolution.
+        Addresses without an emitted word read as zero.
+        """
+        if not self.is_assembled:
+            raise ValueError("Cannot build memory image before assembling")
+        if self._memory_image is not None:
+            return self._memory_image
+
+        # The image ends after the last emitted word, or at a trailing
+        # non-word entry (e.g. a label at the end of the program)
+        metadata = self.instruction_metadata
+        size = 0
+        if metadata:
+            last = max(metadata)
+            size = last + (metadata[last].type in WORD_TYPES)
+
+        words = [(addr, inst.value) for addr, inst in metadata.items()
+                 if inst.type in WORD_TYPES]
+        try:
+            image = MemoryImage.from_sparse(size, words)
+        except OverflowError:
+            inst = next(inst for inst in metadata.values()
+                        if inst.type in WORD_TYPES and not 0 <= inst.value <= 0xFFFF)
+            raise ValueError(
+                f"{inst.filename}:{inst.line}:{inst.column}: "
+                f"Value {inst.value:#x} does not fit in a 16-bit word"
+            ) from None
+
+        self._memory_image = image
+        return image
 
-        return bytecodes
+    def get_bytecodes(self) -> List[int]:
+        """Return a list of resolved bytecodes for testing."""
+        if not self.is_assembled:
+            raise ValueError("Cannot get bytecodes before assembling")
+        return self.memory_image().tolist()
 
-    def generate_output(self, output_file: str):
+    def generate_output(self, output_file: str, depth: Optional[int] = None):
         """Generate output file containing machine code in hex format."""
+        self.generate_memory_files(output_file, ("hex",), depth)
+
+    def generate_memory_files(
+        self,
+        output_file: str,
+        formats: Tuple[str, ...] = ("hex",),
+        depth: Optional[int] = None,
+    ) -> List[Path]:
+        """
+        Write the memory image in each format from one in-memory image.
+        The hex file is written to output_file and every other format next
+        to it with the format as suffix (prog.coe, prog.mif, ...).  With a
+        depth, the image is zero-padded to that many words first.
+
+        Returns:
+            The files written
+        """
         if not self.is_assembled:
             raise ValueError("Cannot generate output before assembling")
 
-        bytecodes = self.get_bytecodes()
-        
-        with open(output_file, "w") as f:
-            for code in bytecodes:
-                print(f"{code:04x}", file=f)
+        image = self.memory_image()
+        if depth is not None:
+            image = image.padded(depth)
+
+        written = []
+        for fmt in formats:
+            path = Path(output_file) if fmt == "hex" else Path(output_file).with_suffix(f".{fmt}")
+            # One buffered write per file
+            with open(path, "wb" if fmt == "bin" else "w") as f:
+                image.write(fmt, f)
+            written.append(path)
+        return written
 
     def macro_def(self, items):
         """Handle macro definitions by delegating to macro processor."""
@@ -745,6 +900,10 @@ class J1Assembler(Transformer):
 
         # Process the macro definition
         self.macro_processor.process_macro_def(items)
+        if self._recordings:
+            self._record_event(
+                ("macro", macro_name, self.macro_processor.get_macro_info(macro_name))
+            )
 
         # Create instruction text for the macro definition
         # Include stack effect comment if present
@@ -774,6 +933,9 @@ class J1Assembler(Transformer):
 
         # Special handling for loop index words
         if word in ["i", "j", "k"]:
+            # Their warnings depend on the loop context, so don't cache
+            self._mark_uncacheable()
+
             # Get loop depth from control structures
             depth = self.control_structures.get_do_loop_depth()
             
@@ -801,6 +963,10 @@ class J1Assembler(Transformer):
             else:  # k
                 return self.control_structures._generate_rstack_access(2, token)
 
+        # An include's result depends on which names are macros
+        for recording in self._recordings:
+            recording.note_lookup(word, self.macro_processor.get_macro_info(word))
+
         # Check if the identifier is a defined macro
         if self.macro_processor.is_macro(word):
             # Expand as a macro
@@ -830,13 +996,31 @@ class J1Assembler(Transformer):
 
         try:
             # Use config to resolve include file
-            resolved_path = self.config.resolve_include(
-                filename, Path(self.state.current_file).parent
-            )
+            current_dir = Path(self.state.current_file).parent
+            resolved_path = self.config.resolve_include(filename, current_dir)
 
             if resolved_path is None:
                 raise FileNotFoundError(f"Include file not found: {filename}")
 
+            # Read the included file using the resolved path
+            with open(resolved_path, "r") as f:
+                included_source = f.read()
+            digest = content_hash(included_source.encode())
+            self._file_hashes[str(resolved_path)] = digest
+
+            # Enclosing includes depend on this file too
+            for recording in self._recordings:
+                recording.record.includes.append(
+                    (filename, str(current_dir), str(resolved_path), digest)
+                )
+
+            # Replay the cached result if the file and its environment are unchanged
+            record = self.include_cache.get(str(resolved_path), digest)
+            if record is not None and self._replay_include(record):
+                return []
+
+            included_lines = [line.rstrip() for line in included_source.splitlines()]
+
             # Save current state
             include_stack_entry = IncludeStack(
                 filename=self.state.current_file,
@@ -844,15 +1028,6 @@ class J1Assembler(Transformer):
                 source_lines=self.state.source_lines,
             )
 
-            # Read the included file using the resolved path
-            with open(
-                resolved_path, "r"
-            ) as f:  # Changed from filename to resolved_path
-                included_source = f.read()
-                included_lines = [
-                    line.rstrip() for line in included_source.splitlines()
-                ]
-
             # Parse and process the included file
             self.logger.debug(
                 f"Processing include file: {resolved_path}"
@@ -865,9 +1040,24 @@ class J1Assembler(Transformer):
             self.state.current_file = str(resolved_path)  # Use resolved path as current file
             self.state.source_lines = included_lines
 
-            # Parse and process the included file
-            tree = self.parser.parse(included_source)
-            self.transform(tree)
+            # Parse and process the included file, recording it for the cache
+            recording = IncludeRecording(
+                str(resolved_path),
+                digest,
+                self.addr_space.get_word_address(),
+                self._label_counters(),
+            )
+            self._recordings.append(recording)
+            try:
+                self.transform(self._parse_source(included_source))
+            finally:
+                self._recordings.pop()
+
+            record = recording.finish(
+                self.addr_space.get_word_address(), self._label_counters()
+            )
+            if record is not None:
+                self.include_cache.put(record)
 
             # Restore previous state
             prev_state = self.state.include_stack.pop()
@@ -883,6 +1073,91 @@ class J1Assembler(Transformer):
                 f"Error processing include file {filename}: {str(e)}"
             )
 
+    def included_files(self) -> List[Path]:
+        """Return every include file read (or replayed from cache) this run."""
+        return [Path(path) for path in self._file_hashes]
+
+    def _label_counters(self) -> Tuple[int, int]:
+        """Return the generated-label counters (they must not change in a cached include)."""
+        return (getattr(self, "_label_counter", 0), self.control_structures._label_counter)
+
+    def _mark_uncacheable(self) -> None:
+        """Prevent the includes currently being recorded from being cached."""
+        for recording in self._recordings:
+            recording.cacheable = False
+
+    def _record_event(self, event: Tuple) -> None:
+        """Add a replay event to every include currently being recorded."""
+        for recording in self._recordings:
+            recording.add_event(event)
+
+    def _file_hash(self, path: Path) -> str:
+        """Return the content hash of a file, reading it at most once per run."""
+        key = str(path)
+        if key not in self._file_hashes:
+            with open(path, "r") as f:
+                self._file_hashes[key] = content_hash(f.read().encode())
+        return self._file_hashes[key]
+
+    def _replay_include(self, record: IncludeRecord) -> bool:
+        """
+        Apply a cached include result without parsing the file.
+
+        Returns False, leaving the assembler untouched, if the record no
+        longer matches its environment and the file must be assembled.
+        """
+        # Nested includes must resolve to the same unchanged files
+        for filename, current_dir, path, digest in record.includes:
+            resolved = self.config.resolve_include(filename, current_dir)
+            if resolved is None or str(resolved) != path or self._file_hash(resolved) != digest:
+                self.logger.debug(f"Include cache stale for {record.path}: {filename} changed")
+                return False
+
+        # Macros it used from outside must still expand the same way
+        for name, fingerprint in record.macro_deps.items():
+            if macro_fingerprint(self.macro_processor.get_macro_info(name)) != fingerprint:
+                self.logger.debug(f"Include cache stale for {record.path}: {name} changed")
+                return False
+
+        self.logger.debug(f"Using cached include: {record.path}")
+
+        # Pass the record's dependencies on to enclosing includes
+        for recording in self._recordings:
+            recording.record.includes.extend(record.includes)
+            for name in record.macro_deps:
+                recording.note_lookup(name, self.macro_processor.get_macro_info(name))
+
+        # Claim the words it emitted and relocate them to the current address
+        delta = self.addr_space.get_word_address() - record.start_addr
+        if record.size:
+            self.addr_space.advance(record.size)
+
+        prev_file = self.state.current_file
+        try:
+            for event in record.events:
+                if event[0] == "macro":
+                    _, name, definition = event
+                    self.macro_processor.restore_macro(name, definition)
+                    self._record_event(event)
+                else:
+                    _, filename, data = event
+                    statements = pickle.loads(data)
+                    if delta:
+                        self._relocate(statements, delta)
+                    self.state.current_file = filename
+                    self.program(statements)
+        finally:
+            self.state.current_file = prev_file
+        return True
+
+    def _relocate(self, statements: List, delta: int) -> None:
+        """Shift the word address of every placed instruction by delta."""
+        for stmt in statements:
+            if isinstance(stmt, list):
+                self._relocate(stmt, delta)
+            elif isinstance(stmt, InstructionMetadata) and stmt.word_addr != -1:
+                stmt.word_addr += delta
+
     def format_include_trace(self) -> str:
         """Format the include stack for error messages."""
         if not self.state.include_stack:
@@ -899,22 +1174,18 @@ class J1Assembler(Transformer):
         
         address = number.num_value & 0xFFFF  # Ensure 16-bit
         self.addr_space.set_org(address)
+
+        # Absolute placement can't be relocated by the include cache
+        self._mark_uncacheable()
         
-        # Create metadata with safe source line handling
-        try:
-            source_line = self.state.source_lines[number.token.line - 1] if number.token.line > 0 and number.token.line <= len(self.state.source_lines) else ""
-        except IndexError:
-            source_line = ""
-            
         # Create metadata for listing
         return InstructionMetadata(
             type=InstructionType.DIRECTIVE,
             value=address,
-            token=number.token,
             filename=self.state.current_file,
-            line=number.token.line if hasattr(number.token, 'line') else 0,
-            column=number.token.column if hasattr(number.token, 'column') else 0,
-            source_line=source_line,
+            line=number.line,
+            column=number.column,
+            lines=number.lines,
             instr_text=f"ORG {number.instr_text}",
         )
 
@@ -1709,7 +1980,7 @@ class J1Assembler(Transformer):
             filename=self.state.current_file,
             line=token.line,
             column=token.column,
-            source_line=self.state.source_lines[token.line - 1],
+            lines=self.state.source_lines,
             instr_text=instr_text,
             word_addr=addr,
             num_value=value,
@@ -1749,6 +2020,146 @@ class J1Assembler(Transformer):
         return metadata
 
 
+def assemble_file(
+    input: str,
+    output: str,
+    symbols: bool = False,
+    listing: bool = False,
+    include: Tuple[str, ...] = (),
+    no_stdlib: bool = False,
+    parser: str = "lalr",
+    debug: bool = False,
+    include_cache: Optional[IncludeCache] = None,
+    depfile: Optional[str] = None,
+    formats: Tuple[str, ...] = (),
+    depth: Optional[int] = None,
+    optimize: bool = False,
+    rules: Optional[str] = None,
+) -> J1Assembler:
+    """
+    Assemble a source file and write its outputs.
+
+    Args:
+        input: Assembly source file
+        output: Hex output file (.sym/.lst are written next to it)
+        symbols: Also write a symbol file
+        listing: Also write a listing file
+        include: Extra include search directories
+        no_stdlib: Disable the standard library include path
+        parser: Lark parser type
+        debug: Enable debug output
+        include_cache: Include cache to use (default: a new IncludeCache)
+        depfile: Also write a make dependency file here
+        formats: Memory formats to write next to the hex file (coe, mif, mem, bin)
+        depth: Zero-pad the memory image to this many words
+        optimize: Run the peephole optimizer before writing outputs
+        rules: Peephole rule file (default: the standard library's)
+
+    Returns:
+        The assembler, for access to symbols and included files
+    """
+    logger = logging.getLogger("j1asm")
+
+    # Read the input file
+    with open(input, "r") as f:
+        source = f.read()
+        logger.debug(f"Source code:\n{source}")
+
+    logger.debug("Parsing source...")
+
+    assembler = J1Assembler(debug=debug, parser=parser, include_cache=include_cache)
+
+    # Configure include paths
+    for path in include:
+        assembler.config.add_include_path(path)
+
+    if no_stdlib:
+        assembler.config.disable_stdlib()
+
+    try:
+        tree = assembler.parse(source, filename=input)
+        assembler.transform(tree)
+    except lark.exceptions.UnexpectedInput as e:
+        raise ValueError(format_parse_error(e, input, source, debug))
+
+    if optimize:
+        from .peephole import DEFAULT_RULES, format_stats, load_rules, rule_files
+        from .peephole import optimize as peephole
+
+        assembler.rewrites = peephole(assembler, load_rules(rules or DEFAULT_RULES))
+        assembler.rule_files = rule_files(rules or DEFAULT_RULES)
+        saved = sum(rewrite.words for rewrite in assembler.rewrites)
+        logger.info(f"Peephole: {len(assembler.rewrites)} rewrites saved {saved} words")
+        logger.debug("\n" + format_stats(assembler.rewrites))
+
+    # Write the hex output and any other memory formats in one pass
+    formats = ("hex",) + tuple(fmt for fmt in formats if fmt != "hex")
+    for path in assembler.generate_memory_files(output, formats, depth):
+        logger.info(f"Successfully wrote output to {path}")
+
+    # Generate symbol file if requested
+    if symbols:
+        sym_file = Path(output).with_suffix(".sym")
+        assembler.generate_symbols(sym_file)
+        logger.info(f"Generated symbol file: {sym_file}")
+
+    # Generate listing file if requested
+    if listing:
+        lst_file = Path(output).with_suffix(".lst")
+        assembler.generate_listing(lst_file)
+        logger.info(f"Generated listing file: {lst_file}")
+
+    # Generate dependency file if requested
+    if depfile:
+        assembler.generate_depfile(depfile, output)
+        logger.info(f"Generated dependency file: {depfile}")
+
+    return assembler
+
+
+def format_parse_error(
+    e: lark.exceptions.UnexpectedInput, input: str, source: str, debug: bool = False
+) -> str:
+    """Format Lark's parsing errors to match our style."""
+    error_msg = str(e)
+    if ", at line" in error_msg:
+        error_msg = error_msg.split(", at line")[0]
+
+    # Find the actual line with the error
+    real_line = 0
+    source_lines = source.splitlines()
+    for i, line in enumerate(source_lines[: e.line - 1], 1):
+        stripped = line.strip()
+        if stripped and not stripped.startswith(";"):
+            real_line = i
+
+    message = f"{input}:{real_line}:{e.column}: {error_msg}"
+    if debug:
+        error_line = source_lines[real_line - 1]
+        message += f"\n    {error_line}\n    {' ' * (e.column-1)}^"
+    return message
+
+
+def _parse_format_option(ctx, param, value) -> Tuple[str, ...]:
+    try:
+        return parse_formats(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def _parse_depth_option(ctx, param, value) -> Optional[int]:
+    """Accept a decimal, 0x or $ prefixed word count."""
+    if value is None:
+        return None
+    try:
+        depth = int(value[1:], 16) if value.startswith("$") else int(value, 0)
+    except ValueError:
+        raise click.BadParameter(f"Invalid depth: {value}")
+    if depth <= 0:
+        raise click.BadParameter(f"Depth must be positive: {value}")
+    return depth
+
+
 @click.command()
 @click.argument("input", type=click.Path(exists=True))
 @click.option(
@@ -1765,78 +2176,117 @@ class J1Assembler(Transformer):
     help="Add directory to include search path",
 )
 @click.option("--no-stdlib", is_flag=True, help="Disable standard library include path")
-def main(input, output, debug, symbols, listing, include, no_stdlib):
+@click.option(
+    "--parser",
+    "parser_type",
+    type=click.Choice(PARSERS),
+    default="lalr",
+    show_default=True,
+    help="Parser to use (earley is the slower fallback)",
+)
+@click.option("--no-cache", is_flag=True, help="Don't use or update the include cache")
+@click.option(
+    "-MD",
+    "make_deps",
+    is_flag=True,
+    help="Write make dependencies of the output to a .d file next to it",
+)
+@click.option(
+    "--depfile",
+    type=click.Path(dir_okay=False),
+    help="Write make dependencies to this file (implies -MD)",
+)
+@click.option(
+    "-f",
+    "--format",
+    "formats",
+    default="hex",
+    show_default=True,
+    callback=_parse_format_option,
+    help="Comma-separated memory formats to write next to the output: "
+    "hex, coe, mif, mem, bin",
+)
+@click.option(
+    "--depth",
+    callback=_parse_depth_option,
+    help="Zero-pad the memory image to this many words (e.g. 8192 for MEMWORDS)",
+)
+@click.option("-O", "optimize", is_flag=True, help="Run the peephole optimizer")
+@click.option(
+    "--rules",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Peephole rule file for -O (default: the standard library's)",
+)
+@click.option(
+    "-w",
+    "--watch",
+    is_flag=True,
+    help="Stay resident and re-assemble whenever the source or its includes change",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=0.25,
+    show_default=True,
+    help="Seconds between checks when inotify is unavailable (--watch)",
+)
+def main(
+    input,
+    output,
+    debug,
+    symbols,
+    listing,
+    include,
+    no_stdlib,
+    parser_type,
+    no_cache,
+    make_deps,
+    depfile,
+    formats,
+    depth,
+    optimize,
+    rules,
+    watch,
+    poll_interval,
+):
     """J1 Forth CPU Assembler"""
-    try:
-        # Configure logging
-        logging.basicConfig(
-            level=logging.DEBUG if debug else logging.INFO,
-            format="%(levelname)s: %(message)s",
-            stream=sys.stderr,
-        )
-        logger = logging.getLogger("j1asm")
-
-        # Set default output file if not specified
-        output = output or "aout.hex"
-
-        # Read the input file
-        with open(input, "r") as f:
-            source = f.read()
-            logger.debug(f"Source code:\n{source}")
-
-        logger.debug("Parsing source...")
-
-        assembler = J1Assembler(debug=debug)
-
-        # Configure include paths
-        for path in include:
-            assembler.config.add_include_path(path)
-
-        if no_stdlib:
-            assembler.config.disable_stdlib()
-
-        try:
-            tree = assembler.parse(source, filename=input)
-            assembler.transform(tree)
-
-            # Write output to specified file
-            assembler.generate_output(output)
-            logger.info(f"Successfully wrote output to {output}")
-
-            # Generate symbol file if requested
-            if symbols:
-                sym_file = Path(output).with_suffix(".sym")
-                assembler.generate_symbols(sym_file)
-                logger.info(f"Generated symbol file: {sym_file}")
-
-            # Generate listing file if requested
-            if listing:
-                lst_file = Path(output).with_suffix(".lst")
-                assembler.generate_listing(lst_file)
-                logger.info(f"Generated listing file: {lst_file}")
-
-        except lark.exceptions.UnexpectedInput as e:
-            # Format Lark's parsing errors to match our style
-            error_msg = str(e)
-            if ", at line" in error_msg:
-                error_msg = error_msg.split(", at line")[0]
-
-            # Find the actual line with the error
-            real_line = 0
-            source_lines = source.splitlines()
-            for i, line in enumerate(source_lines[: e.line - 1], 1):
-                stripped = line.strip()
-                if stripped and not stripped.startswith(";"):
-                    real_line = i
-
-            error_line = source_lines[real_line - 1]
-            context = f"\n    {error_line}\n    {' ' * (e.column-1)}^"
-
-            logger.error(f"{input}:{real_line}:{e.column}: {error_msg}")
-            if debug:
-                logger.debug(context)
-            raise click.Abort()
+    # Configure logging
+    logging.basicConfig(
+        level=logging.DEBUG if debug else logging.INFO,
+        format="%(levelname)s: %(message)s",
+        stream=sys.stderr,
+    )
+    logger = logging.getLogger("j1asm")
+
+    # Set default output file if not specified
+    output = output or "aout.hex"
+
+    if make_deps and not depfile:
+        depfile = str(Path(output).with_suffix(".d"))
+
+    options = dict(
+        output=output,
+        symbols=symbols,
+        listing=listing,
+        include=include,
+        no_stdlib=no_stdlib,
+        parser=parser_type,
+        debug=debug,
+        depfile=depfile,
+        formats=formats,
+        depth=depth,
+        optimize=optimize,
+        rules=rules,
+    )
+
+    if watch:
+        from .watch import AssemblyDaemon
+
+        AssemblyDaemon(input, no_cache=no_cache, **options).run(poll_interval)
+        return
 
+    try:
+        assemble_file(input, include_cache=IncludeCache(enabled=not no_cache), **options)
     except Exception as e:
         logger.error(str(e))
         if debug:
@@ -1846,8 +2296,15 @@ def main(input, output, debug, symbols, listing, include, no_stdlib):
         raise click.Abort()
 
 
+def cli():
+    """Console entry point: `j1asm batch ...` or `j1asm INPUT ...`."""
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from .batch import batch
 
+        batch(args=sys.argv[2:], prog_name="j1asm batch")
+    else:
+        main()
 
 
 if __name__ == "__main__":
-    main()
+    cli()
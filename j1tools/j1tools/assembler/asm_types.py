@@ -2,9 +2,10 @@
 Type definitions for J1 assembler.
 """
 
+import sys
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Optional, List
+from typing import Optional, List, Sequence
 from lark import Token
 
 
@@ -41,25 +42,74 @@ class ModifierList:
     tokens: List[Token]  # Original tokens for error reporting
 
 
-@dataclass
 class InstructionMetadata:
-    """Represents metadata about an instruction including its value and source information."""
-
-    type: InstructionType  # Type of instruction
-    value: int  # The bytecode/value
-    token: Token  # The original token
-    filename: str  # Source file
-    line: int  # Line number
-    column: int  # Column number
-    source_line: str  # Complete source line
-    instr_text: str  # Clean instruction text for listing
-    word_addr: int = -1  # Word address of the instruction (default -1 = unassigned)
-    num_value: int = -1  # If number, value of the number (default -1 = not a number)
-
-    # Optional metadata
-    macro_name: Optional[str] = None  # Name of macro if from macro expansion
-    opt_name: Optional[str] = None  # Name of optimization if applied
-    label_name: Optional[str] = None  # Name of label (for LABEL type)
+    """
+    Represents metadata about an instruction including its value and source information.
+
+    One record exists for every emitted word (and every macro expansion
+    creates new ones), so records use __slots__ and keep no Lark token.  The
+    source line is not copied: `lines` refers to the line table shared by
+    every instruction from the same file and `source_line` looks it up.
+    File names, macro names and instruction texts are interned.
+    """
+
+    __slots__ = (
+        "type",  # Type of instruction
+        "value",  # The bytecode/value
+        "filename",  # Source file
+        "line",  # Line number
+        "column",  # Column number
+        "lines",  # Shared source lines of the file (or a single line string)
+        "instr_text",  # Clean instruction text for listing
+        "word_addr",  # Word address of the instruction (-1 = unassigned)
+        "num_value",  # If number, value of the number (-1 = not a number)
+        "macro_name",  # Name of macro if from macro expansion
+        "opt_name",  # Name of optimization if applied
+        "label_name",  # Name of label (for LABEL type)
+    )
+
+    def __init__(
+        self,
+        type: InstructionType,
+        value: int,
+        token: Optional[Token] = None,
+        filename: str = "",
+        line: Optional[int] = None,
+        column: Optional[int] = None,
+        source_line: Optional[str] = None,
+        instr_text: str = "",
+        word_addr: int = -1,
+        num_value: int = -1,
+        macro_name: Optional[str] = None,
+        opt_name: Optional[str] = None,
+        label_name: Optional[str] = None,
+        lines: Optional[Sequence[str]] = None,
+    ):
+        self.type = type
+        self.value = value
+        self.filename = sys.intern(filename)
+        # The token only supplies a default position, it isn't kept
+        self.line = line if line is not None else getattr(token, "line", 0) or 0
+        self.column = column if column is not None else getattr(token, "column", 0) or 0
+        self.lines = lines if lines is not None else source_line
+        self.instr_text = sys.intern(instr_text)
+        self.word_addr = word_addr
+        self.num_value = num_value
+        self.macro_name = sys.intern(macro_name) if macro_name else macro_name
+        self.opt_name = opt_name
+        self.label_name = label_name
+
+    @property
+    def source_line(self) -> str:
+        """Complete source line"""
+        lines = self.lines
+        if lines is None:
+            return ""
+        if isinstance(lines, str):
+            return lines
+        if 0 < self.line <= len(lines):
+            return lines[self.line - 1]
+        return ""
 
     def __repr__(self) -> str:
         """Returns a human-readable string representation of the instruction metadata."""
@@ -67,6 +117,13 @@ class InstructionMetadata:
             return f"directive:{self.instr_text}"
         return f"instruction:{self.type.name} {self.instr_text}"
 
+    def copy(self, **changes) -> "InstructionMetadata":
+        """Return a new record with the same fields except those given."""
+        new = InstructionMetadata.__new__(InstructionMetadata)
+        for name in self.__slots__:
+            setattr(new, name, changes.get(name, getattr(self, name)))
+        return new
+
     @classmethod
     def from_token(
         cls,
@@ -82,11 +139,10 @@ class InstructionMetadata:
         return cls(
             type=inst_type,
             value=value,
-            token=token,
             filename=filename,
             line=token.line,
             column=token.column,
-            source_line=source_lines[token.line - 1],
+            lines=source_lines,
             instr_text=instr_text,
             **kwargs
         )
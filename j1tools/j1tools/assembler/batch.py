@@ -0,0 +1,320 @@
+"""
+Batch assembly of many programs.
+
+`j1asm batch` assembles a list of source files (or every .asm file under
+the given directories / glob patterns) in a pool of worker processes.
+Each worker compiles the grammar once and keeps one include cache for
+all the programs it assembles, so a batch scales with the number of cores
+instead of with interpreter and parser start-up.  The files written are
+the same as assembling each program with `j1asm` on its own.
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import logging
+import concurrent.futures
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import click
+
+from .asm import J1Assembler, assemble_file, _parse_depth_option, _parse_format_option
+from .grammar import PARSERS
+from .include_cache import IncludeCache
+
+logger = logging.getLogger("j1asm.batch")
+
+# include "file" at the start of a line
+_INCLUDE = re.compile(r'^\s*include\s+"([^"]+)"', re.MULTILINE)
+
+# Include cache owned by this worker process (see _init_worker)
+_worker_cache: Optional[IncludeCache] = None
+
+
+@dataclass
+class BatchResult:
+    """Outcome of assembling one program."""
+
+    source: Path
+    output: Path
+    ok: bool
+    elapsed: float  # Seconds
+    words: int = 0  # Words of code emitted
+    messages: List[str] = field(default_factory=list)  # Warnings and errors
+
+
+class _CaptureHandler(logging.Handler):
+    """Collects warnings logged while one program is assembled."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages: List[str] = []
+
+    def emit(self, record):
+        self.messages.append(f"{record.levelname}: {record.getMessage()}")
+
+
+def collect_sources(patterns: Iterable[str], include: Iterable[str] = ()) -> List[Path]:
+    """
+    Expand the command line into a sorted list of unique source files.
+
+    Each pattern may be a file, a directory (searched recursively for
+    *.asm) or a glob pattern (`**` is supported).  Files that another
+    collected source includes, looked up next to it or in the include
+    directories, are left out: they are parts of a program, not programs.
+    """
+    sources = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.glob("**/*.asm"))
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"No source files match: {pattern}")
+        sources.extend(matches)
+
+    unique = {}
+    for path in sources:
+        unique.setdefault(path.resolve(), path)
+
+    included = set()
+    for resolved in unique:
+        try:
+            text = resolved.read_text(errors="replace")
+        except OSError:
+            continue
+        for name in _INCLUDE.findall(text):
+            for directory in (resolved.parent, *map(Path, include)):
+                candidate = (directory / name).resolve()
+                if candidate in unique:
+                    included.add(candidate)
+                    break
+    return [path for resolved, path in unique.items() if resolved not in included]
+
+
+def output_path(source: Path, output_dir: Optional[Path], base: Path) -> Path:
+    """Return where the .hex for source is written."""
+    if output_dir is None:
+        return source.with_suffix(".hex")
+    return output_dir / source.resolve().relative_to(base).with_suffix(".hex")
+
+
+def _init_worker(parser: str, use_cache: bool, level: int) -> None:
+    """Warm the grammar and create the include cache once per worker."""
+    global _worker_cache
+    logging.getLogger("j1asm").setLevel(level)
+    J1Assembler(parser=parser)
+    _worker_cache = IncludeCache(enabled=use_cache)
+
+
+def assemble_one(
+    source: Path, output: Path, options: dict, make_deps: bool = False
+) -> BatchResult:
+    """Assemble one program in the current (worker) process."""
+    global _worker_cache
+    if _worker_cache is None:
+        _worker_cache = IncludeCache()
+
+    # Report warnings in the summary rather than interleaved on stderr
+    handler = _CaptureHandler()
+    j1asm_logger = logging.getLogger("j1asm")
+    j1asm_logger.addHandler(handler)
+    propagate, j1asm_logger.propagate = j1asm_logger.propagate, False
+    start = time.perf_counter()
+    try:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        assembler = assemble_file(
+            str(source),
+            str(output),
+            include_cache=_worker_cache,
+            depfile=str(output.with_suffix(".d")) if make_deps else None,
+            **options,
+        )
+        ok = True
+        words = len(assembler.get_bytecodes())
+    except Exception as e:
+        ok = False
+        words = 0
+        handler.messages.append(f"ERROR: {e}")
+    finally:
+        j1asm_logger.removeHandler(handler)
+        j1asm_logger.propagate = propagate
+
+    return BatchResult(
+        source=source,
+        output=output,
+        ok=ok,
+        elapsed=time.perf_counter() - start,
+        words=words,
+        messages=handler.messages,
+    )
+
+
+def run_batch(
+    sources: List[Path],
+    jobs: Optional[int] = None,
+    output_dir: Optional[Path] = None,
+    use_cache: bool = True,
+    make_deps: bool = False,
+    **options,
+):
+    """
+    Assemble every source and yield a BatchResult per file, in input order.
+
+    Args:
+        sources: Programs to assemble
+        jobs: Worker processes (default: number of CPUs, 1 = in-process)
+        output_dir: Write outputs under this directory instead of next to
+            each source, keeping their layout relative to a common parent
+        use_cache: Use the include cache
+        make_deps: Write a make dependency file (.d) next to each output
+        **options: Passed on to assemble_file (symbols, listing, include, ...)
+    """
+    jobs = jobs or os.cpu_count() or 1
+    base = Path(os.path.commonpath([s.resolve().parent for s in sources])) if sources else Path()
+    tasks = [(s, output_path(s, output_dir, base)) for s in sources]
+    parser = options.get("parser", "lalr")
+    level = logging.getLogger("j1asm").getEffectiveLevel()
+
+    if jobs == 1 or len(tasks) <= 1:
+        _init_worker(parser, use_cache, logging.WARNING)
+        try:
+            for source, output in tasks:
+                yield assemble_one(source, output, options, make_deps)
+        finally:
+            logging.getLogger("j1asm").setLevel(level)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(jobs, len(tasks)),
+        initializer=_init_worker,
+        initargs=(parser, use_cache, logging.WARNING),
+    ) as pool:
+        futures = [pool.submit(assemble_one, s, o, options, make_deps) for s, o in tasks]
+        for future in futures:
+            yield future.result()
+
+
+@click.command()
+@click.argument("sources", nargs=-1, required=True)
+@click.option(
+    "-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)"
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False),
+    help="Write outputs here instead of next to each source",
+)
+@click.option("--symbols", is_flag=True, help="Generate symbol files (.sym)")
+@click.option("--listing", is_flag=True, help="Generate listing files (.lst)")
+@click.option(
+    "-MD", "make_deps", is_flag=True, help="Write make dependency files (.d)"
+)
+@click.option(
+    "-I",
+    "--include",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=True, file_okay=False),
+    help="Add directory to include search path",
+)
+@click.option("--no-stdlib", is_flag=True, help="Disable standard library include path")
+@click.option(
+    "--parser",
+    "parser_type",
+    type=click.Choice(PARSERS),
+    default="lalr",
+    show_default=True,
+    help="Parser to use",
+)
+@click.option("--no-cache", is_flag=True, help="Don't use or update the include cache")
+@click.option(
+    "-f",
+    "--format",
+    "formats",
+    default="hex",
+    show_default=True,
+    callback=_parse_format_option,
+    help="Comma-separated memory formats to write: hex, coe, mif, mem, bin",
+)
+@click.option(
+    "--depth",
+    callback=_parse_depth_option,
+    help="Zero-pad each memory image to this many words",
+)
+@click.option("-O", "optimize", is_flag=True, help="Run the peephole optimizer")
+@click.option(
+    "--rules",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Peephole rule file for -O (default: the standard library's)",
+)
+@click.option("-q", "--quiet", is_flag=True, help="Only report failures and the summary")
+def batch(
+    sources,
+    jobs,
+    output_dir,
+    symbols,
+    listing,
+    make_deps,
+    include,
+    no_stdlib,
+    parser_type,
+    no_cache,
+    formats,
+    depth,
+    optimize,
+    rules,
+    quiet,
+):
+    """Assemble many J1 programs in parallel.
+
+    SOURCES are .asm files, directories (searched recursively) or glob patterns.
+    """
+    logging.basicConfig(format="%(levelname)s: %(message)s", stream=sys.stderr)
+
+    try:
+        files = collect_sources(sources, include)
+    except FileNotFoundError as e:
+        raise click.UsageError(str(e))
+
+    start = time.perf_counter()
+    failed = 0
+    for result in run_batch(
+        files,
+        jobs=jobs,
+        output_dir=Path(output_dir) if output_dir else None,
+        use_cache=not no_cache,
+        make_deps=make_deps,
+        symbols=symbols,
+        listing=listing,
+        include=include,
+        no_stdlib=no_stdlib,
+        parser=parser_type,
+        formats=formats,
+        depth=depth,
+        optimize=optimize,
+        rules=rules,
+    ):
+        status = "ok" if result.ok else "FAILED"
+        failed += not result.ok
+        if not result.ok or not quiet:
+            click.echo(
+                f"{status:<7}{result.elapsed * 1e3:8.1f} ms {result.words:6d} words  "
+                f"{result.source}"
+            )
+            for message in result.messages:
+                click.echo(f"        {message}")
+
+    elapsed = time.perf_counter() - start
+    click.echo(
+        f"{len(files) - failed} assembled, {failed} failed in {elapsed:.2f} s"
+    )
+    if failed:
+        sys.exit(1)
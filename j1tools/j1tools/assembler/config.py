@@ -5,7 +5,7 @@ Configuration management for J1 assembler.
 import os
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 class AssemblerConfig:
     """Manages configuration settings for the J1 assembler."""
@@ -19,6 +19,11 @@ class AssemblerConfig:
         # Initialize paths
         self.include_paths: List[Path] = []
         self.stdlib_enabled = True
+
+        # Memoized include lookups
+        # Key: (filename, current directory)
+        # Value: resolved Path, or None if not found
+        self._resolved: Dict[Tuple[str, str], Optional[Path]] = {}
         
         # Get the default library path relative to this file
         self.stdlib_path = Path(__file__).parent / 'lib'
@@ -32,6 +37,7 @@ class AssemblerConfig:
         resolved_path = Path(path).resolve()
         if resolved_path not in self.include_paths:
             self.include_paths.append(resolved_path)
+            self._resolved.clear()
             self.logger.debug(f"Added include path: {resolved_path}")
             
     def resolve_include(self, filename: str, current_dir: str) -> Optional[Path]:
@@ -41,9 +47,20 @@ class AssemblerConfig:
         2. Explicit include paths
         3. Standard library (if enabled)
         
+        Lookups are memoized until the search paths change.
+
         Returns:
             Path object if file is found, None otherwise
         """
+        key = (filename, str(current_dir))
+        if key in self._resolved:
+            return self._resolved[key]
+        resolved = self._resolve_include(filename, current_dir)
+        self._resolved[key] = resolved
+        return resolved
+
+    def _resolve_include(self, filename: str, current_dir: str) -> Optional[Path]:
+        """Search the include paths for filename (uncached)."""
         self.logger.debug(f"Resolving include: {filename} from {current_dir}")
         
         # First check current directory
@@ -72,11 +89,13 @@ class AssemblerConfig:
     def disable_stdlib(self) -> None:
         """Disable the standard library include path."""
         self.stdlib_enabled = False
+        self._resolved.clear()
         self.logger.debug("Standard library disabled")
     
     def enable_stdlib(self) -> None:
         """Enable the standard library include path."""
         self.stdlib_enabled = True
+        self._resolved.clear()
         self.logger.debug("Standard library enabled")
     
     @property
@@ -0,0 +1,179 @@
+"""
+Grammar loading and parser caching for J1 assembler.
+
+Building a Lark parser from j1.lark is by far the most expensive part of
+creating a J1Assembler.  Parsers are therefore built once per process and
+shared by every assembler instance.  Parser types that Lark can serialize
+(LALR) are additionally cached on disk, keyed by the grammar hash and the
+Lark version, so a fresh process can skip grammar compilation entirely.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import lark
+from lark import Lark
+
+GRAMMAR_PATH = Path(__file__).parent / "j1.lark"
+
+# Parser types accepted by get_parser()
+PARSERS = ("lalr", "earley")
+
+# Parser types whose analysed tables can be written with Lark.save()
+DISK_CACHEABLE = ("lalr",)
+
+logger = logging.getLogger("j1asm.grammar")
+
+# Process-wide parser cache
+# Key: (grammar hash, lark version, parser type, inline transformer)
+# Value: Lark instance
+_parsers: Dict[Tuple[str, str, str, Any], Lark] = {}
+_lock = threading.Lock()
+_grammar_hash: Optional[str] = None
+
+
+def grammar_hash() -> str:
+    """Return the SHA-256 hex digest of j1.lark (computed once per process)."""
+    global _grammar_hash
+    if _grammar_hash is None:
+        if not GRAMMAR_PATH.exists():
+            raise FileNotFoundError(f"Grammar file not found: {GRAMMAR_PATH}")
+        _grammar_hash = hashlib.sha256(GRAMMAR_PATH.read_bytes()).hexdigest()
+    return _grammar_hash
+
+
+def cache_dir() -> Path:
+    """
+    Return the directory used for on-disk j1tools caches.
+
+    Resolved in this order:
+    1. $J1TOOLS_CACHE_DIR
+    2. $XDG_CACHE_HOME/j1tools
+    3. ~/.cache/j1tools
+    """
+    env_dir = os.environ.get("J1TOOLS_CACHE_DIR")
+    if env_dir:
+        return Path(env_dir)
+    xdg_dir = os.environ.get("XDG_CACHE_HOME")
+    if xdg_dir:
+        return Path(xdg_dir) / "j1tools"
+    return Path.home() / ".cache" / "j1tools"
+
+
+def parser_cache_path(parser: str) -> Path:
+    """Return the on-disk cache file for the given parser type."""
+    return cache_dir() / f"j1-{parser}-{grammar_hash()[:16]}-lark{lark.__version__}.cache"
+
+
+def _load_from_disk(parser: str, transformer: Any) -> Optional[Lark]:
+    """Load a previously saved parser, or return None if unavailable."""
+    path = parser_cache_path(parser)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            instance = Lark.load(f, transformer=transformer)
+        logger.debug(f"Loaded {parser} parser from cache: {path}")
+        return instance
+    except Exception as e:
+        # A stale or corrupt cache is never fatal, just rebuild it
+        logger.debug(f"Ignoring unreadable parser cache {path}: {e}")
+        return None
+
+
+def _save_to_disk(instance: Lark, parser: str) -> None:
+    """Write the parser to the disk cache atomically."""
+    path = parser_cache_path(parser)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            instance.save(f)
+        os.replace(tmp_name, path)
+        logger.debug(f"Saved {parser} parser to cache: {path}")
+    except OSError as e:
+        logger.debug(f"Could not write parser cache {path}: {e}")
+
+
+def _build_parser(parser: str, transformer: Any, use_disk_cache: bool) -> Lark:
+    """Build (or load) a parser of the given type."""
+    disk = use_disk_cache and parser in DISK_CACHEABLE
+
+    if disk:
+        instance = _load_from_disk(parser, transformer)
+        if instance is not None:
+            return instance
+
+    options = {}
+    if parser == "lalr":
+        options["lexer"] = "contextual"
+    if transformer is not None:
+        options["transformer"] = transformer
+
+    try:
+        instance = Lark.open(GRAMMAR_PATH, start="start", parser=parser, **options)
+    except Exception as e:
+        raise Exception(f"Failed to load grammar: {e}")
+    logger.debug(f"Compiled {parser} grammar from {GRAMMAR_PATH}")
+
+    if disk:
+        _save_to_disk(instance, parser)
+    return instance
+
+
+def get_parser(
+    parser: str = "lalr", transformer: Any = None, use_disk_cache: bool = True
+) -> Lark:
+    """
+    Return the shared parser for j1.lark.
+
+    The first call in a process compiles the grammar (or loads it from the
+    disk cache); every later call returns the same Lark instance.
+
+    Args:
+        parser: Lark parser type ("lalr" or "earley")
+        transformer: Callbacks run inline during parsing (LALR only)
+        use_disk_cache: Allow reading/writing the on-disk cache
+
+    Returns:
+        Shared Lark instance
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser type: {parser}")
+    if transformer is not None and parser != "lalr":
+        raise ValueError("Inline transformation requires the lalr parser")
+
+    key = (grammar_hash(), lark.__version__, parser, transformer)
+    instance = _parsers.get(key)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        instance = _parsers.get(key)
+        if instance is None:
+            instance = _build_parser(parser, transformer, use_disk_cache)
+            _parsers[key] = instance
+    return instance
+
+
+def clear_parser_cache(disk: bool = False) -> None:
+    """
+    Drop all shared parsers.
+
+    Args:
+        disk: Also delete the on-disk cache files for the current grammar
+    """
+    global _grammar_hash
+    with _lock:
+        _parsers.clear()
+        if disk:
+            for parser in DISK_CACHEABLE:
+                path = parser_cache_path(parser)
+                if path.exists():
+                    path.unlink()
+        _grammar_hash = None
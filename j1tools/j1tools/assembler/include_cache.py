@@ -0,0 +1,249 @@
+"""
+Cache of assembled include files.
+
+Including a library file (core/j1_base_macros.asm, io/terminal_io.asm, ...)
+means reading, parsing and transforming it again for every program that
+uses it.  An IncludeRecord captures everything an include contributed to
+the assembler -- its macro definitions, the statements handed to program()
+and the number of words it emitted -- so the same include can be replayed
+without running the parser.
+
+Records are keyed by the include's resolved path, a hash of its contents
+and a hash of the assembler toolchain itself.  They are kept in memory for
+the life of the process and written to the on-disk cache directory.  Only
+the latest record of each path is kept, in memory and on disk, so editing
+an include (e.g. under j1asm --watch) replaces its record instead of
+adding one per version.
+
+A record is only valid when the environment it was assembled in still
+holds: every nested include must resolve to the same unchanged file, and
+every externally defined macro it used must still have the same body.
+Includes whose result depends on more than that (ORG directives, generated
+control-structure labels, loop index warnings) are never cached.
+"""
+
+import os
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import lark
+
+from .grammar import GRAMMAR_PATH, cache_dir
+
+# Bump when the layout of IncludeRecord or the replayed events changes
+CACHE_FORMAT = 1
+
+logger = logging.getLogger("j1asm.cache")
+
+# Process-wide cache of pickled records
+# Key: cache key (see IncludeCache.key)
+# Value: pickled IncludeRecord (unpickled per use so replays never share objects)
+_memory: Dict[str, bytes] = {}
+# Key of the record held in _memory for each include
+# Key: resolved path, Value: cache key
+_latest: Dict[str, str] = {}
+_lock = threading.Lock()
+_toolchain_hash: Optional[str] = None
+
+
+def toolchain_hash() -> str:
+    """
+    Return a hash of everything that determines how source is assembled:
+    the grammar, the assembler modules and the Lark version.
+    """
+    global _toolchain_hash
+    if _toolchain_hash is None:
+        digest = hashlib.sha256()
+        digest.update(f"format={CACHE_FORMAT};lark={lark.__version__}".encode())
+        sources = [GRAMMAR_PATH] + sorted(Path(__file__).parent.glob("*.py"))
+        for path in sources:
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+        _toolchain_hash = digest.hexdigest()
+    return _toolchain_hash
+
+
+def _remember(path: str, key: str, data: bytes) -> None:
+    """Hold data in memory as the record of path, dropping its previous one."""
+    with _lock:
+        previous = _latest.get(path)
+        if previous is not None and previous != key:
+            _memory.pop(previous, None)
+        _latest[path] = key
+        _memory[key] = data
+
+
+def content_hash(data: bytes) -> str:
+    """Return the hash used to identify file contents."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def macro_fingerprint(definition: Any) -> Optional[Tuple]:
+    """
+    Return a comparable summary of a macro definition, or None if the name
+    is not a macro.  Covers everything an expansion copies into its output.
+    """
+    if definition is None:
+        return None
+    return tuple(
+        (inst.type.name, inst.value, inst.instr_text, inst.filename, inst.source_line)
+        for inst in definition.body
+    )
+
+
+@dataclass
+class IncludeRecord:
+    """Everything an include file contributed to the assembler."""
+
+    path: str  # Resolved path of the include file
+    content_hash: str  # Hash of the file contents
+    start_addr: int  # Word address the include was assembled at
+    size: int = 0  # Number of words emitted (nested includes included)
+
+    # Replay events in order:
+    #   ("macro", name, MacroDefinition)
+    #   ("program", filename, pickled statements passed to program())
+    events: List[Tuple] = field(default_factory=list)
+
+    # Nested includes: (filename, current_dir, resolved path, content hash)
+    includes: List[Tuple[str, str, str, str]] = field(default_factory=list)
+
+    # Names looked up that were defined outside the include
+    # Key: name, Value: macro_fingerprint() at the time (None = not a macro)
+    macro_deps: Dict[str, Optional[Tuple]] = field(default_factory=dict)
+
+
+class IncludeRecording:
+    """Collects an IncludeRecord while an include file is being assembled."""
+
+    def __init__(self, path: str, digest: str, start_addr: int, counters: Tuple[int, ...]):
+        self.record = IncludeRecord(path=path, content_hash=digest, start_addr=start_addr)
+        self.counters = counters  # Label counters when recording started
+        self.cacheable = True
+        self.defined: Set[str] = set()  # Macros defined while recording
+
+    def note_lookup(self, name: str, definition: Any) -> None:
+        """Remember how a name resolved, unless it was defined by this include."""
+        if name not in self.defined and name not in self.record.macro_deps:
+            self.record.macro_deps[name] = macro_fingerprint(definition)
+
+    def add_event(self, event: Tuple) -> None:
+        if event[0] == "macro":
+            self.defined.add(event[1])
+        self.record.events.append(event)
+
+    def finish(self, end_addr: int, counters: Tuple[int, ...]) -> Optional[IncludeRecord]:
+        """Return the finished record, or None if the include cannot be cached."""
+        if not self.cacheable or counters != self.counters:
+            return None
+        record = self.record
+        record.size = end_addr - record.start_addr
+        # Lookups of macros defined later in the same include are internal
+        for name in self.defined:
+            record.macro_deps.pop(name, None)
+        return record
+
+
+class IncludeCache:
+    """Memory and on-disk store of IncludeRecords."""
+
+    def __init__(self, directory: Optional[Path] = None, enabled: bool = True):
+        self.directory = Path(directory) if directory else cache_dir() / "includes"
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: str, digest: str) -> str:
+        """Return the cache key for an include file."""
+        return hashlib.sha256(f"{toolchain_hash()}:{path}:{digest}".encode()).hexdigest()
+
+    @staticmethod
+    def _path_id(path: str) -> str:
+        """Prefix shared by the on-disk records of one include."""
+        return hashlib.sha256(path.encode()).hexdigest()[:16]
+
+    def _disk_path(self, path: str, key: str) -> Path:
+        return self.directory / f"{self._path_id(path)}-{key}.pickle"
+
+    def get(self, path: str, digest: str) -> Optional[IncludeRecord]:
+        """Return a fresh copy of the cached record, or None."""
+        if not self.enabled:
+            return None
+
+        key = self.key(path, digest)
+        data = _memory.get(key)
+        if data is None:
+            disk_path = self._disk_path(path, key)
+            if disk_path.exists():
+                try:
+                    data = disk_path.read_bytes()
+                except OSError as e:
+                    logger.debug(f"Could not read include cache {disk_path}: {e}")
+                if data is not None:
+                    _remember(path, key, data)
+
+        if data is None:
+            self.misses += 1
+            return None
+
+        try:
+            record = pickle.loads(data)
+        except Exception as e:
+            # A stale or corrupt entry is never fatal, just assemble normally
+            logger.debug(f"Ignoring unreadable include cache entry for {path}: {e}")
+            with _lock:
+                _memory.pop(key, None)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return record
+
+    def put(self, record: IncludeRecord) -> None:
+        """Store a record in memory and on disk, replacing older ones of its path."""
+        if not self.enabled:
+            return
+
+        key = self.key(record.path, record.content_hash)
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        _remember(record.path, key, data)
+
+        disk_path = self._disk_path(record.path, key)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, disk_path)
+            logger.debug(f"Cached include {record.path} as {disk_path}")
+        except OSError as e:
+            logger.debug(f"Could not write include cache {disk_path}: {e}")
+            return
+
+        # Earlier versions of the file, or records of another toolchain
+        for stale in self.directory.glob(f"{self._path_id(record.path)}-*.pickle"):
+            if stale != disk_path:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+
+
+def clear_include_cache(directory: Optional[Path] = None) -> None:
+    """Drop the in-memory records and delete the on-disk ones."""
+    global _toolchain_hash
+    with _lock:
+        _memory.clear()
+        _latest.clear()
+        _toolchain_hash = None
+    directory = Path(directory) if directory else cache_dir() / "includes"
+    if directory.exists():
+        for path in directory.glob("*.pickle"):
+            path.unlink()
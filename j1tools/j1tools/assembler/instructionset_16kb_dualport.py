@@ -77,3 +77,35 @@ JUMP_OPS = {
     "ZJMP": INST_TYPES["0branch"],  # 0x2000
     "CALL": INST_TYPES["scall"],  # 0x4000
 }
+
+# Key: field value, Value: its j1asm name
+_ALU_NAMES = {value: name for name, value in ALU_OPS.items()}
+_EFFECT_NAMES = {value: name for name, value in STACK_EFFECTS.items() if name != "RET"}
+_D_NAMES = {value: name for name, value in D_EFFECTS.items() if value}
+_R_NAMES = {value: name for name, value in R_EFFECTS.items() if value}
+_JUMP_NAMES = {value: name for name, value in JUMP_OPS.items()}
+
+
+def mnemonic(insn: int) -> str:
+    """
+    The j1asm text of an instruction word: a literal (#$1234), a jump to a
+    word address (CALL $0123) or an ALU operation with its modifiers
+    (rT[T->N,r-1,d+1]).  ALU codes not in the instruction set show as $xx.
+    """
+    if insn & INST_TYPES["imm"]:
+        return f"#${insn & 0x7FFF:04X}"
+    if insn & 0xE000 != INST_TYPES["alu"]:
+        return f"{_JUMP_NAMES[insn & 0xE000]} ${insn & 0x1FFF:04X}"
+    text = _ALU_NAMES.get(insn & 0x1F00, f"${(insn >> 8) & 0x1F:02X}")
+    modifiers = []
+    if insn & 0x70:
+        modifiers.append(_EFFECT_NAMES[insn & 0x70])
+    if insn & STACK_EFFECTS["RET"]:
+        modifiers.append("RET")
+    if insn & 0x0C:
+        modifiers.append(_R_NAMES[insn & 0x0C])
+    if insn & 0x03:
+        modifiers.append(_D_NAMES[insn & 0x03])
+    if modifiers:
+        text += f"[{','.join(modifiers)}]"
+    return text
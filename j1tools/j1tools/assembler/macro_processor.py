@@ -3,6 +3,7 @@ Macro processing for J1 assembler.
 Handles macro definitions, expansion, and validation.
 """
 
+import sys
 import logging
 from typing import Dict, List, Set, Optional, Any, Tuple
 from lark import Token, Tree
@@ -76,6 +77,20 @@ class MacroProcessor:
             defined_at=f"{self.current_file}:{token.line if token else 'unknown'}",
         )
 
+    def restore_macro(self, name: str, definition: MacroDefinition) -> None:
+        """
+        Add a previously built macro definition (e.g. from the include cache).
+
+        Raises:
+            ValueError: If the macro is already defined
+        """
+        if name in self.macros:
+            raise ValueError(
+                f"{self.current_file}: Duplicate macro definition: {name} "
+                f"(from {definition.defined_at})"
+            )
+        self.macros[name] = definition
+
     def process_macro_def(self, items):
         """Process a macro definition."""
         _, name_token, stack_comment, body_tree, _ = items
@@ -150,16 +165,12 @@ class MacroProcessor:
         expanded = []
         for instr in macro.body:
             # Create a new instruction with updated metadata
-            new_instr = InstructionMetadata(
-                type=instr.type,
-                value=instr.value,
-                token=token,
-                filename=instr.filename,
+            # Position is the call site; the listed source stays the body's
+            new_instr = instr.copy(
                 line=token.line,
                 column=token.column,
-                source_line=instr.source_line,
-                instr_text=instr.instr_text,
-                macro_name=name,
+                lines=instr.source_line,
+                macro_name=sys.intern(name),
                 opt_name=None,
                 label_name=None,
                 word_addr=self.addr_space.advance()
@@ -0,0 +1,367 @@
+"""
+Peephole optimization of assembled programs (j1asm -O).
+
+Macros expand verbatim, so sequences such as "swap swap" or "dup >r" end
+up in the image.  The optimizer rewrites them using a table of rules read
+from a file, by default lib/peephole.rules:
+
+    include "platform/j1_16kb_dualport_macros.asm"
+    swap-swap:  swap swap  =>
+    dup-tor:    dup >r     => dup>r
+
+The patterns and replacements are assembled once, with the rule file's
+includes, and match instruction words exactly.  optimize() runs after
+the whole program is assembled and before outputs are written: it
+rewrites each run of code between ORGs, packs the remaining words down
+to the run's start, and then moves the labels and re-resolves jumps and
+label references.  A pattern never spans a label, so whatever jumps to
+or returns into the middle of a pattern still finds its instruction; a
+label on a pattern's first word moves to the first word that replaces it.
+
+Two rewrites need more than a pattern and are built in.  A ";" (a bare
+T[RET,r-1]) after an ALU instruction that leaves the return stack and
+the interrupt enable alone is folded into it as RET,r-1 (ret-fold), and
+"CALL x ;" becomes "JMP x" (tail-call).  Each saves the cycle of the ";", and its word too unless
+the ";" is a branch target, in which case it stays for the branches.
+
+Rewritten words carry the rule's name in opt_name, which the listing
+shows; a word that follows a removed sequence notes "after <rule>".
+
+Usage: j1asm prog.asm -O [--rules my.rules] --listing
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .asm_types import InstructionMetadata, InstructionType
+from .instructionset_16kb_dualport import JUMP_OPS, R_EFFECTS, STACK_EFFECTS, mnemonic
+
+# Rules used by -O unless --rules names another file
+DEFAULT_RULES = Path(__file__).parent / "lib" / "peephole.rules"
+
+# name: pattern => replacement
+_RULE = re.compile(r"^\s*([^\s:]+)\s*:(.*)=>(.*)$")
+
+# ; as the base macros emit it: T[RET,r-1]
+RETURN = 0x6000 | STACK_EFFECTS["RET"] | R_EFFECTS["r-1"]
+
+# Effects a RET can't be folded into: T->R writes the return address, and
+# fDINT/fEINT set the interrupt enable that a RET takes from rst0[15]
+_NO_FOLD = (STACK_EFFECTS["T->R"], STACK_EFFECTS["fDINT"], STACK_EFFECTS["fEINT"])
+
+# Rule files already assembled
+# Key: resolved path
+# Value: (modification times of the files read, the files, the rules)
+_loaded: Dict[str, Tuple[Tuple[int, ...], Tuple[Path, ...], List["Rule"]]] = {}
+
+
+def _mtimes(files: Iterable[Path]) -> Tuple[int, ...]:
+    return tuple(path.stat().st_mtime_ns for path in files)
+
+@dataclass
+class Rule:
+    """A rewrite of one instruction sequence into a shorter one."""
+
+    name: str
+    pattern: Tuple[int, ...]
+    replacement: Tuple[int, ...]
+    texts: Tuple[str, ...]  # j1asm text of each replacement word
+    line: int  # Line of the rule file
+
+    @property
+    def saved(self) -> int:
+        """Words, and cycles per execution, saved by each rewrite."""
+        return len(self.pattern) - len(self.replacement)
+
+
+class Rewrite(NamedTuple):
+    """One application of a rule or fold."""
+
+    name: str
+    word_addr: int  # Address of the first word rewritten, before optimization
+    words: int  # Words saved
+    cycles: int  # Cycles saved each time the word at word_addr executes
+
+
+class _Item:
+    """An instruction being optimized, with the labels that point at it."""
+
+    __slots__ = ("inst", "origin", "labels")
+
+    def __init__(self, inst: InstructionMetadata, origin: int, labels: List[str]):
+        self.inst = inst
+        self.origin = origin
+        self.labels = labels
+
+
+def load_rules(path=DEFAULT_RULES) -> List[Rule]:
+    """
+    Read and assemble a rule file.  Lines that aren't rules (comments,
+    includes, macro definitions) are assembled as they are.
+    """
+    from .asm import J1Assembler
+
+    path = Path(path)
+    key = str(path.resolve())
+    loaded = _loaded.get(key)
+    if loaded is not None:
+        mtimes, files, rules = loaded
+        try:
+            if _mtimes(files) == mtimes:
+                return rules
+        except OSError:
+            pass
+    lines = path.read_text().splitlines()
+    # Key: rule number, Value: (name, line number)
+    found: Dict[int, Tuple[str, int]] = {}
+    names = set()
+    for number, line in enumerate(lines, 1):
+        rule = _RULE.match(line.split("//", 1)[0])
+        if not rule:
+            continue
+        name, pattern, replacement = rule.groups()
+        if name in names:
+            raise ValueError(f"{path}:{number}: Duplicate rule: {name}")
+        names.add(name)
+        # Label both halves on the rule's own line so errors point at it
+        n = len(found)
+        lines[number - 1] = f": __pattern_{n} {pattern} : __replacement_{n} {replacement}"
+        found[n] = (name, number)
+    lines.append(": __pattern_end")
+
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse("\n".join(lines) + "\n", str(path)))
+    labels = assembler.labels
+    metadata = assembler.instruction_metadata
+
+    def words(start: int, end: int, name: str, number: int) -> List[InstructionMetadata]:
+        insts = [metadata[addr] for addr in range(start, end)]
+        if any(inst.type != InstructionType.BYTE_CODE for inst in insts):
+            raise ValueError(
+                f"{path}:{number}: Rule {name} may only use ALU instructions and literals"
+            )
+        return insts
+
+    rules = []
+    for n, (name, number) in found.items():
+        end = labels[f"__pattern_{n + 1}"] if n + 1 in found else labels["__pattern_end"]
+        pattern = words(labels[f"__pattern_{n}"], labels[f"__replacement_{n}"], name, number)
+        replacement = words(labels[f"__replacement_{n}"], end, name, number)
+        if len(replacement) >= len(pattern):
+            raise ValueError(
+                f"{path}:{number}: Rule {name} must replace its pattern with fewer words"
+            )
+        rules.append(Rule(
+            name,
+            tuple(inst.value for inst in pattern),
+            tuple(inst.value for inst in replacement),
+            tuple(inst.instr_text for inst in replacement),
+            number,
+        ))
+    files = (path.resolve(), *assembler.included_files())
+    _loaded[key] = (_mtimes(files), files, rules)
+    return rules
+
+
+def rule_files(path=DEFAULT_RULES) -> List[Path]:
+    """The rule file and every file it includes, which -O output depends on."""
+    load_rules(path)
+    return list(_loaded[str(Path(path).resolve())][1])
+
+
+def _regions(addresses: List[int], origins: Iterable[int]) -> List[Tuple[int, int]]:
+    """Split sorted word addresses into [start, end) runs broken at gaps and ORGs."""
+    origins = set(origins)
+    regions = []
+    for addr in addresses:
+        if regions and regions[-1][1] == addr and addr not in origins:
+            regions[-1][1] = addr + 1
+        else:
+            regions.append([addr, addr + 1])
+    return [tuple(region) for region in regions]
+
+
+def _match(items: List[_Item], i: int, rules: Dict[int, List[Rule]]) -> Optional[Rule]:
+    """The first rule whose pattern starts at items[i] and crosses no label."""
+    first = items[i].inst
+    if first.type != InstructionType.BYTE_CODE:
+        return None
+    for rule in rules.get(first.value, ()):
+        n = len(rule.pattern)
+        if i + n > len(items):
+            continue
+        if all(
+            items[i + k].inst.type == InstructionType.BYTE_CODE
+            and items[i + k].inst.value == rule.pattern[k]
+            and not items[i + k].labels
+            for k in range(1, n)
+        ):
+            return rule
+    return None
+
+
+def _fold_return(item: _Item, ret: _Item) -> Optional[str]:
+    """Fold ret, if it is a bare ;, into the instruction before it; name the fold."""
+    inst = item.inst
+    if ret.inst.type != InstructionType.BYTE_CODE or ret.inst.value != RETURN:
+        return None
+    if inst.type == InstructionType.BYTE_CODE:
+        # An ALU instruction that doesn't return, touch the return stack
+        # or change the interrupt enable
+        if (inst.value & 0xE000 != 0x6000 or inst.value & (STACK_EFFECTS["RET"] | 0x0C)
+                or inst.value & 0x70 in _NO_FOLD):
+            return None
+        value = inst.value | RETURN
+        text = mnemonic(value)
+        name = "ret-fold"
+    elif inst.type == InstructionType.JUMP and inst.value & 0xE000 == JUMP_OPS["CALL"]:
+        value = (inst.value & 0x1FFF) | JUMP_OPS["JMP"]
+        text = f"JMP '{inst.label_name}"
+        name = "tail-call"
+    else:
+        return None
+    opt_name = f"{inst.opt_name}, {name}" if inst.opt_name else name
+    item.inst = inst.copy(value=value, instr_text=text, opt_name=opt_name)
+    return name
+
+
+def optimize(assembler, rules: List[Rule], fold_returns: bool = True) -> List[Rewrite]:
+    """
+    Apply rules to an assembled program until none matches, then fold
+    returns, updating its instructions, labels and jumps in place.
+    Returns the rewrites made.
+    """
+    if not assembler.is_assembled:
+        raise ValueError("Cannot optimize before assembling")
+
+    # Key: first pattern word, Value: rules starting with it, longest first
+    by_first: Dict[int, List[Rule]] = defaultdict(list)
+    for rule in sorted(rules, key=lambda rule: -len(rule.pattern)):
+        by_first[rule.pattern[0]].append(rule)
+    longest = max((len(rule.pattern) for rule in rules), default=1)
+
+    metadata = assembler.instruction_metadata
+    # Key: word address, Value: names of the labels there
+    labels_at: Dict[int, List[str]] = defaultdict(list)
+    for name, addr in assembler.labels.items():
+        labels_at[addr].append(name)
+
+    regions = _regions(sorted(metadata), assembler.addr_space.origins)
+    starts = {start for start, _ in regions}
+    placed: Dict[int, InstructionMetadata] = {}
+    moved: Dict[str, int] = {}
+    rewrites: List[Rewrite] = []
+    for start, end in regions:
+        items = [_Item(metadata[addr], addr, labels_at.pop(addr, [])) for addr in range(start, end)]
+        # Labels just past the run move with its end, unless an ORG fixes them
+        trailing = [] if end in starts else labels_at.pop(end, [])
+
+        i = 0
+        while i < len(items):
+            rule = _match(items, i, by_first)
+            if rule is None:
+                i += 1
+                continue
+            first = items[i]
+            replacement = [
+                _Item(
+                    first.inst.copy(value=value, instr_text=text, opt_name=rule.name,
+                                    macro_name=None, num_value=-1),
+                    first.origin,
+                    [],
+                )
+                for value, text in zip(rule.replacement, rule.texts)
+            ]
+            after = i + len(rule.pattern)
+            if replacement:
+                replacement[0].labels = first.labels
+            elif after < len(items):
+                items[after].labels = first.labels + items[after].labels
+                items[after].inst.opt_name = f"after {rule.name}"
+            else:
+                trailing = first.labels + trailing
+            items[i:after] = replacement
+            rewrites.append(Rewrite(rule.name, first.origin, rule.saved, rule.saved))
+            # The rewrite may complete a pattern that starts a little earlier
+            i = max(i - longest + 1, 0)
+
+        if fold_returns:
+            i = 0
+            while i + 1 < len(items):
+                fold = _fold_return(items[i], items[i + 1])
+                if fold:
+                    # The ; stays for whatever branches to it
+                    words = 0 if items[i + 1].labels else 1
+                    if words:
+                        del items[i + 1]
+                    rewrites.append(Rewrite(fold, items[i].origin, words, 1))
+                i += 1
+
+        addr = start
+        for item in items:
+            item.inst.word_addr = addr
+            placed[addr] = item.inst
+            for name in item.labels:
+                moved[name] = addr
+            addr += 1
+        for name in trailing:
+            moved[name] = addr
+
+    if not rewrites:
+        return rewrites
+
+    assembler.labels.update(moved)
+    label_metadata = {}
+    for label in assembler.label_metadata.values():
+        label.word_addr = assembler.labels[label.label_name]
+        label_metadata[label.word_addr] = label
+    assembler.label_metadata = label_metadata
+
+    for inst in placed.values():
+        if inst.label_name not in assembler.labels:
+            continue
+        target = assembler.labels[inst.label_name]
+        if inst.type == InstructionType.JUMP:
+            inst.value = (inst.value & 0xE000) | target
+        elif inst.type == InstructionType.LABEL_REF:
+            inst.value = 0x8000 | (target << 1)
+
+    assembler.instruction_metadata = placed
+    assembler.instructions = [placed[addr] for addr in sorted(placed)]
+    assembler._memory_image = None
+    return rewrites
+
+
+def format_stats(rewrites: List[Rewrite], counts: Optional[Sequence[int]] = None) -> str:
+    """
+    Hits and words saved per rule.  With counts (executions of each word
+    address of the unoptimized program, e.g. ProfilingJ1.hits) also the
+    cycles saved.
+    """
+    # Key: rule name, Value: [hits, words saved, cycles saved]
+    totals: Dict[str, List[int]] = {}
+    for rewrite in rewrites:
+        total = totals.setdefault(rewrite.name, [0, 0, 0])
+        total[0] += 1
+        total[1] += rewrite.words
+        if counts is not None:
+            total[2] += counts[rewrite.word_addr] * rewrite.cycles
+    header = f"{'RULE':<16} {'HITS':>5} {'WORDS':>6}"
+    if counts is not None:
+        header += f" {'CYCLES':>10}"
+    lines = [header]
+    for name, (hits, words, cycles) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        line = f"{name:<16} {hits:>5} {words:>6}"
+        if counts is not None:
+            line += f" {cycles:>10}"
+        lines.append(line)
+    hits = sum(total[0] for total in totals.values())
+    words = sum(total[1] for total in totals.values())
+    line = f"{'total':<16} {hits:>5} {words:>6}"
+    if counts is not None:
+        line += f" {sum(total[2] for total in totals.values()):>10}"
+    lines.append(line)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,272 @@
+"""
+Watch mode for the J1 assembler.
+
+`j1asm --watch` keeps one process resident: the compiled grammar, the
+include cache (macro tables, labels and instructions of every included
+file) and the include search results stay in memory between builds.
+When the main source or any file it includes changes, only the main file
+and the includes whose contents changed are parsed again; everything else
+is replayed from the include cache before the outputs are rewritten.
+
+File changes are picked up with inotify on Linux, falling back to polling
+file stats everywhere else.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+import ctypes
+import ctypes.util
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from .asm import assemble_file
+from .include_cache import IncludeCache
+
+logger = logging.getLogger("j1asm.watch")
+
+# Nanoseconds a file's mtime may trail the wall clock
+MTIME_SLACK = 10_000_000
+
+# File identity used to decide whether a watched file really changed
+# (mtime, size, inode), or None if the file does not exist
+Signature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class PollingWatcher:
+    """Detects changes by comparing file stats at a fixed interval."""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        # Key: watched path, Value: signature when last seen
+        self.signatures: Dict[Path, Signature] = {}
+
+    def watch(self, paths: Iterable[Path], baseline: Optional[Dict[Path, Signature]] = None) -> None:
+        """
+        Replace the set of watched files.  A file in baseline is compared
+        against the signature given there (e.g. from before a build read
+        it) rather than its current one.
+        """
+        baseline = baseline or {}
+        self.signatures = {
+            Path(p): baseline[Path(p)] if Path(p) in baseline else file_signature(Path(p))
+            for p in paths
+        }
+
+    def changed(self) -> Set[Path]:
+        """Return the watched files whose signature changed since last seen."""
+        changed = set()
+        for path, old in self.signatures.items():
+            new = file_signature(path)
+            if new != old:
+                self.signatures[path] = new
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Block until a watched file changes (or timeout); return the changed files."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self.changed()
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher(PollingWatcher):
+    """
+    Detects changes with Linux inotify.
+
+    The directories holding the watched files are watched rather than the
+    files themselves, so editors that save by writing a new file and
+    renaming it over the old one are still seen.
+    """
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE
+    )
+
+    # struct inotify_event: int wd; uint32 mask, cookie, len; char name[len]
+    EVENT = struct.Struct("iIII")
+
+    # Time to wait for the rest of a burst of events (e.g. write + rename)
+    SETTLE = 0.02
+
+    def __init__(self, interval: float = 0.25):
+        super().__init__(interval)
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # Key: watched directory, Value: watch descriptor
+        self._dirs: Dict[Path, int] = {}
+
+    def watch(self, paths: Iterable[Path], baseline: Optional[Dict[Path, Signature]] = None) -> None:
+        super().watch(
+            (Path(p).resolve() for p in paths),
+            {Path(p).resolve(): signature for p, signature in (baseline or {}).items()},
+        )
+        wanted = {path.parent for path in self.signatures}
+
+        for directory in set(self._dirs) - wanted:
+            self._libc.inotify_rm_watch(self._fd, self._dirs.pop(directory))
+        for directory in wanted - set(self._dirs):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), self.MASK
+            )
+            if wd < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, f"Cannot watch {directory}: {os.strerror(err)}")
+            self._dirs[directory] = wd
+
+    def _drain(self) -> None:
+        """Read and discard pending events."""
+        while select.select([self._fd], [], [], 0)[0]:
+            data = os.read(self._fd, 65536)
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size + length
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not select.select([self._fd], [], [], remaining)[0]:
+                return set()
+            # Let the rest of the burst arrive, then check what actually changed
+            time.sleep(self.SETTLE)
+            self._drain()
+            changed = self.changed()
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(interval: float = 0.25) -> PollingWatcher:
+    """Return an inotify watcher if the platform supports it, else a polling one."""
+    try:
+        return InotifyWatcher(interval)
+    except (OSError, AttributeError) as e:
+        logger.debug(f"inotify unavailable ({e}), polling every {interval}s")
+        return PollingWatcher(interval)
+
+
+class AssemblyDaemon:
+    """Re-assembles a program whenever it or one of its includes changes."""
+
+    def __init__(
+        self,
+        input: str,
+        output: str,
+        symbols: bool = False,
+        listing: bool = False,
+        include: Tuple[str, ...] = (),
+        no_stdlib: bool = False,
+        parser: str = "lalr",
+        debug: bool = False,
+        no_cache: bool = False,
+        depfile: Optional[str] = None,
+        formats: Tuple[str, ...] = (),
+        depth: Optional[int] = None,
+        optimize: bool = False,
+        rules: Optional[str] = None,
+    ):
+        self.input = Path(input)
+        self.options = dict(
+            output=output,
+            symbols=symbols,
+            listing=listing,
+            include=include,
+            no_stdlib=no_stdlib,
+            parser=parser,
+            debug=debug,
+            depfile=depfile,
+            formats=formats,
+            depth=depth,
+            optimize=optimize,
+            rules=rules,
+        )
+        # Shared by every build so unchanged includes are never parsed twice
+        self.include_cache = IncludeCache(enabled=not no_cache)
+        # Files the last successful build depended on
+        self.files: Set[Path] = {self.input}
+        # Signatures of the files as the last build found them, so edits
+        # saved while it ran still count as changes
+        self.signatures: Dict[Path, Signature] = {}
+
+    def build(self) -> bool:
+        """Assemble once and rewrite the outputs; return True on success."""
+        start = time.perf_counter()
+        # File times come from a coarser clock, so allow for some lag
+        started = time.time_ns() - MTIME_SLACK
+        self.signatures = {path: file_signature(path) for path in self.files}
+        try:
+            assembler = assemble_file(
+                str(self.input), include_cache=self.include_cache, **self.options
+            )
+        except Exception as e:
+            # Keep watching the previous files so the error can be fixed
+            logger.error(str(e))
+            return False
+
+        # Under -O the rule file and its includes are inputs too
+        self.files = {self.input, *assembler.included_files(), *assembler.rule_files}
+        for path in self.files - set(self.signatures):
+            # A file first read by this build and modified since it started
+            # may have been read before the edit: have it count as changed
+            signature = file_signature(path)
+            self.signatures[path] = signature if signature and signature[0] < started else None
+        elapsed = (time.perf_counter() - start) * 1e3
+        logger.info(f"Assembled {self.input} in {elapsed:.1f} ms")
+        return True
+
+    def run(self, poll_interval: float = 0.25, watcher: Optional[PollingWatcher] = None) -> None:
+        """Build, then rebuild on every change until interrupted."""
+        watcher = watcher or create_watcher(poll_interval)
+        try:
+            self.build()
+            watcher.watch(self.files, self.signatures)
+            logger.info(f"Watching {len(self.files)} file(s), press Ctrl-C to stop")
+            while True:
+                changed = watcher.wait()
+                for path in sorted(changed):
+                    logger.info(f"Changed: {path}")
+                self.build()
+                watcher.watch(self.files, self.signatures)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+        finally:
+            watcher.close()
@@ -0,0 +1,16 @@
+"""Bitstream tools for J1 CPU: patch the program memory of a prebuilt .bit file"""
+
+from .bitfile import Bitstream
+from .mmi import BitLane, MemoryMap, read_mmi
+from .bram import BramMap
+from .patch import extract_image, patch_bitstream
+
+__all__ = [
+    "Bitstream",
+    "BitLane",
+    "MemoryMap",
+    "read_mmi",
+    "BramMap",
+    "extract_image",
+    "patch_bitstream",
+]
@@ -0,0 +1,246 @@
+"""
+Xilinx 7-series .bit files: header, configuration packets and CRC.
+
+A .bit file is a short header (design name, part, date, time) followed by
+the configuration stream: a sync word, then type 1/type 2 packets that
+write 32-bit words to configuration registers.  The frame data is one
+long write to the FDRI register; a write to the CRC register afterwards
+checks a CRC-32C over every register write since the last CRC reset.
+
+Frame words can be changed in place; on save the checked CRC is updated
+from the changed words alone, so a patch never re-reads the whole stream.
+"""
+
+import sys
+import struct
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+SYNC_WORD = b"\xaa\x99\x55\x66"
+
+# Configuration registers used here
+REG_CRC = 0x00
+REG_FDRI = 0x02
+REG_CMD = 0x04
+REG_IDCODE = 0x0C
+
+CMD_RCRC = 0x07  # Reset the CRC
+
+# Words per configuration frame on 7-series devices
+FRAME_WORDS = 101
+
+CRC_POLY = 0x82F63B78  # CRC-32C, bit-reflected
+
+
+def _zero_shift_tables(bits: int) -> List[List[int]]:
+    """
+    Byte tables for clocking `bits` zero bits through the CRC register.
+    The shift is linear, so crc' = T0[b0] ^ T1[b1] ^ T2[b2] ^ T3[b3].
+    """
+    tables = []
+    for byte in range(4):
+        table = []
+        for value in range(256):
+            crc = value << (8 * byte)
+            for _ in range(bits):
+                crc = (crc >> 1) ^ (CRC_POLY if crc & 1 else 0)
+            table.append(crc)
+        tables.append(table)
+    return tables
+
+
+_SHIFT32 = _zero_shift_tables(32)
+_SHIFT5 = _zero_shift_tables(5)
+_SHIFT37 = _zero_shift_tables(37)
+
+
+def _shift(tables: List[List[int]], crc: int) -> int:
+    t0, t1, t2, t3 = tables
+    return t0[crc & 0xFF] ^ t1[(crc >> 8) & 0xFF] ^ t2[(crc >> 16) & 0xFF] ^ t3[crc >> 24]
+
+
+def crc_update(crc: int, register: int, word: int) -> int:
+    """Add one register write to the configuration CRC."""
+    # 32 data bits then the 5-bit register address, LSB first
+    return _shift(_SHIFT5, _shift(_SHIFT32, crc ^ word) ^ register)
+
+
+class Bitstream:
+    """A parsed 7-series .bit file whose frame data can be edited."""
+
+    def __init__(self, data: bytes):
+        self.fields, payload = self._parse_header(data)
+        sync = data.find(SYNC_WORD, payload)
+        if sync < 0:
+            raise ValueError("No sync word: not a configuration bitstream")
+        # Everything up to and including the sync word is kept verbatim
+        self._prefix = data[: sync + 4]
+        body = data[sync + 4 :]
+        self._suffix = body[len(body) - len(body) % 4 :]
+        self.words = array("I")
+        self.words.frombytes(body[: len(body) - len(body) % 4])
+        if sys.byteorder == "little":
+            self.words.byteswap()
+
+        self.idcode: Optional[int] = None
+        self.frame_start = 0  # Index of the first frame word in self.words
+        self.frame_count = 0
+        # Original value of every changed word
+        # Key: index in self.words, Value: value before the first change
+        self._original: Dict[int, int] = {}
+        # Writes between the frame data and the CRC check that covers it
+        self._crc_index: Optional[int] = None
+        self._crc_steps_after_frames = 0
+        self._parse_packets()
+
+    @classmethod
+    def read(cls, path) -> "Bitstream":
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    @property
+    def part(self) -> str:
+        """Part name from the header, e.g. "7s50csga324"."""
+        return self.fields.get("b", "")
+
+    @staticmethod
+    def _parse_header(data: bytes) -> Tuple[Dict[str, str], int]:
+        """Return the header fields and the offset of the configuration data."""
+        fields: Dict[str, str] = {}
+        try:
+            # A length-prefixed magic field, then the key of the first field
+            (length,) = struct.unpack_from(">H", data, 0)
+            offset = 2 + length
+            (length,) = struct.unpack_from(">H", data, offset)
+            key = chr(data[offset + 2])
+            offset += 2 + length
+            while key != "e":
+                (length,) = struct.unpack_from(">H", data, offset)
+                fields[key] = data[offset + 2 : offset + 2 + length].rstrip(b"\0").decode()
+                offset += 2 + length
+                key = chr(data[offset])
+                offset += 1
+            return fields, offset + 4
+        except (struct.error, IndexError, UnicodeDecodeError):
+            # No .bit header (a raw .bin stream)
+            return {}, 0
+
+    def _parse_packets(self) -> None:
+        words = self.words
+        index = 0
+        register = None
+        frames_end = None
+        counted = 0
+        while index < len(words):
+            header = words[index]
+            index += 1
+            kind = header >> 29
+            if kind == 1:
+                opcode = (header >> 27) & 3
+                register = (header >> 13) & 0x3FFF
+                count = header & 0x7FF
+            elif kind == 2 and register is not None:
+                opcode = (header >> 27) & 3
+                count = header & 0x7FFFFFF
+            else:
+                continue
+            if opcode != 2:
+                index += count
+                continue
+
+            if register == REG_FDRI and count:
+                if self.frame_count:
+                    raise ValueError("Bitstreams with more than one frame data write are not supported")
+                self.frame_start = index
+                self.frame_count = count // FRAME_WORDS
+                frames_end = index + count
+            elif register == REG_IDCODE and count:
+                self.idcode = words[index]
+            elif register == REG_CRC and frames_end is not None and self._crc_index is None:
+                self._crc_index = index
+                self._crc_steps_after_frames = counted
+            elif register == REG_CMD and count and words[index] == CMD_RCRC:
+                if frames_end is not None and self._crc_index is None:
+                    frames_end = None  # CRC reset before any check: nothing to fix up
+            if frames_end is not None and register != REG_FDRI and self._crc_index is None:
+                counted += count
+            index += count
+
+        if not self.frame_count:
+            raise ValueError("No frame data found in bitstream")
+
+    def frame_word(self, frame: int, offset: int) -> int:
+        return self.words[self.frame_start + frame * FRAME_WORDS + offset]
+
+    def set_frame_word(self, frame: int, offset: int, value: int) -> None:
+        index = self.frame_start + frame * FRAME_WORDS + offset
+        if index not in self._original:
+            self._original[index] = self.words[index]
+        self.words[index] = value
+
+    def _fix_crc(self) -> None:
+        """Update the CRC check for the changed frame words."""
+        if self._crc_index is None:
+            return
+        changed = sorted(i for i, old in self._original.items() if self.words[i] != old)
+        if not changed:
+            return
+
+        # The CRC is linear, so the new CRC is the old one XOR the CRC of
+        # the change (zero except at the changed words)
+        words, original = self.words, self._original
+        frames_end = self.frame_start + self.frame_count * FRAME_WORDS
+        delta = 0
+        for index in range(changed[0], frames_end):
+            word = words[index] ^ original[index] if index in original else 0
+            delta = _shift(_SHIFT37, delta ^ word)
+        for _ in range(self._crc_steps_after_frames):
+            delta = _shift(_SHIFT37, delta)
+
+        self.words[self._crc_index] ^= delta
+        self._original = {i: words[i] for i in self._original}
+
+    def to_bytes(self) -> bytes:
+        self._fix_crc()
+        words = array("I", self.words)
+        if sys.byteorder == "little":
+            words.byteswap()
+        return self._prefix + words.tobytes() + self._suffix
+
+    def write(self, path) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    def compute_crc(self) -> Optional[int]:
+        """
+        Recompute the CRC checked after the frame data from scratch (slow;
+        for verification).  Returns None if the stream has no CRC check.
+        """
+        if self._crc_index is None:
+            return None
+        words = self.words
+        crc = 0
+        index = 0
+        register = None
+        while index < len(words):
+            header = words[index]
+            index += 1
+            kind = header >> 29
+            if kind == 1:
+                opcode, register, count = (header >> 27) & 3, (header >> 13) & 0x3FFF, header & 0x7FF
+            elif kind == 2 and register is not None:
+                opcode, count = (header >> 27) & 3, header & 0x7FFFFFF
+            else:
+                continue
+            if opcode == 2:
+                if register == REG_CRC and index == self._crc_index:
+                    return crc
+                for word in words[index : index + count]:
+                    if register == REG_CRC:
+                        crc = 0
+                        continue
+                    crc = crc_update(crc, register, word)
+                    if register == REG_CMD and word == CMD_RCRC:
+                        crc = 0
+            index += count
+        return None
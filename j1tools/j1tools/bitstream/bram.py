@@ -0,0 +1,184 @@
+"""
+Block RAM contents in 7-series configuration frames.
+
+Block RAM contents have their own frames (block type 1), after all the
+logic configuration frames.  In each clock-region row, every BRAM column
+has 128 content frames, and the row ends with two pad frames.  A frame
+spans the ten RAMB36 of its column in that row: RAMB36 y (0-9 within the
+row) uses frame words 10*y..10*y+9, skipping the clock word 50 for y >= 5.
+
+Frame f of a RAMB36 holds INIT bits 256f..256f+255 and INITP bits
+32f..32f+31, interleaved over its 320 bits (see data_slot/parity_slot).
+The INIT bit of memory bit k at address a is a*W + k, with W the
+configured data width (1, 2, 4, 8, 16 or 32); parity bit p is at
+INITP a*(W/8) + p.
+
+The layout was worked out from the mecrisp-ice-forth image built into
+bitstream/j1_base.bit; the tests extract it again and compare.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from ..memory.image import MemoryImage
+from .bitfile import Bitstream, FRAME_WORDS
+from .mmi import BitLane, MemoryMap
+
+CONTENT_FRAMES = 128
+ROW_PAD_FRAMES = 2
+RAMB36_PER_ROW = 10
+RAMB36_WORDS = 10
+CLOCK_WORD = 50
+DATA_WIDTHS = (1, 2, 4, 8, 16, 32)
+
+
+@dataclass(frozen=True)
+class PartGeometry:
+    """Where a part's block RAM content frames are."""
+
+    name: str
+    bram_columns: int
+    # Clock-region rows in frame order: the top half from the centre up,
+    # then the bottom half from the centre down
+    row_order: Tuple[int, ...]
+
+    @property
+    def row_frames(self) -> int:
+        return self.bram_columns * CONTENT_FRAMES + ROW_PAD_FRAMES
+
+
+# Supported parts
+# Key: IDCODE without the revision bits, Value: geometry
+PARTS: Dict[int, PartGeometry] = {
+    0x362F093: PartGeometry(name="xc7s50", bram_columns=3, row_order=(1, 2, 0)),
+}
+
+# Slot of each address pair within a 16-slot group of a RAMB36's 320 frame bits
+_PAIR_SLOT = [0] * 16
+for _slot in range(16):
+    _PAIR_SLOT[4 * (_slot % 4) + (0, 2, 1, 3)[_slot // 4]] = _slot
+
+
+def data_slot(bit: int) -> int:
+    """Frame bit (0-319 within the RAMB36) of INIT bit 256f + bit."""
+    byte, offset = divmod(bit, 8)
+    return (
+        (80 if byte & 1 else 0)
+        + (176 if offset & 1 else 0)
+        + 16 * (offset // 2)
+        + _PAIR_SLOT[byte // 2]
+    )
+
+
+def parity_slot(bit: int) -> int:
+    """Frame bit (0-319 within the RAMB36) of INITP bit 32f + bit."""
+    return (240 if bit & 1 else 64) + _PAIR_SLOT[bit // 2]
+
+
+class BramMap:
+    """Locations of every bit of a memory in a bitstream's frame data."""
+
+    def __init__(self, memory_map: MemoryMap, bitstream: Bitstream):
+        idcode = (bitstream.idcode or 0) & 0x0FFFFFFF
+        if idcode not in PARTS:
+            raise ValueError(f"Unsupported part: IDCODE {bitstream.idcode or 0:#010x}")
+        self.geometry = PARTS[idcode]
+        if memory_map.part and bitstream.part and bitstream.part not in memory_map.part:
+            raise ValueError(
+                f"Memory map is for {memory_map.part} but the bitstream is for {bitstream.part}"
+            )
+        self.bitstream = bitstream
+        self.memory_map = memory_map
+        self.content_start = bitstream.frame_count - len(self.geometry.row_order) * self.geometry.row_frames
+        if self.content_start < 0:
+            raise ValueError("Bitstream has fewer frames than the part's block RAM content")
+
+        # For each lane, the (frame data word, bit) of every lane bit
+        # Key: lane, Value: per lane bit, a list of locations by address
+        self.locations: Dict[BitLane, List[List[Tuple[int, int]]]] = {
+            lane: self._lane_locations(lane) for lane in memory_map.lanes
+        }
+
+    def _lane_locations(self, lane: BitLane) -> List[List[Tuple[int, int]]]:
+        kind, x, y = lane.site
+        geometry = self.geometry
+        if kind != "RAMB36":
+            raise ValueError(f"{lane.placement}: only RAMB36 lanes are supported")
+        row = y // RAMB36_PER_ROW
+        if x >= geometry.bram_columns or row not in geometry.row_order:
+            raise ValueError(f"{lane.placement} does not exist on {geometry.name}")
+
+        width = next((w for w in DATA_WIDTHS if w >= lane.data_bits), None)
+        if width is None or lane.parity_bits > width // 8:
+            raise ValueError(
+                f"{lane.placement}: {lane.data_bits} data + {lane.parity_bits} parity bits "
+                "don't fit a RAMB36 port"
+            )
+        if lane.depth > CONTENT_FRAMES * 256 // width:
+            raise ValueError(f"{lane.placement}: {lane.depth} words don't fit at width {width}")
+
+        first_frame = (
+            self.content_start
+            + geometry.row_order.index(row) * geometry.row_frames
+            + x * CONTENT_FRAMES
+        )
+        index = y % RAMB36_PER_ROW
+        first_word = RAMB36_WORDS * index + (1 if index * RAMB36_WORDS >= CLOCK_WORD else 0)
+
+        def location(frame: int, slot: int) -> Tuple[int, int]:
+            return (first_frame + frame) * FRAME_WORDS + first_word + slot // 32, slot % 32
+
+        locations = []
+        for k in range(lane.data_bits):
+            bits = [a * width + k for a in range(lane.depth)]
+            locations.append([location(bit // 256, data_slot(bit % 256)) for bit in bits])
+        parity_width = width // 8
+        for p in range(lane.parity_bits):
+            bits = [a * parity_width + p for a in range(lane.depth)]
+            locations.append([location(bit // 32, parity_slot(bit % 32)) for bit in bits])
+        return locations
+
+    def extract(self) -> MemoryImage:
+        """Read the memory contents out of the bitstream."""
+        image = MemoryImage.zeros(self.memory_map.depth)
+        words = self.bitstream.words
+        start = self.bitstream.frame_start
+        for lane, locations in self.locations.items():
+            for k, bit_locations in enumerate(locations):
+                mask = 1 << (lane.lsb + k)
+                for a, (index, shift) in enumerate(bit_locations, lane.begin):
+                    if (words[start + index] >> shift) & 1:
+                        image[a] |= mask
+        return image
+
+    def patch(self, image: MemoryImage) -> int:
+        """
+        Replace the memory contents with image (zero-filled to the memory
+        depth).  Returns the number of frame words that changed.
+        """
+        depth = self.memory_map.depth
+        if len(image) > depth:
+            raise ValueError(f"Image of {len(image)} words does not fit in {depth} words of BRAM")
+        values = image.padded(depth).words
+
+        bitstream = self.bitstream
+        start = bitstream.frame_start
+        # New value of every frame word touched
+        # Key: frame data word, Value: new value
+        updated: Dict[int, int] = {}
+        for lane, locations in self.locations.items():
+            for k, bit_locations in enumerate(locations):
+                shift_in = lane.lsb + k
+                for a, (index, shift) in enumerate(bit_locations, lane.begin):
+                    word = updated.get(index)
+                    if word is None:
+                        word = bitstream.words[start + index]
+                    updated[index] = (word & ~(1 << shift)) | (((values[a] >> shift_in) & 1) << shift)
+
+        changed = 0
+        for index, word in updated.items():
+            if bitstream.words[start + index] != word:
+                frame, offset = divmod(index, FRAME_WORDS)
+                bitstream.set_frame_word(frame, offset, word)
+                changed += 1
+        return changed
@@ -0,0 +1,105 @@
+"""
+Vivado memory map information (.mmi) files.
+
+An MMI file describes how a processor's memory is spread over block RAMs:
+each BitLane names a placed RAMB36 (e.g. RAMB36_X0Y7), the bits of the
+memory word it stores (DataWidth MSB..LSB) and the range of word
+addresses it holds.  With parity on, the top NumBits of the lane are kept
+in the BRAM's parity bits.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import List
+
+_PLACEMENT = re.compile(r"(RAMB36|RAMB18)_X(\d+)Y(\d+)$")
+
+
+@dataclass(frozen=True)
+class BitLane:
+    """One block RAM holding a slice of every memory word."""
+
+    placement: str
+    msb: int
+    lsb: int
+    begin: int
+    end: int
+    parity_bits: int = 0
+
+    @property
+    def width(self) -> int:
+        return self.msb - self.lsb + 1
+
+    @property
+    def data_bits(self) -> int:
+        return self.width - self.parity_bits
+
+    @property
+    def depth(self) -> int:
+        return self.end - self.begin + 1
+
+    @property
+    def site(self):
+        """(memory type, X, Y) of the placement."""
+        match = _PLACEMENT.match(self.placement)
+        if not match:
+            raise ValueError(f"Unrecognized BRAM placement: {self.placement}")
+        return match.group(1), int(match.group(2)), int(match.group(3))
+
+
+@dataclass
+class MemoryMap:
+    """The bit lanes of one processor memory and the part they are placed in."""
+
+    inst_path: str
+    part: str
+    lanes: List[BitLane]
+
+    @property
+    def word_bits(self) -> int:
+        return max(lane.msb for lane in self.lanes) + 1
+
+    @property
+    def depth(self) -> int:
+        return max(lane.end for lane in self.lanes) + 1
+
+
+def read_mmi(path) -> MemoryMap:
+    """Parse an MMI file (the first processor in it)."""
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+    processor = root.find("Processor")
+    if processor is None:
+        raise ValueError(f"{path}: no Processor element")
+    part = ""
+    for option in root.iter("Option"):
+        if option.get("Name") == "Part":
+            part = option.get("Val", "")
+
+    lanes = []
+    for lane in processor.iter("BitLane"):
+        width = lane.find("DataWidth")
+        addresses = lane.find("AddressRange")
+        parity = lane.find("Parity")
+        if width is None or addresses is None:
+            raise ValueError(f"{path}: BitLane {lane.get('Placement')} lacks DataWidth/AddressRange")
+        parity_bits = 0
+        if parity is not None and parity.get("ON", "false").lower() == "true":
+            parity_bits = int(parity.get("NumBits", "0"))
+        lanes.append(
+            BitLane(
+                placement=lane.get("Placement", ""),
+                msb=int(width.get("MSB")),
+                lsb=int(width.get("LSB")),
+                begin=int(addresses.get("Begin")),
+                end=int(addresses.get("End")),
+                parity_bits=parity_bits,
+            )
+        )
+    if not lanes:
+        raise ValueError(f"{path}: no BitLane elements")
+    return MemoryMap(inst_path=processor.get("InstPath", ""), part=part, lanes=lanes)
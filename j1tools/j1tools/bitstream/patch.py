@@ -0,0 +1,109 @@
+"""
+j1patch: swap the J1 program in a prebuilt bitstream without Vivado.
+
+The memory map (.mmi) says which RAMB36 holds which bits of the J1 code
+memory; j1patch rewrites those INIT bits in the frame data of the .bit
+file and fixes up its CRC, or reads the current program back out.
+
+Usage:
+    j1patch extract BIT [-m MMI] [-o OUT] [-t FORMAT] [--trim]
+    j1patch patch BIT IMAGE -o OUT.bit [-m MMI] [-f FORMAT]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from ..memory.convert import read_image
+from ..memory.image import FORMATS, MemoryImage
+from .bitfile import Bitstream
+from .bram import BramMap
+from .mmi import read_mmi
+
+
+def load(bit_path: Path, mmi_path: Optional[Path] = None) -> BramMap:
+    """Read a bitstream and its memory map (by default the .mmi beside it)."""
+    mmi_path = mmi_path or bit_path.with_suffix(".mmi")
+    return BramMap(read_mmi(mmi_path), Bitstream.read(bit_path))
+
+
+def extract_image(bit_path: Path, mmi_path: Optional[Path] = None) -> MemoryImage:
+    """Return the J1 memory contents of a bitstream."""
+    return load(bit_path, mmi_path).extract()
+
+
+def patch_bitstream(
+    bit_path: Path, image: MemoryImage, output: Path, mmi_path: Optional[Path] = None
+) -> int:
+    """
+    Write a copy of the bitstream with the J1 memory replaced by image.
+    Returns the number of frame words that changed.
+    """
+    bram = load(bit_path, mmi_path)
+    changed = bram.patch(image)
+    bram.bitstream.write(output)
+    return changed
+
+
+def _trimmed(image: MemoryImage) -> MemoryImage:
+    words = image.tolist()
+    while words and not words[-1]:
+        words.pop()
+    return MemoryImage(words)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Patch the J1 program in a bitstream")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser("extract", help="Write out the program in a bitstream")
+    extract.add_argument("bit", type=Path, help="Bitstream (.bit)")
+    extract.add_argument("-m", "--mmi", type=Path, help="Memory map (default: BIT with .mmi)")
+    extract.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    extract.add_argument(
+        "-t", "--to", choices=FORMATS, default=None,
+        help="Output format (default: from the output suffix, else hex)",
+    )
+    extract.add_argument("--trim", action="store_true", help="Drop trailing zero words")
+
+    patch = commands.add_parser("patch", help="Replace the program in a bitstream")
+    patch.add_argument("bit", type=Path, help="Bitstream (.bit)")
+    patch.add_argument("image", type=Path, help="Program image (e.g. j1asm .hex output)")
+    patch.add_argument("-o", "--output", type=Path, required=True, help="Output bitstream")
+    patch.add_argument("-m", "--mmi", type=Path, help="Memory map (default: BIT with .mmi)")
+    patch.add_argument(
+        "-f", "--from", dest="from_format", choices=FORMATS,
+        help="Image format (default: from the suffix or content)",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == "extract":
+            image = extract_image(args.bit, args.mmi)
+            if args.trim:
+                image = _trimmed(image)
+            fmt = args.to or Path(args.output).suffix.lstrip(".").lower()
+            if fmt not in FORMATS:
+                fmt = "hex"
+            if args.output == "-":
+                image.write(fmt, sys.stdout.buffer if fmt == "bin" else sys.stdout)
+            else:
+                with open(args.output, "wb" if fmt == "bin" else "w") as f:
+                    image.write(fmt, f)
+        else:
+            image = read_image(args.image, args.from_format)
+            changed = patch_bitstream(args.bit, image, args.output, args.mmi)
+            print(
+                f"Patched {len(image)} words into {args.output} "
+                f"({changed} frame words changed) in {(time.perf_counter() - start) * 1e3:.0f} ms"
+            )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 """Memory file format conversion tools for J1 CPU"""
 
 from .memory import hex_to_coe, hex_to_mif, mif_to_mem
+from .image import MemoryImage
 
 __all__ = [
     "hex_to_coe",
     "hex_to_mif",
     "mif_to_mem",
+    "MemoryImage",
 ]
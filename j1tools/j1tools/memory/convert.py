@@ -0,0 +1,559 @@
+"""
+Streaming conversion between memory file formats.
+
+Input is read a chunk of whole lines at a time and parsed in bulk --
+bytes.fromhex for hex digits, a single int() per chunk for binary digits --
+then written through one buffered output, so multi-megaword images convert
+in roughly constant memory.  Words may be 16, 32 or 64 bits wide; the input
+format and the word width are detected unless given.
+
+Formats (as written by MemoryImage):
+    hex  one hex word per line, // comments allowed
+    coe  Vivado coefficient file (radix 16, 2 or 10)
+    mif  one binary word per line
+    mem  $readmemh style "@ADDR WORD" lines
+    bin  raw little-endian words
+
+Usage: memconvert INPUT... -t FORMAT [-f FORMAT] [-w WIDTH] [-o OUT | -d DIR] [-j N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import binascii
+import itertools
+import concurrent.futures
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from .image import FORMATS, MemoryImage
+
+# Bytes of input read per chunk
+CHUNK_SIZE = 1 << 20
+
+# Bytes of input inspected to detect the format and word width
+SNIFF_SIZE = 1 << 16
+
+WIDTHS = (16, 32, 64)
+
+# Format implied by a file suffix
+# Key: suffix, Value: format name
+SUFFIXES = {f".{fmt}": fmt for fmt in FORMATS}
+
+# Array type code for each word width
+# Key: width in bits, Value: array type code of that size
+TYPECODES = {
+    width: next(tc for tc in "HILQ" if array(tc).itemsize * 8 == width)
+    for width in WIDTHS
+}
+
+_HEX_CHARS = frozenset("0123456789abcdefABCDEF")
+_DELETE_BINARY = str.maketrans("", "", "01")
+
+
+class Chunk(NamedTuple):
+    """
+    A run of consecutive words as big-endian bytes.  Words read from hex and
+    COE files keep their text, so hex and COE output reproduce the input
+    digits.
+    """
+
+    data: bytes
+    text: Optional[List[str]] = None
+
+
+def detect(path, from_format: Optional[str] = None, width: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Return the (format, word width) of a memory file.  The format comes
+    from from_format, the file suffix or the content, in that order; the
+    width from the first word (16 for binary files and empty images).
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_SIZE)
+
+    fmt = from_format or SUFFIXES.get(Path(path).suffix.lower())
+    if fmt is None:
+        fmt = _sniff_format(head)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown memory format: {fmt}")
+    if width is not None:
+        if width not in WIDTHS:
+            raise ValueError(f"Unsupported word width: {width} (choose from 16, 32, 64)")
+        return fmt, width
+    if fmt == "bin":
+        return fmt, 16
+
+    # Drop a partial last line so it can't shorten the first word
+    text = head.decode("latin-1")
+    if len(head) == SNIFF_SIZE:
+        text = text[: text.rfind("\n") + 1]
+    first = _first_word(fmt, text)
+    if first is None:
+        return fmt, 16
+    word, radix = first
+    if radix == 10:
+        bits = int(word).bit_length()
+    else:
+        bits = len(word) if radix == 2 else len(word) * 4
+    for candidate in WIDTHS:
+        if bits <= candidate:
+            return fmt, candidate
+    raise ValueError(f"{path}: words wider than 64 bits are not supported")
+
+
+def _sniff_format(head: bytes) -> str:
+    if b"\0" in head:
+        return "bin"
+    try:
+        text = head.decode("ascii")
+    except UnicodeDecodeError:
+        return "bin"
+    tokens = _strip_comments(text).split()
+    if not tokens:
+        return "hex"
+    if tokens[0].startswith("memory_initialization"):
+        return "coe"
+    if tokens[0].startswith("@"):
+        return "mem"
+    if len(tokens[0]) in WIDTHS and not tokens[0].translate(_DELETE_BINARY):
+        return "mif"
+    return "hex"
+
+
+def _first_word(fmt: str, text: str) -> Optional[Tuple[str, int]]:
+    """Return the first value token and its radix."""
+    if fmt == "coe":
+        radix, values = _split_coe_header(text)
+        tokens = values.replace(",", " ").replace(";", " ").split() if values else []
+    else:
+        tokens = [t for t in _strip_comments(text).split() if not t.startswith("@")]
+        radix = 2 if fmt == "mif" else 16
+    return (tokens[0], radix) if tokens else None
+
+
+def _strip_comments(text: str) -> str:
+    if "//" not in text:
+        return text
+    return "\n".join(line.split("//", 1)[0] for line in text.splitlines())
+
+
+def _split_coe_header(text: str) -> Tuple[int, Optional[str]]:
+    """Return the radix and the text after memory_initialization_vector=."""
+    radix = 16
+    lowered = text.lower()
+    start = lowered.find("memory_initialization_radix")
+    if start >= 0:
+        value = lowered[start:].split("=", 1)[1].split(";", 1)[0].strip()
+        radix = int(value)
+        if radix not in (2, 10, 16):
+            raise ValueError(f"Unsupported COE radix: {radix}")
+    start = lowered.find("memory_initialization_vector")
+    if start < 0:
+        return radix, None
+    return radix, text[start:].split("=", 1)[1]
+
+
+def _line_chunks(f: TextIO) -> Iterator[List[str]]:
+    return iter(lambda: f.readlines(CHUNK_SIZE), [])
+
+
+def _hex_chunk(tokens: List[str], width: int) -> Chunk:
+    digits = width // 4
+    if set(map(len, tokens)) != {digits}:
+        tokens = [_pad(token, digits, width) for token in tokens]
+    try:
+        data = bytes.fromhex("".join(tokens))
+    except ValueError:
+        bad = next(t for t in tokens if not _HEX_CHARS.issuperset(t))
+        raise ValueError(f"Invalid hexadecimal value: {bad}") from None
+    return Chunk(data, tokens)
+
+
+def _binary_chunk(tokens: List[str], width: int) -> Chunk:
+    if set(map(len, tokens)) != {width}:
+        tokens = [_pad(token, width, width) for token in tokens]
+    digits = "".join(tokens)
+    if digits.translate(_DELETE_BINARY):
+        bad = next(t for t in tokens if t.translate(_DELETE_BINARY))
+        raise ValueError(f"Invalid binary value: {bad}")
+    return Chunk(int(digits, 2).to_bytes(len(digits) // 8, "big"))
+
+
+def _decimal_chunk(tokens: List[str], width: int) -> Chunk:
+    size = width // 8
+    try:
+        return Chunk(b"".join(int(token).to_bytes(size, "big") for token in tokens))
+    except (ValueError, OverflowError):
+        bad = next(t for t in tokens if not t.isdigit() or int(t).bit_length() > width)
+        raise ValueError(f"Invalid {width}-bit decimal value: {bad}") from None
+
+
+def _pad(token: str, digits: int, width: int) -> str:
+    if len(token) > digits:
+        raise ValueError(
+            f"Value {token} is wider than {width} bits, the width of the first word "
+            f"(use --width for mixed widths)"
+        )
+    return token.zfill(digits)
+
+
+def _swap(data: bytes, width: int) -> bytes:
+    """Reverse the byte order of every word."""
+    words = array(TYPECODES[width])
+    words.frombytes(data)
+    words.byteswap()
+    return words.tobytes()
+
+
+def _binary_lines(data: bytes, width: int) -> str:
+    """
+    Format words as binary lines.  The digits come from one int
+    conversion and are interleaved with newlines by strided slice copies,
+    one per bit column, instead of formatting each word.
+    """
+    count = len(data) * 8 // width
+    # A guard bit above the top word keeps its leading zeros
+    digits = bin(int.from_bytes(data, "big") | (1 << (count * width)))[3:].encode()
+    line = width + 1
+    out = bytearray(b"\n") * (count * line)
+    for column in range(width):
+        out[column::line] = digits[column::width]
+    return out.decode("ascii")
+
+
+def _mem_lines(data: bytes, width: int, addr: int) -> str:
+    """Format words as "@ADDR WORD" lines, starting at addr."""
+    size = width // 8
+    count = len(data) // size
+    parts = []
+    start = 0
+    # Split where the address grows another digit so each block has fixed-width lines
+    while start < count:
+        digits = max(4, len(f"{addr + start:X}"))
+        end = min(count, 16 ** digits - addr)
+        parts.append(_mem_block(data[start * size : end * size], width, addr + start, digits))
+        start = end
+    return "".join(parts)
+
+
+def _mem_block(data: bytes, width: int, addr: int, digits: int) -> str:
+    count = len(data) * 8 // width
+    value_digits = width // 4
+    addresses = array("Q", range(addr, addr + count))
+    if sys.byteorder == "little":
+        addresses.byteswap()
+    address_hex = binascii.hexlify(addresses.tobytes()).upper()
+    value_hex = binascii.hexlify(data).upper()
+
+    # Fill each character column of the fixed-width lines with one strided copy
+    line = digits + value_digits + 3
+    out = bytearray(b"\n") * (count * line)
+    out[0::line] = b"@" * count
+    for column in range(digits):
+        out[1 + column :: line] = address_hex[16 - digits + column :: 16]
+    out[1 + digits :: line] = b" " * count
+    for column in range(value_digits):
+        out[2 + digits + column :: line] = value_hex[column::value_digits]
+    return out.decode("ascii")
+
+
+def read_hex(f: TextIO, width: int) -> Iterator[Chunk]:
+    for lines in _line_chunks(f):
+        tokens = _strip_comments("".join(lines)).split()
+        if tokens:
+            yield _hex_chunk(tokens, width)
+
+
+def read_mif(f: TextIO, width: int) -> Iterator[Chunk]:
+    for lines in _line_chunks(f):
+        tokens = "".join(lines).split()
+        if tokens:
+            yield _binary_chunk(tokens, width)
+
+
+def read_coe(f: TextIO, width: int) -> Iterator[Chunk]:
+    # Everything up to the vector keyword is header
+    header = ""
+    for line in f:
+        header += line
+        radix, values = _split_coe_header(header)
+        if values is not None:
+            break
+    else:
+        return
+    parse = {16: _hex_chunk, 2: _binary_chunk, 10: _decimal_chunk}[radix]
+
+    # The vector runs up to the first ';'
+    for lines in itertools.chain([[values]], _line_chunks(f)):
+        text = "".join(lines)
+        end = text.find(";")
+        tokens = text[: end if end >= 0 else None].replace(",", " ").split()
+        if tokens:
+            yield parse(tokens, width)
+        if end >= 0:
+            return
+
+
+def read_mem(f: TextIO, width: int) -> Iterator[Chunk]:
+    addr = 0
+    for lines in _line_chunks(f):
+        values: List[str] = []
+        for token in _strip_comments("".join(lines)).split():
+            if token[0] != "@":
+                values.append(token)
+                continue
+            # Address markers: flush, then zero-fill any gap
+            target = int(token[1:], 16)
+            here = addr + len(values)
+            if target < here:
+                raise ValueError(f"Address {token} is below the current address {here:04X}")
+            if target > here:
+                if values:
+                    yield Chunk(_hex_chunk(values, width).data)
+                    values = []
+                yield Chunk(bytes((target - here) * (width // 8)))
+                addr = target
+        if values:
+            yield Chunk(_hex_chunk(values, width).data)
+        addr += len(values)
+
+
+def read_bin(f, width: int) -> Iterator[Chunk]:
+    size = width // 8
+    for data in iter(lambda: f.read(CHUNK_SIZE - CHUNK_SIZE % size), b""):
+        if len(data) % size:
+            raise ValueError(f"Binary image is not a whole number of {width}-bit words")
+        yield Chunk(_swap(data, width))
+
+
+def _hex_lines(chunk: Chunk, width: int, separator: str = "\n") -> str:
+    if chunk.text is not None:
+        return separator.join(chunk.text)
+    text = chunk.data.hex("\n", width // 8)
+    return text if separator == "\n" else text.replace("\n", separator)
+
+
+def write_hex(chunks: Iterator[Chunk], out: TextIO, width: int) -> int:
+    count = 0
+    for chunk in chunks:
+        out.write(_hex_lines(chunk, width) + "\n")
+        count += len(chunk.data)
+    return count * 8 // width
+
+
+def write_coe(chunks: Iterator[Chunk], out: TextIO, width: int) -> int:
+    out.write("memory_initialization_radix=16;\nmemory_initialization_vector=\n")
+    count = 0
+    for chunk in chunks:
+        if not chunk.data:
+            continue
+        out.write((",\n" if count else "") + _hex_lines(chunk, width, ",\n"))
+        count += len(chunk.data)
+    out.write(";\n")
+    return count * 8 // width
+
+
+def write_mif(chunks: Iterator[Chunk], out: TextIO, width: int) -> int:
+    count = 0
+    for chunk in chunks:
+        if chunk.data:
+            out.write(_binary_lines(chunk.data, width))
+            count += len(chunk.data)
+    return count * 8 // width
+
+
+def write_mem(chunks: Iterator[Chunk], out: TextIO, width: int) -> int:
+    addr = 0
+    for chunk in chunks:
+        out.write(_mem_lines(chunk.data, width, addr))
+        addr += len(chunk.data) * 8 // width
+    return addr
+
+
+def write_bin(chunks: Iterator[Chunk], out, width: int) -> int:
+    count = 0
+    for chunk in chunks:
+        out.write(_swap(chunk.data, width))
+        count += len(chunk.data)
+    return count * 8 // width
+
+
+READERS = {"hex": read_hex, "coe": read_coe, "mif": read_mif, "mem": read_mem, "bin": read_bin}
+WRITERS = {"hex": write_hex, "coe": write_coe, "mif": write_mif, "mem": write_mem, "bin": write_bin}
+
+
+def convert(
+    source,
+    dest,
+    to_format: str,
+    from_format: Optional[str] = None,
+    width: Optional[int] = None,
+) -> int:
+    """
+    Convert the memory file source to to_format.
+
+    Args:
+        source: Input file path
+        dest: Output file path, or an open file (binary for "bin")
+        to_format: Output format
+        from_format: Input format (default: detected)
+        width: Word width in bits (default: detected)
+
+    Returns:
+        The number of words converted
+
+    A dest path is written through a temporary file next to it and only
+    replaced once the whole input has converted, so bad input never leaves
+    a truncated output behind.
+    """
+    if to_format not in WRITERS:
+        raise ValueError(f"Unknown memory format: {to_format}")
+    from_format, width = detect(source, from_format, width)
+
+    with open(source, "rb" if from_format == "bin" else "r") as f:
+        chunks = READERS[from_format](f, width)
+        if hasattr(dest, "write"):
+            return WRITERS[to_format](chunks, dest, width)
+        dest = Path(dest)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        mode = "xb" if to_format == "bin" else "x"
+        try:
+            with open(tmp, mode, buffering=CHUNK_SIZE) as out:
+                words = WRITERS[to_format](chunks, out, width)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return words
+
+
+def read_image(source, from_format: Optional[str] = None) -> MemoryImage:
+    """Read a memory file of 16-bit words into a MemoryImage."""
+    from_format, _ = detect(source, from_format, 16)
+    data = array("H")
+    with open(source, "rb" if from_format == "bin" else "r") as f:
+        for chunk in READERS[from_format](f, 16):
+            data.frombytes(chunk.data)
+    if sys.byteorder == "little":
+        data.byteswap()
+    return MemoryImage(data)
+
+
+@dataclass
+class ConvertResult:
+    """Outcome of converting one file."""
+
+    source: Path
+    output: Path
+    ok: bool
+    elapsed: float
+    words: int = 0
+    error: str = ""
+
+
+def convert_file(
+    source: Path, output: Path, to_format: str, from_format=None, width=None
+) -> ConvertResult:
+    """Convert one file, capturing any error in the result."""
+    start = time.perf_counter()
+    try:
+        words = convert(source, output, to_format, from_format, width)
+        return ConvertResult(source, output, True, time.perf_counter() - start, words)
+    except (OSError, ValueError) as e:
+        return ConvertResult(source, output, False, time.perf_counter() - start, error=str(e))
+
+
+def convert_many(
+    sources: List[Path],
+    to_format: str,
+    output_dir: Optional[Path] = None,
+    jobs: Optional[int] = None,
+    from_format: Optional[str] = None,
+    width: Optional[int] = None,
+) -> Iterator[ConvertResult]:
+    """
+    Convert every source to to_format, next to the source or in output_dir,
+    and yield a ConvertResult per file in input order.  With more than one
+    job the files are spread over a pool of worker processes.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if output_dir:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    tasks = [
+        (source, (output_dir or source.parent) / source.with_suffix(f".{to_format}").name)
+        for source in sources
+    ]
+    if jobs == 1 or len(tasks) <= 1:
+        for source, output in tasks:
+            yield convert_file(source, output, to_format, from_format, width)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        futures = [
+            pool.submit(convert_file, source, output, to_format, from_format, width)
+            for source, output in tasks
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert between memory file formats")
+    parser.add_argument("inputs", nargs="+", type=Path, help="Input files")
+    parser.add_argument("-t", "--to", required=True, choices=FORMATS, help="Output format")
+    parser.add_argument(
+        "-f", "--from", dest="from_format", choices=FORMATS,
+        help="Input format (default: from the suffix or content)",
+    )
+    parser.add_argument(
+        "-w", "--width", type=int, choices=WIDTHS,
+        help="Word width in bits (default: from the first word)",
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Output file for a single input ('-' for stdout)",
+    )
+    parser.add_argument(
+        "-d", "--output-dir", type=Path,
+        help="Write outputs here instead of next to each input",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="Worker processes for many inputs (default: CPU count)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.output:
+        if len(args.inputs) > 1:
+            parser.error("--output takes a single input; use --output-dir for many")
+        dest = args.output
+        if dest == "-":
+            dest = sys.stdout.buffer if args.to == "bin" else sys.stdout
+        try:
+            convert(args.inputs[0], dest, args.to, args.from_format, args.width)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    failed = 0
+    for result in convert_many(
+        args.inputs, args.to, args.output_dir, args.jobs, args.from_format, args.width
+    ):
+        if result.ok:
+            print(
+                f"{result.elapsed * 1e3:8.1f} ms {result.words:10d} words  "
+                f"{result.source} -> {result.output}"
+            )
+        else:
+            failed += 1
+            print(f"Error: {result.source}: {result.error}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Memory image of a J1 program and writers for memory file formats.
+
+A MemoryImage holds one 16-bit word per address in an array('H'), with
+unused addresses left zero.  Writers take any sequence of words -- usually
+the image's zero-copy memoryview -- so every output format is produced
+from the same buffer without building intermediate lists.
+
+Formats:
+    hex  one 4-digit lowercase hex word per line (j1asm output)
+    coe  Vivado coefficient file
+    mif  one 16-bit binary word per line
+    mem  $readmemh style "@ADDR WORD" lines
+    bin  raw 16-bit words (little-endian by default)
+"""
+
+import sys
+from array import array
+from typing import BinaryIO, Callable, Dict, Iterable, List, Sequence, Tuple, TextIO
+
+
+class MemoryImage:
+    """Contiguous 16-bit memory contents starting at address 0."""
+
+    def __init__(self, words: Iterable[int] = ()):
+        self._data = array("H", words)
+
+    @classmethod
+    def zeros(cls, size: int) -> "MemoryImage":
+        """Return an image of `size` zero words."""
+        image = cls()
+        image._data = array("H", bytes(2 * size))
+        return image
+
+    @classmethod
+    def from_sparse(cls, size: int, words: Iterable[Tuple[int, int]]) -> "MemoryImage":
+        """
+        Return an image of `size` words from (address, value) pairs; other
+        addresses are zero.  Raises OverflowError for a value that doesn't
+        fit in 16 bits.
+        """
+        image = cls.zeros(size)
+        data = image._data
+        for addr, value in words:
+            data[addr] = value
+        return image
+
+    @property
+    def words(self) -> memoryview:
+        """Zero-copy view of the words"""
+        return memoryview(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, addr):
+        return self._data[addr]
+
+    def __setitem__(self, addr: int, value: int) -> None:
+        self._data[addr] = value
+
+    def tolist(self) -> List[int]:
+        return self._data.tolist()
+
+    def padded(self, depth: int) -> "MemoryImage":
+        """Return a copy zero-padded to `depth` words (e.g. the BRAM depth)."""
+        if len(self) > depth:
+            raise ValueError(
+                f"Image of {len(self)} words does not fit in a memory depth of {depth}"
+            )
+        image = MemoryImage()
+        image._data = self._data + array("H", bytes(2 * (depth - len(self))))
+        return image
+
+    def write(self, fmt: str, f) -> None:
+        """Write the image in the given format (f is binary for "bin")."""
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown memory format: {fmt}")
+        WRITERS[fmt](self.words, f)
+
+
+def write_hex(words: Sequence[int], f: TextIO) -> None:
+    f.write("".join(map("{:04x}\n".format, words)))
+
+
+def write_coe(words: Sequence[int], f: TextIO) -> None:
+    f.write(
+        "memory_initialization_radix=16;\n"
+        "memory_initialization_vector=\n"
+        + ",\n".join(map("{:04x}".format, words))
+        + ";\n"
+    )
+
+
+def write_mif(words: Sequence[int], f: TextIO) -> None:
+    f.write("".join(map("{:016b}\n".format, words)))
+
+
+def write_mem(words: Sequence[int], f: TextIO) -> None:
+    f.write("".join(map("@{:04X} {:04X}\n".format, range(len(words)), words)))
+
+
+def write_bin(words: Sequence[int], f: BinaryIO, byteorder: str = "little") -> None:
+    data = words if isinstance(words, array) else array("H", words)
+    if byteorder != sys.byteorder:
+        data = array("H", data)
+        data.byteswap()
+    f.write(memoryview(data).cast("B"))
+
+
+# Writer for each format
+# Key: format name, Value: function(words, file)
+WRITERS: Dict[str, Callable] = {
+    "hex": write_hex,
+    "coe": write_coe,
+    "mif": write_mif,
+    "mem": write_mem,
+    "bin": write_bin,
+}
+
+FORMATS = tuple(WRITERS)
+
+
+def parse_formats(spec: str) -> Tuple[str, ...]:
+    """Parse a comma-separated format list such as "coe,mif"."""
+    formats = tuple(dict.fromkeys(f.strip().lower() for f in spec.split(",") if f.strip()))
+    unknown = [f for f in formats if f not in WRITERS]
+    if unknown:
+        raise ValueError(
+            f"Unknown memory format: {', '.join(unknown)} (choose from {', '.join(FORMATS)})"
+        )
+    return formats
@@ -0,0 +1,18 @@
+"""J1 CPU emulator"""
+
+from .blocks import BlockJ1
+from .cpu import J1, MEMWORDS, NullIO, dispatch_table
+from .devices import Board, TopIO, Uart
+from .reference import reference_step
+
+__all__ = [
+    "BlockJ1",
+    "Board",
+    "J1",
+    "MEMWORDS",
+    "NullIO",
+    "TopIO",
+    "Uart",
+    "dispatch_table",
+    "reference_step",
+]
@@ -0,0 +1,295 @@
+"""
+Basic-block translating J1 emulator.
+
+BlockJ1 translates the straight-line run of instructions at each address
+up to and including the next JMP, ZJMP, CALL or return (at most
+MAX_BLOCK_LENGTH instructions) into one generated Python function, and
+caches it by start address.  Within a block the stack pointers, st0 and
+the interrupt enable live in local variables and every field of every
+instruction is already decoded, so a block costs about as much as a
+couple of dispatched instructions.
+
+Architectural state after every block is the same as from J1: a store
+(N->[T]) that changes a word of a translated block drops that block, and
+a block that stores into code stops right after the store.  Runs that end
+inside a block, and everything while interrupt_request is set, are
+single-stepped through the dispatch table.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cpu import J1, MEMWORDS, FUNC_T_N, FUNC_T_R, FUNC_WRITE, FUNC_IOW, FUNC_IOR, FUNC_DINT, FUNC_EINT
+from .cpu import _ALU_EXPRESSIONS
+from .reference import STACK_FILL
+
+MAX_BLOCK_LENGTH = 64
+
+# Compiled blocks shared by every emulator
+# Key: block source, Value: function
+_BLOCK_CODE: Dict[str, Callable] = {}
+
+_STATE = ("T", "ds", "dsp", "rs", "rt", "rsp", "mem", "c")
+# Register written back at the end of a block
+# Key: local name, Value: attribute
+_WRITEBACK = {"T": "st0", "dsp": "dsp", "rt": "rtop", "rsp": "rsp"}
+_PROLOGUE = {
+    "T": "T = s.st0",
+    "ds": "ds = s.ds",
+    "dsp": "dsp = s.dsp",
+    "rs": "rs = s.rs",
+    "rt": "rt = s.rtop",
+    "rsp": "rsp = s.rsp",
+    "mem": "mem = s.mem",
+    "c": "c = s.cycles",
+}
+
+
+def _next_pc(count: int) -> str:
+    """PC after the first count instructions of the block."""
+    return f"(pc + {2 * count}) & 0xFFFE | ie"
+
+
+def translate(mem: Sequence[int], start: int, mask: int) -> Tuple[str, int]:
+    """
+    Return the source of the block function for the code at word address
+    start and the number of instructions in it.  The function takes the
+    emulator and PC and returns the new PC.
+    """
+    body: List[str] = []
+    exit_pc = None
+    stored = False  # The previous instruction was a store
+    word = start
+    count = 0
+
+    def early_exit(after: int, condition: str) -> None:
+        """Leave the block after instruction `after` when condition holds."""
+        body.append(f"if {condition}:")
+        body.append("    @WRITEBACK@")
+        body.append(f"    s.cycles = c + {after + 1}")
+        body.append(f"    return {_next_pc(after + 1)}")
+
+    while count < MAX_BLOCK_LENGTH:
+        insn = mem[word]
+        k = count
+        count += 1
+        kind = insn >> 13
+        target = (insn & 0x1FFF) << 1
+        store = False
+
+        if insn & 0x8000:
+            body += ["dsp = (dsp + 1) & 31", "ds[dsp] = T", f"T = {insn & 0x7FFF:#x}"]
+        elif kind == 0:
+            exit_pc = f"{target:#x} | ie"
+        elif kind == 1:
+            body += ["taken = not T", "T = ds[dsp]", f"ds[dsp] = {STACK_FILL:#x}", "dsp = (dsp - 1) & 31"]
+            exit_pc = f"{target:#x} | ie if taken else {_next_pc(count)}"
+        elif kind == 2:
+            body += ["rt = (rt + 1) & 31", f"rs[rt] = {_next_pc(count)}", "rsp = (rsp + 1) & 31"]
+            exit_pc = f"{target:#x} | ie"
+        else:
+            alu = (insn >> 8) & 0x1F
+            expression = _ALU_EXPRESSIONS.get(alu, "T")
+            func = (insn >> 4) & 7
+            rdelta = (insn >> 2) & 3
+            ddelta = insn & 3
+            io = func in (FUNC_IOW, FUNC_IOR) or alu == 0x0D
+
+            if alu == 0x19:
+                if stored:
+                    expression = "stored"
+                elif k == 0:
+                    expression = f"s.write_value if s.write_cycle == c - 1 else mem[(T >> 1) & {mask:#x}]"
+                else:
+                    expression = f"mem[(T >> 1) & {mask:#x}]"
+            expression = expression.replace("s.dsp", "dsp").replace("s.rsp", "rsp")
+
+            if "N" in expression or func in (FUNC_WRITE, FUNC_IOW) or (ddelta == 1 and func != FUNC_T_N):
+                body.append("N = ds[dsp]")
+            if "S" in expression:
+                body.append("S = ds[(dsp - 1) & 31]")
+            if "R" in expression or insn & 0x80:
+                body.append("R = rs[rt]")
+            if io or func == FUNC_WRITE:
+                body.append(f"s.cycles = c + {k}")
+            if expression != "T":
+                body.append(f"value = {expression}")
+
+            if func == FUNC_WRITE:
+                body += ["s.mem_write(T, N)", "stored = N"]
+                store = True
+            elif func == FUNC_IOW:
+                body.append("s.io.wr(T, N)")
+            elif func == FUNC_IOR:
+                body.append("s.io.rd(T)")
+
+            write = "T" if func == FUNC_T_N else None
+            if ddelta == 0:
+                if write:
+                    body.append("ds[dsp] = T")
+            elif ddelta == 1:
+                body += ["dsp = (dsp + 1) & 31", f"ds[dsp] = {write or 'N'}"]
+            else:
+                body.append(f"ds[dsp] = {STACK_FILL:#x}")
+                if ddelta == 2:
+                    body.append(f"ds[(dsp - 1) & 31] = {STACK_FILL:#x}")
+                body.append(f"dsp = (dsp - {1 if ddelta == 3 else 2}) & 31")
+                if write:
+                    body.append("ds[dsp] = T")
+
+            write = "T" if func == FUNC_T_R else None
+            if rdelta == 0:
+                if write:
+                    body.append("rs[rt] = T")
+            elif rdelta == 1:
+                body += [f"rs[(rt + 1) & 31] = {write or 'rs[rt]'}", "rt = (rt + 1) & 31", "rsp = (rsp + 1) & 31"]
+            elif rdelta == 2:
+                body.append("rsp = (rsp - 2) & 31")
+            else:
+                body += [f"rs[rt] = {STACK_FILL:#x}", "rt = (rt - 1) & 31"]
+                if write:
+                    body.append("rs[rt] = T")
+                body.append("rsp = (rsp - 1) & 31")
+
+            if expression != "T":
+                body.append("T = value")
+
+            if insn & 0x80:
+                if func == FUNC_DINT:
+                    exit_pc = "R & 0x7FFE"
+                elif func == FUNC_EINT:
+                    exit_pc = "(R & 0x7FFE) | 1"
+                else:
+                    exit_pc = "(R & 0x7FFE) | (R >> 15) | ie"
+            elif func == FUNC_DINT:
+                body.append("ie = 0")
+            elif func == FUNC_EINT:
+                body.append("ie = 1")
+
+            if exit_pc is None:
+                # Leave as soon as a store hits translated code, a device
+                # raises an interrupt that is enabled or asks to stop
+                if store:
+                    early_exit(k, "s.block_dirty")
+                if func == FUNC_IOW:
+                    early_exit(k, "s.stop_request or s.interrupt_request and ie")
+                elif io:
+                    early_exit(k, "s.interrupt_request and ie")
+        stored = store
+        if exit_pc is not None:
+            break
+        word = (word + 1) & mask
+    if exit_pc is None:
+        exit_pc = _next_pc(count)
+
+    text = "\n".join(body) + f"\n{exit_pc}"
+    names = set(re.findall(r"\b\w+\b", text))
+    assigned = set(re.findall(r"^(\w+) = ", text, re.M))
+    writeback = [f"s.{_WRITEBACK[name]} = {name}" for name in _WRITEBACK if name in assigned]
+    if "c" in names:
+        writeback.append(f"s.cycles = c + {count}")
+    else:
+        writeback.append(f"s.cycles += {count}")
+
+    lines = [f"def block_{start:04x}(s, pc):", "    ie = pc & 1"]
+    lines += [f"    {_PROLOGUE[name]}" for name in _STATE if name in names]
+    for line in body:
+        indent = "        " if line.startswith("    ") else "    "
+        if line.strip() == "@WRITEBACK@":
+            lines += [f"{indent}{w}" for w in writeback[:-1]]
+        else:
+            lines.append(f"    {line}")
+    lines += [f"    {w}" for w in writeback]
+    lines.append(f"    return {exit_pc}")
+    return "\n".join(lines) + "\n", count
+
+
+def compile_block(source: str) -> Callable:
+    """Compile the block function in source (once per distinct source)."""
+    function = _BLOCK_CODE.get(source)
+    if function is None:
+        name = source[4 : source.index("(")]
+        namespace: Dict[str, Callable] = {}
+        exec(compile(source, f"<j1 {name}>", "exec"), namespace)
+        function = _BLOCK_CODE[source] = namespace[name]
+    return function
+
+
+class BlockJ1(J1):
+    """A J1 that executes translated basic blocks."""
+
+    __slots__ = ("_blocks", "_lengths", "_covering", "block_dirty")
+
+    def __init__(self, image: Sequence[int] = (), memwords: int = MEMWORDS, io=None):
+        self._blocks: List[Optional[Callable]] = [None] * memwords
+        self._lengths = [0] * memwords
+        # Blocks that include each translated word
+        # Key: word address, Value: start addresses of the blocks
+        self._covering: Dict[int, List[int]] = {}
+        self.block_dirty = False
+        super().__init__(image, memwords, io)
+
+    def load(self, image: Sequence[int], origin: int = 0) -> None:
+        super().load(image, origin)
+        self.flush()
+
+    def flush(self) -> None:
+        """Drop every translated block (after changing memory directly)."""
+        self._blocks[:] = [None] * len(self.mem)
+        self._covering.clear()
+
+    def mem_write(self, addr: int, value: int) -> None:
+        word = (addr >> 1) & self.mask
+        mem = self.mem
+        if word in self._covering and mem[word] != value:
+            self._invalidate(word)
+        mem[word] = value
+        self.write_cycle = self.cycles
+        self.write_value = value
+
+    def _invalidate(self, word: int) -> None:
+        """Drop the blocks that include word."""
+        mask = self.mask
+        covering = self._covering
+        for start in covering.pop(word, ()):
+            self._blocks[start] = None
+            for offset in range(self._lengths[start]):
+                starts = covering.get((start + offset) & mask)
+                if starts and start in starts:
+                    starts.remove(start)
+                    if not starts:
+                        del covering[(start + offset) & mask]
+        self.block_dirty = True
+
+    def _translate(self, word: int) -> Callable:
+        source, length = translate(self.mem, word, self.mask)
+        block = self._blocks[word] = compile_block(source)
+        self._lengths[word] = length
+        for offset in range(length):
+            self._covering.setdefault((word + offset) & self.mask, []).append(word)
+        return block
+
+    def run(self, steps: int) -> None:
+        """Execute steps instructions."""
+        end = self.cycles + steps
+        blocks = self._blocks
+        lengths = self._lengths
+        mask = self.mask
+        pc = self.pc
+        try:
+            while not self.interrupt_request:
+                word = (pc >> 1) & mask
+                block = blocks[word]
+                if block is None:
+                    block = self._translate(word)
+                if self.cycles + lengths[word] > end:
+                    break
+                self.block_dirty = False
+                pc = block(self, pc)
+                if self.stop_request:
+                    self.stop_request = False
+                    return
+        finally:
+            self.pc = pc
+        if self.cycles < end:
+            super().run(end - self.cycles)
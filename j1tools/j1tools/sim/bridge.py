@@ -0,0 +1,145 @@
+"""
+Bridge a Board's UART to host tools over asyncio: a TCP socket, a local
+pty, or a StreamReader/StreamWriter pair.
+
+The emulator runs in slices of slice_cycles cycles inside the event loop
+and yields between slices, so it never waits on the host: bytes that
+arrive are queued for the firmware, and bytes the firmware transmits are
+written to the host after the slice that sent them.  The same terminal
+programs and upload scripts used with the board's USB serial port work
+with the pty.
+
+Usage: j1sim firmware.hex [--pty | --tcp PORT] [--blocks]
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from .blocks import BlockJ1
+from .cpu import J1
+from .devices import Board
+
+
+class UartBridge:
+    """Run a Board and connect its UART to host streams."""
+
+    def __init__(self, board: Board, slice_cycles: int = 2000):
+        self.board = board
+        self.slice_cycles = slice_cycles
+        # Host connections that receive transmitted bytes
+        self._sinks: List[Callable[[bytes], None]] = []
+        self._stopped = False
+        self._pty = None
+
+    def send(self, data: bytes) -> None:
+        """Deliver bytes from the host to the firmware."""
+        self.board.uart.receive(data)
+
+    def _transmit(self) -> None:
+        data = self.board.uart.take_tx()
+        if data:
+            for sink in list(self._sinks):
+                sink(data)
+
+    async def run(self, cycles: Optional[int] = None) -> None:
+        """Run the emulator (for cycles cycles, or until stop())."""
+        board = self.board
+        end = None if cycles is None else board.cpu.cycles + cycles
+        self._stopped = False
+        while not self._stopped:
+            steps = self.slice_cycles
+            if end is not None:
+                steps = min(steps, end - board.cpu.cycles)
+                if steps <= 0:
+                    break
+            board.run(steps)
+            self._transmit()
+            await asyncio.sleep(0)
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    async def attach_streams(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Connect a stream pair until the host closes it."""
+        sink = writer.write
+        self._sinks.append(sink)
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                self.send(data)
+        finally:
+            self._sinks.remove(sink)
+            writer.close()
+
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """Listen for host connections; port 0 picks a free port."""
+        return await asyncio.start_server(self.attach_streams, host, port)
+
+    def open_pty(self) -> str:
+        """Create a pty for the UART and return the path of its device."""
+        import tty
+
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        loop = asyncio.get_running_loop()
+
+        def readable() -> None:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                return  # nothing attached to the pty yet
+            self.send(data)
+
+        def sink(data: bytes) -> None:
+            try:
+                os.write(master, data)
+            except BlockingIOError:
+                pass  # the host isn't reading; drop like a serial port would
+
+        loop.add_reader(master, readable)
+        self._sinks.append(sink)
+        self._pty = (master, slave)  # keep the slave open so the pty survives
+        return os.ttyname(slave)
+
+
+async def _serve(args) -> None:
+    engine = BlockJ1 if args.blocks else J1
+    board = Board.from_file(args.image, engine=engine)
+    bridge = UartBridge(board)
+    if args.tcp is not None:
+        server = await bridge.serve_tcp(port=args.tcp)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"UART on tcp://{host}:{port}", flush=True)
+    else:
+        print(f"UART on {bridge.open_pty()}", flush=True)
+    await bridge.run()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run J1 firmware on the emulator with its UART on a pty or TCP port"
+    )
+    parser.add_argument("image", type=Path, help="Memory file (hex, coe, mif, mem, bin)")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--pty", action="store_true", help="Expose the UART as a pty (default)")
+    where.add_argument("--tcp", type=int, metavar="PORT", help="Expose the UART on a local TCP port")
+    parser.add_argument("--blocks", action="store_true", help="Use the basic-block emulator")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
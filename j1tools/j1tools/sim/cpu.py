@@ -0,0 +1,410 @@
+"""
+Instruction-level J1 emulator with the semantics of
+hdl/j1-universal-16kb-dualport.v.
+
+Every one of the 65536 opcodes has an entry in a dispatch table shared by
+all emulators, so the inner loop is a single indexed call per instruction,
+which takes and returns the PC:
+
+    pc = table[mem[(pc >> 1) & mask]](cpu, pc)
+
+Literal, jump, conditional jump and call entries are closures with their
+value or target bound in.  ALU entries are decoded into the source of a
+handler that does only what that opcode does (e.g. "dup" is a push and a
+PC increment) and compiled the first time the opcode executes, so start-up
+doesn't pay for the thousands of ALU variants a program never uses.
+
+State follows the RTL: pc is the byte address with bit 0 as the interrupt
+enable, the data and return stacks are the 32-deep shift registers of
+stack3/stack2 (kept as circular lists), and dsp/rsp are 5-bit counters.
+"""
+
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .reference import IRQOPCODE, STACK_FILL, reference_step
+
+MEMWORDS = 4096  # Words in j1_memory_4k
+
+# st0N expression of each ALU operation, in terms of
+# T (st0), N (st1), R (rst0) and S (st2)
+# Key: insn[12:8], Value: Python expression
+_ALU_EXPRESSIONS: Dict[int, str] = {
+    0x00: "T",
+    0x01: "N",
+    0x02: "(T + N) & 0xFFFF",
+    0x03: "T & N",
+    0x04: "T | N",
+    0x05: "T ^ N",
+    0x06: "T ^ 0xFFFF",
+    0x07: "0xFFFF if N == T else 0",
+    0x08: "0xFFFF if (N ^ 0x8000) < (T ^ 0x8000) else 0",
+    0x09: "(T & 0x8000) | (T >> 1)",
+    0x0A: "(T << 1) & 0xFFFF",
+    0x0B: "R",
+    0x0C: "(N - T) & 0xFFFF",
+    0x0D: "s.io.din(T)",
+    0x0E: "s.dsp",
+    0x0F: "0xFFFF if N < T else 0",
+    0x10: "(N << T) & 0xFFFF if T < 16 else 0",
+    0x11: "N >> T",
+    0x12: "(((N ^ 0x8000) - 0x8000) >> (T if T < 16 else 16)) & 0xFFFF",
+    0x13: "s.rsp",
+    0x14: "(T * N) & 0xFFFF",
+    0x15: "(T * N) >> 16",
+    0x16: "(T + 1) & 0xFFFF",
+    0x17: "(T - 1) & 0xFFFF",
+    0x18: "S",
+    # The fetch port is write-first: right after a store it returns the
+    # stored value instead of mem[T]
+    0x19: "s.write_value if s.write_cycle == s.cycles - 1 else s.mem[(T >> 1) & s.mask]",
+}
+
+FUNC_T_N, FUNC_T_R, FUNC_WRITE, FUNC_IOW, FUNC_IOR, FUNC_DINT, FUNC_EINT = range(1, 8)
+
+
+class StopRun(Exception):
+    """
+    Raised by an I/O write handler when the device set stop_request, to end
+    run() after that instruction.  pc is the address of the next one.
+    """
+
+    def __init__(self, pc: int):
+        super().__init__(pc)
+        self.pc = pc
+
+
+def alu_source(insn: int, name: str = "alu") -> str:
+    """Python source of a handler for the ALU instruction insn."""
+    alu = (insn >> 8) & 0x1F
+    expression = _ALU_EXPRESSIONS.get(alu, "T")
+    ret = insn & 0x80
+    func = (insn >> 4) & 7
+    rdelta = (insn >> 2) & 3
+    ddelta = insn & 3
+
+    needs_n = (
+        "N" in expression
+        or func in (FUNC_WRITE, FUNC_IOW)
+        or (ddelta == 1 and func != FUNC_T_N)
+    )
+    needs_r = "R" in expression or ret
+    needs_ds = needs_n or "S" in expression or ddelta or func == FUNC_T_N
+
+    lines = [f"def {name}(s, pc):", "    T = s.st0"]
+    if needs_ds:
+        lines.append("    ds = s.ds")
+        lines.append("    dsp = s.dsp")
+    if needs_n:
+        lines.append("    N = ds[dsp]")
+    if "S" in expression:
+        lines.append("    S = ds[(dsp - 1) & 31]")
+    if needs_r or rdelta in (1, 3) or func == FUNC_T_R:
+        lines.append("    rs = s.rs")
+        lines.append("    rt = s.rtop")
+    if needs_r:
+        lines.append("    R = rs[rt]")
+    if expression != "T":
+        lines.append(f"    value = {expression}")
+
+    # Memory and I/O strobes
+    if func == FUNC_WRITE:
+        lines.append("    s.mem_write(T, N)")
+    elif func == FUNC_IOW:
+        lines.append("    s.io.wr(T, N)")
+    elif func == FUNC_IOR:
+        lines.append("    s.io.rd(T)")
+
+    # Data stack (stack3): the circular index is dsp itself
+    write = "T" if func == FUNC_T_N else None
+    if ddelta == 0:
+        if write:
+            lines.append(f"    ds[dsp] = {write}")
+    elif ddelta == 1:
+        lines.append("    dsp = (dsp + 1) & 31")
+        lines.append(f"    ds[dsp] = {write or 'N'}")
+        lines.append("    s.dsp = dsp")
+    else:
+        drop = 1 if ddelta == 3 else 2
+        lines.append(f"    ds[dsp] = {STACK_FILL:#x}")
+        if drop == 2:
+            lines.append(f"    ds[(dsp - 1) & 31] = {STACK_FILL:#x}")
+        lines.append(f"    dsp = (dsp - {drop}) & 31")
+        if write:
+            lines.append(f"    ds[dsp] = {write}")
+        lines.append("    s.dsp = dsp")
+
+    # Return stack (stack2): a delta of -2 moves rsp but not the contents
+    write = "T" if func == FUNC_T_R else None
+    if rdelta == 0:
+        if write:
+            lines.append(f"    rs[rt] = {write}")
+    elif rdelta == 1:
+        lines.append(f"    rs[(rt + 1) & 31] = {write or 'rs[rt]'}")
+        lines.append("    s.rtop = (rt + 1) & 31")
+        lines.append("    s.rsp = (s.rsp + 1) & 31")
+    elif rdelta == 2:
+        lines.append("    s.rsp = (s.rsp - 2) & 31")
+    else:
+        lines.append(f"    rs[rt] = {STACK_FILL:#x}")
+        lines.append("    rt = (rt - 1) & 31")
+        if write:
+            lines.append(f"    rs[rt] = {write}")
+        lines.append("    s.rtop = rt")
+        lines.append("    s.rsp = (s.rsp - 1) & 31")
+
+    if expression != "T":
+        lines.append("    s.st0 = value")
+
+    # Program counter and interrupt enable
+    if ret:
+        if func == FUNC_DINT:
+            next_pc = "R & 0x7FFE"
+        elif func == FUNC_EINT:
+            next_pc = "(R & 0x7FFE) | 1"
+        else:
+            next_pc = "(R & 0x7FFE) | (R >> 15) | (pc & 1)"
+    elif func == FUNC_DINT:
+        next_pc = "(pc + 2) & 0xFFFE"
+    elif func == FUNC_EINT:
+        next_pc = "(pc + 2) & 0xFFFF | 1"
+    else:
+        next_pc = "(pc + 2) & 0xFFFF"
+    if func == FUNC_IOW:
+        # The device may end the run after this instruction
+        lines.append(f"    pc = {next_pc}")
+        lines.append("    if s.stop_request:")
+        lines.append("        raise StopRun(pc)")
+        lines.append("    return pc")
+    else:
+        lines.append(f"    return {next_pc}")
+    return "\n".join(lines) + "\n"
+
+
+# Compiled ALU handlers shared by every table
+# Key: ALU instruction, Value: handler
+_ALU_HANDLERS: Dict[int, Callable] = {}
+
+
+def alu_handler(insn: int) -> Callable:
+    """Return the compiled handler for an ALU instruction."""
+    handler = _ALU_HANDLERS.get(insn)
+    if handler is None:
+        namespace: Dict[str, Callable] = {"StopRun": StopRun}
+        name = f"alu_{insn:04x}"
+        exec(compile(alu_source(insn, name), f"<j1 {name}>", "exec"), namespace)
+        handler = _ALU_HANDLERS[insn] = namespace[name]
+    return handler
+
+
+def _literal(value: int) -> Callable:
+    def literal(s, pc):
+        dsp = (s.dsp + 1) & 31
+        s.ds[dsp] = s.st0
+        s.dsp = dsp
+        s.st0 = value
+        return (pc + 2) & 0xFFFF
+    return literal
+
+
+def _jump(target: int) -> Callable:
+    def jump(s, pc):
+        return target | (pc & 1)
+    return jump
+
+
+def _zjump(target: int) -> Callable:
+    def zjump(s, pc):
+        ds = s.ds
+        dsp = s.dsp
+        T = s.st0
+        s.st0 = ds[dsp]
+        ds[dsp] = STACK_FILL
+        s.dsp = (dsp - 1) & 31
+        return (pc + 2) & 0xFFFF if T else target | (pc & 1)
+    return zjump
+
+
+def _call(target: int) -> Callable:
+    def call(s, pc):
+        rt = (s.rtop + 1) & 31
+        s.rs[rt] = (pc + 2) & 0xFFFF
+        s.rtop = rt
+        s.rsp = (s.rsp + 1) & 31
+        return target | (pc & 1)
+    return call
+
+
+def _alu_stub(table: List[Callable], insn: int) -> Callable:
+    """Entry that compiles the ALU handler for insn on first use."""
+    def compile_and_run(s, pc):
+        handler = table[insn] = alu_handler(insn)
+        return handler(s, pc)
+    return compile_and_run
+
+
+_TABLE: Optional[List[Callable]] = None
+
+
+def dispatch_table() -> List[Callable]:
+    """The handler of every opcode, indexed by the instruction word."""
+    global _TABLE
+    if _TABLE is None:
+        table: List[Callable] = [None] * 0x10000  # type: ignore[list-item]
+        for insn in range(0x2000):
+            target = insn << 1
+            table[insn] = _jump(target)
+            table[0x2000 | insn] = _zjump(target)
+            table[0x4000 | insn] = _call(target)
+            table[0x6000 | insn] = _ALU_HANDLERS.get(0x6000 | insn) or _alu_stub(table, 0x6000 | insn)
+        for value in range(0x8000):
+            table[0x8000 | value] = _literal(value)
+        _TABLE = table
+    return _TABLE
+
+
+class NullIO:
+    """I/O space with nothing attached: reads return 0, writes are ignored."""
+
+    def din(self, addr: int) -> int:
+        """Value on io_din while io_addr is addr"""
+        return 0
+
+    def rd(self, addr: int) -> None:
+        """io_rd strobe"""
+
+    def wr(self, addr: int, value: int) -> None:
+        """io_wr strobe with io_dout = value"""
+
+
+class J1:
+    """
+    The J1 CPU and its code/data memory.
+
+    Attributes mirror the RTL registers: pc (byte address, bit 0 is the
+    interrupt enable), st0, dsp, rsp, and the stack cells ds/rs.  cycles
+    counts clock cycles since reset and, while an instruction executes, is
+    that instruction's cycle number.  A device that sets stop_request
+    while handling an I/O write ends run() after that instruction.
+    """
+
+    __slots__ = (
+        "pc", "st0", "dsp", "rsp", "ds", "rs", "rtop",
+        "mem", "mask", "io", "cycles", "interrupt_request",
+        "write_cycle", "write_value", "stop_request",
+    )
+
+    def __init__(self, image: Sequence[int] = (), memwords: int = MEMWORDS, io=None):
+        if memwords & (memwords - 1):
+            raise ValueError(f"Memory size must be a power of two, not {memwords}")
+        self.mem = array("H", bytes(2 * memwords))
+        self.mask = memwords - 1
+        self.io = io or NullIO()
+        self.ds = [0] * 32
+        self.rs = [0] * 32
+        self.interrupt_request = False
+        self.stop_request = False
+        self.load(image)
+        self.reset()
+
+    @classmethod
+    def from_file(cls, path, **kwargs) -> "J1":
+        """Create a J1 running the memory file at path (hex, coe, mif, ...)."""
+        from ..memory.convert import read_image
+        return cls(read_image(path), **kwargs)
+
+    def load(self, image: Sequence[int], origin: int = 0) -> None:
+        """Copy image into memory at word address origin."""
+        words = image.words if hasattr(image, "words") else array("H", image)
+        if origin + len(words) > len(self.mem):
+            raise ValueError(
+                f"Image of {len(words)} words does not fit in a memory of {len(self.mem)} words"
+            )
+        self.mem[origin : origin + len(words)] = array("H", words)
+
+    def reset(self) -> None:
+        """
+        Assert and release reset, then run the boot cycle.  The stack
+        cells aren't reset, as in the RTL.
+        """
+        self.pc = self.st0 = self.dsp = self.rsp = self.rtop = 0
+        self.cycles = 0
+        self.write_cycle = self.write_value = -2
+        reference_step(self, notreboot=False)
+
+    def mem_write(self, addr: int, value: int) -> None:
+        """Store value at byte address addr (the N->[T] port)."""
+        self.mem[(addr >> 1) & self.mask] = value
+        self.write_cycle = self.cycles
+        self.write_value = value
+
+    def fetch(self, addr: int) -> int:
+        """Value of mem[T] for byte address addr in the current cycle."""
+        if self.write_cycle == self.cycles - 1:
+            return self.write_value
+        return self.mem[(addr >> 1) & self.mask]
+
+    def _interrupt(self) -> None:
+        """Execute IRQOPCODE: call word 1 with interrupts disabled."""
+        rt = (self.rtop + 1) & 31
+        self.rs[rt] = 0x8000 | self.pc
+        self.rtop = rt
+        self.rsp = (self.rsp + 1) & 31
+        self.pc = (IRQOPCODE & 0x1FFF) << 1
+
+    def step(self) -> None:
+        """Execute one instruction (one clock cycle)."""
+        cycle = self.cycles
+        if self.interrupt_request and self.pc & 1:
+            self._interrupt()
+        else:
+            try:
+                self.pc = dispatch_table()[self.mem[(self.pc >> 1) & self.mask]](self, self.pc)
+            except StopRun as stop:
+                self.stop_request = False
+                self.pc = stop.pc
+        self.cycles = cycle + 1
+
+    def run(self, steps: int) -> None:
+        """Execute steps instructions."""
+        table = dispatch_table()
+        mem = self.mem
+        mask = self.mask
+        end = self.cycles + steps
+        # Handlers take and return the PC, which lives in a local until
+        # the run ends
+        pc = self.pc
+        try:
+            if self.interrupt_request:
+                for self.cycles in range(self.cycles, end):
+                    if pc & 1 and self.interrupt_request:
+                        self.pc = pc
+                        self._interrupt()
+                        pc = self.pc
+                    else:
+                        pc = table[mem[(pc >> 1) & mask]](self, pc)
+            else:
+                for self.cycles in range(self.cycles, end):
+                    pc = table[mem[(pc >> 1) & mask]](self, pc)
+            self.cycles = end
+        except StopRun as stop:
+            self.stop_request = False
+            pc = stop.pc
+            self.cycles += 1
+        finally:
+            self.pc = pc
+
+    @property
+    def word_pc(self) -> int:
+        """Word address of the next instruction"""
+        return (self.pc >> 1) & self.mask
+
+    def data_stack(self) -> List[int]:
+        """The dsp items on the data stack, top (st0) last."""
+        if not self.dsp:
+            return []
+        return [self.ds[i & 31] for i in range(2, self.dsp + 1)] + [self.st0]
+
+    def return_stack(self) -> List[int]:
+        """The rsp items on the return stack, top last."""
+        return [self.rs[(self.rtop - i) & 31] for i in reversed(range(self.rsp))]
@@ -0,0 +1,183 @@
+"""
+Emulator models of the devices hdl/top.v puts on the J1 I/O bus.
+
+    $1000  UART data: read the next received byte (0 when there is none),
+           write a byte to transmit
+    $2000  UART status: bit 1 received data valid, bit 0 transmitter ready
+    $4000  ticks: counts every cycle; a write sets it, and the cycle where
+           it reads $FFFF raises interrupt_request
+    $8000  cycles: counts every cycle since reset
+
+Board ties a J1 (or BlockJ1) to these devices and delivers the ticks
+interrupt on the cycle the RTL would, including after the firmware moves
+the overflow by writing $4000: such a write ends the CPU's run, so the
+next slice is planned from the new count.  The UART has no baud rate by
+default, so firmware sees a byte as soon as the host sends it and never
+waits to transmit; host-side buffering is in bridge.py.
+"""
+
+from collections import deque
+from typing import Optional, Sequence, Type
+
+from .cpu import J1
+
+UART_DATA = 0x1000
+UART_STATUS = 0x2000
+TICKS = 0x4000
+CYCLES = 0x8000
+
+
+class Uart:
+    """
+    buart as seen by firmware.  Bytes from the host wait in rx until the
+    firmware reads $1000; transmitted bytes collect in tx until the host
+    side takes them.  tx_cycles makes the transmitter busy for that many
+    cycles after each write (e.g. 1042 for 115200 baud at 12 MHz).
+    """
+
+    def __init__(self, tx_cycles: int = 0):
+        self.rx: deque = deque()
+        self.tx = bytearray()
+        self.tx_cycles = tx_cycles
+        self.busy_until = 0
+
+    def receive(self, data: bytes) -> None:
+        """Queue bytes sent by the host."""
+        self.rx.extend(data)
+
+    def take_tx(self) -> bytes:
+        """Remove and return the bytes transmitted so far."""
+        data = bytes(self.tx)
+        self.tx.clear()
+        return data
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.rx)
+
+    def ready(self, cycle: int) -> bool:
+        """Whether the transmitter can take a byte in cycle."""
+        return cycle >= self.busy_until
+
+    def read(self) -> None:
+        """Advance past the byte at the head of rx (the rd strobe)."""
+        if self.rx:
+            self.rx.popleft()
+
+    def write(self, value: int, cycle: int) -> None:
+        """Transmit a byte (the wr strobe)."""
+        self.tx.append(value & 0xFF)
+        self.busy_until = cycle + 1 + self.tx_cycles
+
+    def snapshot(self) -> tuple:
+        return bytes(self.rx), bytes(self.tx), self.busy_until
+
+    def restore(self, state: tuple) -> None:
+        rx, tx, self.busy_until = state
+        self.rx = deque(rx)
+        self.tx[:] = tx
+
+
+class TopIO:
+    """
+    The top.v I/O map, for use as a J1's io.  A write to ticks sets the
+    CPU's stop_request, so a run ends after it.
+    """
+
+    def __init__(self, uart: Optional[Uart] = None):
+        self.uart = uart or Uart()
+        self.cpu: Optional[J1] = None
+        # ticks read ticks_base at cycle ticks_cycle and counts from there
+        self.ticks_base = 0
+        self.ticks_cycle = 0
+
+    def attach(self, cpu: J1) -> None:
+        """Use cpu's cycle count as the clock."""
+        self.cpu = cpu
+        cpu.io = self
+
+    def ticks(self, cycle: int) -> int:
+        """Value of the ticks register in cycle."""
+        return (self.ticks_base + cycle - self.ticks_cycle) & 0xFFFF
+
+    def next_interrupt(self, cycle: int) -> int:
+        """First cycle from cycle on in which ticks overflows."""
+        return cycle + ((0xFFFF - self.ticks(cycle)) & 0xFFFF)
+
+    def snapshot(self) -> tuple:
+        """Device state, for checkpoints."""
+        return self.ticks_base, self.ticks_cycle, self.uart.snapshot()
+
+    def restore(self, state: tuple) -> None:
+        self.ticks_base, self.ticks_cycle, uart = state
+        self.uart.restore(uart)
+
+    def din(self, addr: int) -> int:
+        cycle = self.cpu.cycles
+        uart = self.uart
+        if addr == UART_DATA:
+            return uart.rx[0] if uart.rx else 0
+        if addr == UART_STATUS:
+            return (uart.valid << 1) | uart.ready(cycle)
+        if addr == TICKS:
+            return self.ticks(cycle)
+        if addr == CYCLES:
+            return cycle & 0xFFFF
+        return 0
+
+    def rd(self, addr: int) -> None:
+        if addr == UART_DATA:
+            self.uart.read()
+
+    def wr(self, addr: int, value: int) -> None:
+        if addr == UART_DATA:
+            self.uart.write(value, self.cpu.cycles)
+        elif addr == TICKS:
+            # The register takes the value at the end of this cycle, and
+            # the next overflow moves
+            self.ticks_base = value & 0xFFFF
+            self.ticks_cycle = self.cpu.cycles + 1
+            self.cpu.stop_request = True
+
+
+class Board:
+    """
+    A J1 with the top.v devices attached.
+
+    run() executes in slices of at most quantum cycles, each ending before
+    the next ticks overflow, and raises interrupt_request for exactly the
+    cycle in which ticks reads $FFFF.  A write to $4000 ends the slice
+    right after it, and the next slice runs up to the new overflow, so
+    firmware reloading ticks every few cycles never runs past one.
+    """
+
+    def __init__(self, image: Sequence[int] = (), engine: Type[J1] = J1,
+                 uart: Optional[Uart] = None, quantum: int = 4096):
+        self.io = TopIO(uart)
+        self.cpu = engine(image, io=self.io)
+        self.io.attach(self.cpu)
+        self.quantum = quantum
+
+    @classmethod
+    def from_file(cls, path, **kwargs) -> "Board":
+        """Create a Board running the memory file at path."""
+        from ..memory.convert import read_image
+        return cls(read_image(path), **kwargs)
+
+    @property
+    def uart(self) -> Uart:
+        return self.io.uart
+
+    def run(self, steps: int) -> None:
+        """Execute steps cycles."""
+        cpu, io = self.cpu, self.io
+        end = cpu.cycles + steps
+        while cpu.cycles < end:
+            start = cpu.cycles
+            irq = io.next_interrupt(start)
+            if irq == start:
+                cpu.interrupt_request = True
+                cpu.step()
+                cpu.interrupt_request = False
+                continue
+            cpu.run(min(end, irq, start + self.quantum) - start)
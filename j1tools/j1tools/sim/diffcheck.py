@@ -0,0 +1,234 @@
+"""
+Lockstep check of the emulator against an RTL trace.
+
+check() runs an image on the reference model (or the fast emulator) and
+compares it with a trace of hdl/j1-universal-16kb-dualport.v, one clock
+cycle at a time, stopping at the first cycle where pc, insn, st0, dsp,
+rsp or io_wr differ.  The RTL's io_din and interrupt_request are replayed
+into the model, so firmware that reads I/O or takes interrupts stays in
+step.  Traces are read as they are compared, so their length doesn't
+matter for memory.
+
+Traces are VCD dumps of the hdl/tb simulations, sampled at each rising
+edge of clk from the first one with resetq high (the boot cycle), or CSV
+files with one row per cycle:
+
+    cycle,pc,insn,st0,dsp,rsp,io_wr,io_din,interrupt_request
+    1,0x0000,0x0010,0x0000,0,0,0,0,0
+
+where cycle counts from the boot cycle (0) and the columns from io_wr on
+are optional.  Values are decimal or 0x hex.
+
+Usage: j1check firmware.hex trace.vcd [--listing firmware.lst] [--engine dispatch]
+"""
+
+import csv
+import sys
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+from .blocks import BlockJ1
+from .cpu import J1
+from .profile import _LISTING_ROW
+from .reference import IRQOPCODE, reference_step
+
+# Registers compared every cycle, in report order
+REGISTERS = ("pc", "insn", "st0", "dsp", "rsp", "io_wr")
+
+ENGINES = ("reference", "dispatch", "blocks")
+
+
+class RTLStep(NamedTuple):
+    """The RTL during one clock cycle.  None: not in the trace."""
+
+    cycle: int
+    pc: int
+    insn: int
+    st0: int
+    dsp: int
+    rsp: int
+    io_wr: Optional[int] = None
+    io_din: Optional[int] = None
+    interrupt_request: Optional[int] = None
+
+
+@dataclass
+class Divergence:
+    """The first cycle in which the model and the RTL differ."""
+
+    cycle: int
+    pc: int  # Byte address of the instruction the RTL executed
+    insn: int
+    # Key: register, Value: (RTL value, model value)
+    registers: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    source: str = ""  # Listing line of the instruction, if known
+
+
+class _ReplayIO:
+    """I/O for the model: reads return the RTL's io_din; writes are noted."""
+
+    def __init__(self):
+        self.din_value = 0
+        self.wrote = False
+
+    def din(self, addr: int) -> int:
+        return self.din_value
+
+    def rd(self, addr: int) -> None:
+        pass
+
+    def wr(self, addr: int, value: int) -> None:
+        self.wrote = True
+
+
+def csv_steps(path) -> Iterator[RTLStep]:
+    """Read a CSV trace a row at a time."""
+    with open(path, newline="") as f:
+        rows = csv.DictReader(f)
+        missing = {"pc", "insn", "st0", "dsp", "rsp"} - set(rows.fieldnames or ())
+        if missing:
+            raise ValueError(f"{path}: missing columns {', '.join(sorted(missing))}")
+        optional = [name for name in RTLStep._fields[6:] if name in rows.fieldnames]
+        for number, row in enumerate(rows):
+            try:
+                cycle = int(row["cycle"], 0) if "cycle" in row else number
+                yield RTLStep(
+                    cycle,
+                    *(int(row[name], 0) for name in RTLStep._fields[1:6]),
+                    **{name: int(row[name], 0) for name in optional},
+                )
+            except (TypeError, ValueError):
+                raise ValueError(f"{path}:{number + 2}: bad row {row}") from None
+
+
+def vcd_steps(path, clock: str = "clk") -> Iterator[RTLStep]:
+    """Sample a VCD dump at each rising edge of clock, from the boot cycle on."""
+    from ..vcd import VCDFile
+
+    vcd = VCDFile(path)
+    signals = list(RTLStep._fields[1:6])
+    for name in RTLStep._fields[6:] + ("resetq",):
+        try:
+            vcd.find(name)
+            signals.append(name)
+        except ValueError:
+            pass
+    optional = [name for name in signals[5:] if name != "resetq"]
+    reset = signals.index("resetq") if "resetq" in signals else None
+    cycle = 0
+    for _, values in vcd.edges(signals, clock):
+        if reset is not None and not values[reset]:
+            continue
+        yield RTLStep(cycle, *values[:5], **dict(zip(optional, values[5:])))
+        cycle += 1
+
+
+def read_steps(path) -> Iterator[RTLStep]:
+    """Steps of a .vcd or .csv trace."""
+    if Path(path).suffix.lower() == ".csv":
+        return csv_steps(path)
+    return vcd_steps(path)
+
+
+def read_listing(path) -> Dict[int, str]:
+    """The listing line of each word address of a j1asm .lst file."""
+    lines = {}
+    with open(path) as f:
+        for line in f:
+            row = _LISTING_ROW.match(line)
+            if row and row.group(2) != "----":
+                lines.setdefault(int(row.group(1), 16), line.rstrip())
+    return lines
+
+
+def check(image: Sequence[int], steps: Iterable[RTLStep], engine: str = "reference",
+          listing: Optional[Dict[int, str]] = None) -> Tuple[int, Optional[Divergence]]:
+    """
+    Run image in lockstep with steps.  engine is "reference" (the
+    line-by-line model), "dispatch" (J1) or "blocks" (BlockJ1, which runs
+    one cycle at a time here).  Returns the number of cycles compared and
+    the first divergence, or None if the whole trace matched.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine}")
+    io = _ReplayIO()
+    cpu = (BlockJ1 if engine == "blocks" else J1)(image, io=io)
+    mem, mask = cpu.mem, cpu.mask
+    compared = 0
+    for step in steps:
+        if step.cycle < cpu.cycles:
+            continue  # The boot cycle ran when the model was reset
+        if step.cycle > cpu.cycles:
+            raise ValueError(f"Trace skips from cycle {cpu.cycles} to {step.cycle}")
+        irq = bool(step.interrupt_request)
+        insn = IRQOPCODE if irq and cpu.pc & 1 else mem[(cpu.pc >> 1) & mask]
+        model = {"pc": cpu.pc, "insn": insn, "st0": cpu.st0, "dsp": cpu.dsp, "rsp": cpu.rsp}
+        io.din_value = step.io_din or 0
+        io.wrote = False
+        if engine == "reference":
+            reference_step(cpu, irq)
+        else:
+            cpu.interrupt_request = irq
+            cpu.step()
+        model["io_wr"] = int(io.wrote)
+        differ = {
+            name: (getattr(step, name), model[name])
+            for name in REGISTERS
+            if getattr(step, name) is not None and getattr(step, name) != model[name]
+        }
+        if differ:
+            word = (step.pc >> 1) & mask
+            source = (listing or {}).get(word, "")
+            return compared, Divergence(step.cycle, step.pc, step.insn, differ, source)
+        compared += 1
+    return compared, None
+
+
+def format_divergence(divergence: Divergence) -> str:
+    """Report of a divergence, with the instruction and the differing registers."""
+    from ..vcd import mnemonic
+
+    d = divergence
+    lines = [
+        f"Divergence in cycle {d.cycle}: {d.pc >> 1:04x}  {d.insn:04x}  {mnemonic(d.insn)}",
+    ]
+    if d.source:
+        lines.append(f"  {d.source}")
+    lines.append(f"  {'REGISTER':<10} {'RTL':>6} {'MODEL':>6}")
+    for name, (rtl, model) in d.registers.items():
+        lines.append(f"  {name:<10} {rtl:>6x} {model:>6x}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None) -> None:
+    from ..memory.convert import read_image
+
+    parser = argparse.ArgumentParser(
+        description="Check the J1 emulator cycle by cycle against an RTL trace"
+    )
+    parser.add_argument("image", type=Path, help="Memory file the RTL ran")
+    parser.add_argument("trace", type=Path, help="RTL trace (.vcd or .csv)")
+    parser.add_argument("--listing", type=Path, help="j1asm listing (default: the image's .lst)")
+    parser.add_argument("--engine", choices=ENGINES, default="reference",
+                        help="Model to run (default: reference)")
+    args = parser.parse_args(argv)
+
+    try:
+        listing_path = args.listing or args.image.with_suffix(".lst")
+        listing = read_listing(listing_path) if listing_path.exists() else {}
+        compared, divergence = check(read_image(args.image), read_steps(args.trace), args.engine, listing)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if divergence:
+        sys.stdout.write(format_divergence(divergence))
+        print(f"{compared} cycles matched before it")
+        sys.exit(1)
+    print(f"{compared} cycles match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Execution profiler for J1 firmware.
+
+ProfilingJ1 is a J1 whose run loop also bumps a per-word hit counter (a
+flat array indexed by word address, so there's no dict lookup per step).
+CALL and return opcodes go through wrapped entries of a private copy of
+the dispatch table that keep a shadow call stack, giving each subroutine
+its call count and inclusive cycles; everything else runs the shared
+handlers unchanged.  Exclusive cycles are the hits between a label from
+the .sym file and the next one.
+
+    j1prof firmware.hex --cycles 5000000 --send "1 2 + .\\n"
+
+runs firmware on an emulated board and prints the subroutine profile and
+the .lst listing with a count and percentage in front of every word.
+"""
+
+import re
+import sys
+import argparse
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from .cpu import J1, MEMWORDS, StopRun, _alu_stub, _ALU_HANDLERS, alu_handler, dispatch_table
+
+# A listing row: byte address, word address, code or ---- for a label
+_LISTING_ROW = re.compile(r"^[0-9a-f]{4}\s+([0-9a-f]{4})\s+([0-9a-f]{4}|----)\s")
+
+
+@dataclass
+class RoutineProfile:
+    """Cycles spent in the code from one label to the next."""
+
+    name: str
+    addr: int
+    calls: int
+    exclusive: int
+    inclusive: int
+
+
+class ProfilingJ1(J1):
+    """A J1 that counts executions of every word and times subroutines."""
+
+    __slots__ = ("hits", "calls", "inclusive", "_frames", "_table")
+
+    def __init__(self, image: Sequence[int] = (), memwords: int = MEMWORDS, io=None):
+        self.hits = array("L", [0]) * memwords
+        self.calls = array("L", [0]) * memwords
+        self.inclusive = array("L", [0]) * memwords
+        # Subroutines entered and not yet returned from, innermost last
+        # Value: (word address, cycle of the CALL, rsp before the CALL)
+        self._frames: List[Tuple[int, int, int]] = []
+        self._table = self._profiling_table(memwords - 1)
+        super().__init__(image, memwords, io)
+
+    def clear(self) -> None:
+        """Zero the counters."""
+        for counter in (self.hits, self.calls, self.inclusive):
+            counter[:] = array("L", [0]) * len(counter)
+        self._frames.clear()
+
+    def _enter(self, word: int) -> None:
+        self.calls[word] += 1
+        self._frames.append((word, self.cycles, self.rsp))
+
+    def _leave(self) -> None:
+        """Close the frames the return stack has dropped below."""
+        frames = self._frames
+        rsp = self.rsp
+        while frames and frames[-1][2] >= rsp:
+            word, start, _ = frames.pop()
+            # Recursive calls count once, in the outermost frame
+            if all(frame[0] != word for frame in frames):
+                self.inclusive[word] += self.cycles + 1 - start
+
+    def _profiling_table(self, mask: int) -> List[Callable]:
+        table = list(dispatch_table())
+        enter, leave = self._enter, self._leave
+
+        def call(handler, word):
+            def profiled_call(s, pc):
+                enter(word)
+                return handler(s, pc)
+            return profiled_call
+
+        def ret(insn):
+            def profiled_return(s, pc):
+                try:
+                    pc = (_ALU_HANDLERS.get(insn) or alu_handler(insn))(s, pc)
+                except StopRun:
+                    # An I/O write ended the run; the return still happened
+                    leave()
+                    raise
+                leave()
+                return pc
+            return profiled_return
+
+        for insn in range(0x2000):
+            table[0x4000 | insn] = call(table[0x4000 | insn], insn & mask)
+            alu = 0x6000 | insn
+            if alu & 0x80:
+                table[alu] = ret(alu)
+            elif alu not in _ALU_HANDLERS:
+                table[alu] = _alu_stub(table, alu)
+        return table
+
+    def _interrupt(self) -> None:
+        # IRQOPCODE calls word 1, and its cycle is counted there
+        self.hits[1] += 1
+        self._enter(1)
+        super()._interrupt()
+
+    def run(self, steps: int) -> None:
+        """Execute steps instructions, counting each word executed."""
+        table = self._table
+        hits = self.hits
+        mem = self.mem
+        mask = self.mask
+        end = self.cycles + steps
+        pc = self.pc
+        try:
+            if self.interrupt_request:
+                for self.cycles in range(self.cycles, end):
+                    if pc & 1 and self.interrupt_request:
+                        self.pc = pc
+                        self._interrupt()
+                        pc = self.pc
+                    else:
+                        word = (pc >> 1) & mask
+                        hits[word] += 1
+                        pc = table[mem[word]](self, pc)
+            else:
+                for self.cycles in range(self.cycles, end):
+                    word = (pc >> 1) & mask
+                    hits[word] += 1
+                    pc = table[mem[word]](self, pc)
+            self.cycles = end
+        except StopRun as stop:
+            self.stop_request = False
+            pc = stop.pc
+            self.cycles += 1
+        finally:
+            self.pc = pc
+
+    def step(self) -> None:
+        self.run(1)
+
+    def profile(self, symbols: Mapping[str, int]) -> List[RoutineProfile]:
+        """
+        Cycles per label of symbols (name to word address, as in a .sym
+        file), in address order.  Words before the first label are
+        reported under "(start)".
+        """
+        labels = sorted((addr, name) for name, addr in symbols.items())
+        if not labels or labels[0][0] > 0:
+            labels.insert(0, (0, "(start)"))
+        bounds = [addr for addr, _ in labels[1:]] + [len(self.hits)]
+        routines = []
+        for (addr, name), stop in zip(labels, bounds):
+            routines.append(RoutineProfile(
+                name, addr, self.calls[addr], sum(self.hits[addr:stop]), self.inclusive[addr],
+            ))
+        return routines
+
+
+def read_symbols(path) -> Dict[str, int]:
+    """Read a j1asm .sym file into a map of label to word address."""
+    symbols = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 2:
+                symbols[fields[1]] = int(fields[0], 16)
+    return symbols
+
+
+def format_profile(routines: Iterable[RoutineProfile], total: int) -> str:
+    """Table of the routines that ran, hottest (exclusive) first."""
+    lines = [f"{'CALLS':>10} {'EXCLUSIVE':>12} {'%':>6} {'INCLUSIVE':>12} {'%':>6}  WORD  NAME"]
+    total = total or 1
+    for r in sorted(routines, key=lambda r: (-r.exclusive, r.addr)):
+        if r.exclusive or r.calls:
+            lines.append(
+                f"{r.calls:>10} {r.exclusive:>12} {100 * r.exclusive / total:>6.2f}"
+                f" {r.inclusive:>12} {100 * r.inclusive / total:>6.2f}  {r.addr:04x}  {r.name}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def annotate_listing(lines: Iterable[str], hits: Sequence[int]) -> str:
+    """
+    Put the hit count and percentage of each word in front of the
+    listing lines made by J1Assembler.generate_listing_line (or read from
+    a .lst file).  Labels and other lines get blank columns.
+    """
+    total = sum(hits) or 1
+    blank = " " * 21
+    out = []
+    for line in lines:
+        row = _LISTING_ROW.match(line)
+        if line.startswith("BYTE"):
+            prefix = f"{'COUNT':>12} {'%':>6}  "
+        elif line.startswith("---"):
+            prefix = "-" * len(blank)
+        elif row and row.group(2) != "----" and hits[int(row.group(1), 16)]:
+            count = hits[int(row.group(1), 16)]
+            prefix = f"{count:>12} {100 * count / total:>6.2f}  "
+        else:
+            prefix = blank
+        out.append(prefix + line if line.endswith("\n") else f"{prefix}{line}\n")
+    return "".join(out)
+
+
+def listing_lines(assembler) -> List[str]:
+    """The listing of an assembled J1Assembler, as generate_listing writes it."""
+    lines = []
+    for word_addr in sorted(assembler.instruction_metadata):
+        if word_addr in assembler.label_metadata:
+            lines.append(assembler.generate_listing_line(word_addr, 0, assembler.label_metadata[word_addr]))
+        metadata = assembler.instruction_metadata[word_addr]
+        lines.append(assembler.generate_listing_line(word_addr, metadata.value, metadata))
+    return lines
+
+
+def main(argv=None) -> None:
+    from .devices import Board
+
+    parser = argparse.ArgumentParser(
+        description="Profile J1 firmware on the emulator and annotate its listing"
+    )
+    parser.add_argument("image", type=Path, help="Memory file; its .sym and .lst are read if present")
+    parser.add_argument("-n", "--cycles", type=int, default=1_000_000, help="Cycles to run")
+    parser.add_argument("--send", default="", help="Text sent to the UART before running")
+    parser.add_argument("-o", "--output", type=Path, help="Annotated listing (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        board = Board.from_file(args.image, engine=ProfilingJ1)
+        board.uart.receive(args.send.encode().decode("unicode_escape").encode("latin-1"))
+        board.run(args.cycles)
+        cpu = board.cpu
+        sym = args.image.with_suffix(".sym")
+        symbols = read_symbols(sym) if sym.exists() else {}
+        report = format_profile(cpu.profile(symbols), sum(cpu.hits))
+        lst = args.image.with_suffix(".lst")
+        if lst.exists():
+            with open(lst) as f:
+                report += "\n" + annotate_listing(f, cpu.hits)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        args.output.write_text(report)
+    else:
+        sys.stdout.write(report)
+
+
+if __name__ == "__main__":
+    main()
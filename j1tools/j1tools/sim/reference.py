@@ -0,0 +1,157 @@
+"""
+Reference model of one J1 clock cycle, written to follow
+hdl/j1-universal-16kb-dualport.v, stack2.v and stack3.v line by line.
+
+It decodes every field of the instruction on every call, so it is slow;
+the fast emulator in cpu.py is checked against it, and it runs the boot
+cycle, where the RTL executes the data and return stack effects of the
+word at address 0 while holding the PC at zero.
+"""
+
+# Fill pattern shifted into a stack's deepest cell on a pop
+STACK_FILL = 0x55AA
+
+IRQOPCODE = 0x4001  # Interrupt: call word 1 (byte address 2)
+
+
+def _sext2(delta: int) -> int:
+    """Sign-extend a 2-bit stack delta."""
+    return delta - 4 if delta & 2 else delta
+
+
+def _stack_update(cells, top, we, delta, wd, allow_drop2):
+    """
+    Apply a stack2/stack3 update to a shift-register stack kept as a
+    circular list with `top` as the index of the top cell.  Returns the
+    new top index.
+    """
+    if delta == 1:
+        below = cells[top]
+        top = (top + 1) & 31
+        cells[top] = wd if we else below
+    elif delta == 3:
+        cells[top] = STACK_FILL
+        top = (top - 1) & 31
+        if we:
+            cells[top] = wd
+    elif delta == 2:
+        # stack2 leaves its contents alone for a delta of -2
+        if not allow_drop2:
+            return top
+        cells[top] = STACK_FILL
+        cells[(top - 1) & 31] = STACK_FILL
+        top = (top - 2) & 31
+        if we:
+            cells[top] = wd
+    elif we:
+        cells[top] = wd
+    return top
+
+
+def reference_step(cpu, interrupt_request: bool = False, notreboot: bool = True) -> None:
+    """Execute one clock cycle of the J1 on cpu's state."""
+    pc, st0, dsp, rsp = cpu.pc, cpu.st0, cpu.dsp, cpu.rsp
+    ds, rs = cpu.ds, cpu.rs
+    mask = cpu.mask
+
+    interrupt_enable = pc & 1
+    interrupt = bool(interrupt_request and interrupt_enable)
+    insn = IRQOPCODE if interrupt else cpu.mem[(pc >> 1) & mask]
+    pc_plus_2 = 0x8000 | pc if interrupt else (pc + 2) & 0xFFFF
+
+    st1 = ds[dsp]
+    st2 = ds[(dsp - 1) & 31]
+    rst0 = rs[cpu.rtop]
+
+    minus = (0x10000 | (~st0 & 0xFFFF)) + st1 + 1
+    signedless = (st1 >> 15) if (st0 ^ st1) & 0x8000 else (minus >> 16) & 1
+    unsignedless = (minus >> 16) & 1
+    zeroflag = (minus & 0xFFFF) == 0
+    umstar = st0 * st1
+
+    op = insn >> 8
+    if op >= 0x80:
+        st0N = insn & 0x7FFF
+    elif op >> 5 == 1:
+        st0N = st1
+    elif op >> 5 != 3:
+        st0N = st0
+    else:
+        alu = op & 0x1F
+        st0N = {
+            0x01: lambda: st1,
+            0x02: lambda: (st0 + st1) & 0xFFFF,
+            0x03: lambda: st0 & st1,
+            0x04: lambda: st0 | st1,
+            0x05: lambda: st0 ^ st1,
+            0x06: lambda: ~st0 & 0xFFFF,
+            0x07: lambda: 0xFFFF if zeroflag else 0,
+            0x08: lambda: 0xFFFF if signedless else 0,
+            0x09: lambda: (st0 & 0x8000) | (st0 >> 1),
+            0x0A: lambda: (st0 << 1) & 0xFFFF,
+            0x0B: lambda: rst0,
+            0x0C: lambda: minus & 0xFFFF,
+            0x0D: lambda: cpu.io.din(st0),
+            0x0E: lambda: dsp,
+            0x0F: lambda: 0xFFFF if unsignedless else 0,
+            0x10: lambda: (st1 << st0) & 0xFFFF if st0 < 16 else 0,
+            0x11: lambda: st1 >> st0,
+            0x12: lambda: (((st1 ^ 0x8000) - 0x8000) >> min(st0, 16)) & 0xFFFF,
+            0x13: lambda: rsp,
+            0x14: lambda: umstar & 0xFFFF,
+            0x15: lambda: umstar >> 16,
+            0x16: lambda: (st0 + 1) & 0xFFFF,
+            0x17: lambda: (st0 - 1) & 0xFFFF,
+            0x18: lambda: st2,
+            0x19: lambda: cpu.fetch(st0),
+        }.get(alu, lambda: st0)()
+
+    func = (insn >> 4) & 7
+    is_alu = notreboot and insn >> 13 == 3
+    if is_alu and func == 3:
+        cpu.mem_write(st0, st1)
+    if is_alu and func == 4:
+        cpu.io.wr(st0, st1)
+    if is_alu and func == 5:
+        cpu.io.rd(st0)
+    eint = is_alu and func == 7
+    dint = is_alu and func == 6
+
+    interrupt_enableN = int((interrupt_enable or eint) and not (dint or interrupt))
+    interrupt_enableN_return = int(
+        ((rst0 >> 15) or interrupt_enable or eint) and not (dint or interrupt)
+    )
+    rstkD = st0 if insn & 0x2000 else pc_plus_2
+
+    kind = insn >> 13
+    if kind >= 4:
+        dstkW, dspI = True, 1
+    elif kind == 1:
+        dstkW, dspI = False, 3
+    elif kind == 3:
+        dstkW, dspI = func == 1, insn & 3
+    else:
+        dstkW, dspI = False, 0
+    if kind == 2:
+        rstkW, rspI = True, 1
+    elif kind == 3:
+        rstkW, rspI = func == 2, (insn >> 2) & 3
+    else:
+        rstkW, rspI = False, 0
+
+    if not notreboot:
+        pcN = 0
+    elif kind in (0, 2) or (kind == 1 and st0 == 0):
+        pcN = ((insn & 0x1FFF) << 1) | interrupt_enableN
+    elif kind == 3 and insn & 0x80:
+        pcN = (rst0 & 0x7FFE) | interrupt_enableN_return
+    else:
+        pcN = (pc_plus_2 & 0xFFFE) | interrupt_enableN
+
+    _stack_update(ds, dsp, dstkW, dspI, st0, True)
+    cpu.rtop = _stack_update(rs, cpu.rtop, rstkW, rspI, rstkD, False)
+    cpu.pc = pcN
+    cpu.dsp = (dsp + _sext2(dspI)) & 31
+    cpu.rsp = (rsp + _sext2(rspI)) & 31
+    cpu.st0 = st0N
+    cpu.cycles += 1
@@ -0,0 +1,150 @@
+"""
+Emulator snapshot files, for starting from a warm machine.
+
+save() writes the full state of a J1 or Board -- registers, both stacks,
+cycle count, device state and memory -- to a versioned binary file.
+load() maps the file with mmap and uses the memory section in place as the
+CPU's memory: pages are copy-on-write and private, so loading costs the
+same for any memory size, and the running machine never changes the file.
+
+Every snapshot records the SHA-256 of the image the machine booted from;
+load() checks it against the image given, so a snapshot can't outlive a
+rebuild of its firmware.  A test suite can boot Forth once, save, and
+start each test from the prompt:
+
+    if not path.exists():
+        board = Board(image)
+        board.run(200_000)
+        save(board, path, image)
+    board = load(path, image)
+
+Layout (little-endian):
+    header   magic, version, memwords, flags, image SHA-256, cycles,
+             pc, st0, dsp, rsp, rtop, write_cycle, write_value,
+             interrupt_request, device section size
+    stacks   ds and rs, 32 words each
+    devices  Board only: ticks, UART configuration and queues
+    memory   memwords words, at a multiple of MEMORY_ALIGN
+"""
+
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+from functools import partial
+from pathlib import Path
+from typing import Type, Union
+
+from .cpu import J1
+
+MAGIC = b"J1SNAP"
+VERSION = 1
+
+# Offset alignment of the memory section
+MEMORY_ALIGN = 64
+
+_HEADER = struct.Struct("<6sHII32sQHHBBBqqBI")
+_STACKS = struct.Struct("<32H32H")
+_DEVICES = struct.Struct("<HQIQII")  # ticks base/cycle, tx_cycles, busy_until, rx/tx lengths
+
+# Header flags
+_BOARD = 1
+
+
+def image_hash(image) -> bytes:
+    """SHA-256 of a memory image's words (a sequence, MemoryImage or file path)."""
+    if isinstance(image, (str, Path)):
+        from ..memory.convert import read_image
+        image = read_image(image)
+    words = array("H", image.words if hasattr(image, "words") else image)
+    if sys.byteorder != "little":
+        words.byteswap()
+    return hashlib.sha256(words.tobytes()).digest()
+
+
+def save(machine, path, image) -> None:
+    """Write the state of machine (a J1 or Board), booted from image, to path."""
+    cpu = getattr(machine, "cpu", machine)
+    devices = b""
+    flags = 0
+    if cpu is not machine:
+        flags |= _BOARD
+        uart = machine.uart
+        ticks_base, ticks_cycle, (rx, tx, busy_until) = machine.io.snapshot()
+        devices = _DEVICES.pack(
+            ticks_base, ticks_cycle, uart.tx_cycles, busy_until, len(rx), len(tx),
+        ) + rx + tx
+    header = _HEADER.pack(
+        MAGIC, VERSION, len(cpu.mem), flags, image_hash(image), cpu.cycles,
+        cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, cpu.write_cycle, cpu.write_value,
+        cpu.interrupt_request, len(devices),
+    )
+    data = header + _STACKS.pack(*cpu.ds, *cpu.rs) + devices
+    data += bytes(-len(data) % MEMORY_ALIGN)
+    memory = array("H", cpu.mem)
+    if sys.byteorder != "little":
+        memory.byteswap()
+    with open(path, "wb") as f:
+        f.write(data)
+        f.write(memory.tobytes())
+
+
+def load(path, image=None, engine: Type[J1] = J1, **kwargs) -> Union[J1, "Board"]:
+    """
+    Restore the machine saved at path: a Board if one was saved (kwargs
+    go to Board, e.g. quantum), else an engine instance, which takes no
+    kwargs.  If image is given, raise ValueError unless the snapshot was
+    taken from it.
+    """
+    from .devices import Board, Uart
+
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except ValueError:
+            raise ValueError(f"{path}: empty snapshot file") from None
+    if len(data) < _HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path}: not a J1 snapshot")
+    (_, version, memwords, flags, digest, cycles, pc, st0, dsp, rsp, rtop,
+     write_cycle, write_value, interrupt_request, device_size) = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"{path}: snapshot version {version}, expected {VERSION}")
+    if image is not None and digest != image_hash(image):
+        raise ValueError(f"{path}: snapshot was taken from a different image")
+    offset = _HEADER.size + _STACKS.size + device_size
+    offset += -offset % MEMORY_ALIGN
+    if len(data) != offset + 2 * memwords:
+        raise ValueError(f"{path}: truncated snapshot")
+
+    if flags & _BOARD:
+        devices = _HEADER.size + _STACKS.size
+        ticks_base, ticks_cycle, tx_cycles, busy_until, rx_size, tx_size = (
+            _DEVICES.unpack_from(data, devices)
+        )
+        queues = devices + _DEVICES.size
+        rx = data[queues : queues + rx_size]
+        tx = data[queues + rx_size : queues + rx_size + tx_size]
+        machine = Board(engine=partial(engine, memwords=memwords), uart=Uart(tx_cycles), **kwargs)
+        machine.io.restore((ticks_base, ticks_cycle, (rx, tx, busy_until)))
+        cpu = machine.cpu
+    elif kwargs:
+        raise TypeError(f"{path}: CPU snapshot, unexpected options {', '.join(kwargs)}")
+    else:
+        machine = cpu = engine(memwords=memwords)
+
+    (cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, cpu.cycles, cpu.write_cycle,
+     cpu.write_value, cpu.interrupt_request) = (
+        pc, st0, dsp, rsp, rtop, cycles, write_cycle, write_value, bool(interrupt_request),
+    )
+    stacks = _STACKS.unpack_from(data, _HEADER.size)
+    cpu.ds[:] = stacks[:32]
+    cpu.rs[:] = stacks[32:]
+    if sys.byteorder == "little":
+        cpu.mem = memoryview(data)[offset:].cast("H")
+    else:
+        cpu.mem = array("H", data[offset:])
+        cpu.mem.byteswap()
+    if hasattr(cpu, "flush"):
+        cpu.flush()
+    return machine
@@ -0,0 +1,177 @@
+"""
+Checkpoints and time-travel stepping for the emulator.
+
+TimeTravel runs a J1 or a Board and takes a checkpoint every interval
+cycles: the registers, both stacks, the device state (for I/O objects with
+snapshot() and restore(), such as TopIO) and memory.  Memory is kept as
+pages of PAGE_WORDS words; a checkpoint stores only the pages that changed
+since the previous one and shares the rest, so a program that only touches
+its stacks and a few variables costs little more than its registers per
+checkpoint.  At most max_checkpoints are kept, dropping the oldest, which
+bounds both the memory used and how far back one can go.
+
+Going back is restore plus replay: goto(cycle) restores the last
+checkpoint at or before cycle and runs forward to it.  Bytes sent to the
+UART through send() are logged with their cycle and replayed, so replays
+see the same input as the original run.
+"""
+
+import bisect
+from array import array
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .cpu import J1
+
+PAGE_WORDS = 64
+
+
+@dataclass
+class Checkpoint:
+    """State of the machine at the start of a cycle."""
+
+    cycles: int
+    registers: tuple
+    ds: List[int]
+    rs: List[int]
+    pages: Tuple[bytes, ...]
+    devices: Optional[tuple]
+    inputs: int  # Entries of the input log already delivered
+
+
+class TimeTravel:
+    """Run a J1 or Board with checkpoints, and step it backwards."""
+
+    def __init__(self, machine, interval: int = 100_000, max_checkpoints: int = 256):
+        if interval < 1:
+            raise ValueError("Checkpoint interval must be at least 1 cycle")
+        self.machine = machine
+        self.cpu: J1 = getattr(machine, "cpu", machine)
+        self.interval = interval
+        self.max_checkpoints = max_checkpoints
+        self.checkpoints: List[Checkpoint] = []
+        # Host input: (cycle, bytes) in the order it was sent
+        self.inputs: List[Tuple[int, bytes]] = []
+        self._delivered = 0
+        self.checkpoint()
+
+    @property
+    def cycles(self) -> int:
+        return self.cpu.cycles
+
+    def _pages(self) -> Tuple[bytes, ...]:
+        """Memory as pages, sharing the ones that match the last checkpoint."""
+        data = self.cpu.mem.tobytes()
+        size = 2 * PAGE_WORDS
+        pages = [data[i : i + size] for i in range(0, len(data), size)]
+        if self.checkpoints:
+            previous = self.checkpoints[-1].pages
+            pages = [old if old == new else new for old, new in zip(previous, pages)]
+        return tuple(pages)
+
+    def checkpoint(self) -> Checkpoint:
+        """Record the current state (replacing any later checkpoints)."""
+        cpu = self.cpu
+        cycles = cpu.cycles
+        index = bisect.bisect_left([c.cycles for c in self.checkpoints], cycles)
+        del self.checkpoints[index:]
+        io = cpu.io
+        checkpoint = Checkpoint(
+            cycles,
+            (cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, cpu.write_cycle, cpu.write_value,
+             cpu.interrupt_request),
+            list(cpu.ds),
+            list(cpu.rs),
+            self._pages(),
+            io.snapshot() if hasattr(io, "snapshot") else None,
+            self._delivered,
+        )
+        self.checkpoints.append(checkpoint)
+        if len(self.checkpoints) > self.max_checkpoints:
+            del self.checkpoints[0]
+        return checkpoint
+
+    def _restore(self, checkpoint: Checkpoint) -> None:
+        cpu = self.cpu
+        (cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, cpu.write_cycle, cpu.write_value,
+         cpu.interrupt_request) = checkpoint.registers
+        cpu.cycles = checkpoint.cycles
+        cpu.ds[:] = checkpoint.ds
+        cpu.rs[:] = checkpoint.rs
+        cpu.mem[:] = array("H", b"".join(checkpoint.pages))
+        if hasattr(cpu, "flush"):
+            cpu.flush()
+        if checkpoint.devices is not None:
+            cpu.io.restore(checkpoint.devices)
+        self._delivered = checkpoint.inputs
+
+    def send(self, data: bytes) -> None:
+        """
+        Deliver host bytes to the UART now.  Sending after going back
+        starts a new timeline: later checkpoints and input are dropped.
+        """
+        cycles = self.cpu.cycles
+        del self.inputs[self._delivered :]
+        index = bisect.bisect_right([c.cycles for c in self.checkpoints], cycles)
+        del self.checkpoints[index:]
+        self.inputs.append((cycles, bytes(data)))
+        self._delivered += 1
+        self.machine.uart.receive(data)
+
+    def _advance(self, target: int) -> None:
+        """Run forward to cycle target, replaying logged input and checkpointing."""
+        cpu = self.cpu
+        while cpu.cycles < target:
+            now = cpu.cycles
+            if self._delivered < len(self.inputs) and self.inputs[self._delivered][0] <= now:
+                self.machine.uart.receive(self.inputs[self._delivered][1])
+                self._delivered += 1
+                continue
+            if now % self.interval == 0 and self.checkpoints[-1].cycles < now:
+                self.checkpoint()
+            stop = min(target, (now // self.interval + 1) * self.interval)
+            if self._delivered < len(self.inputs):
+                stop = min(stop, self.inputs[self._delivered][0])
+            self.machine.run(stop - now)
+
+    def run(self, steps: int) -> None:
+        """Execute steps cycles."""
+        self._advance(self.cpu.cycles + steps)
+
+    def goto(self, cycle: int) -> None:
+        """Move to the start of cycle, backwards or forwards."""
+        if cycle < self.cpu.cycles:
+            index = bisect.bisect_right([c.cycles for c in self.checkpoints], cycle) - 1
+            if index < 0:
+                raise ValueError(
+                    f"Cycle {cycle} is before the oldest checkpoint "
+                    f"({self.checkpoints[0].cycles})"
+                )
+            self._restore(self.checkpoints[index])
+        self._advance(cycle)
+
+    def step_back(self, steps: int = 1) -> None:
+        """Undo the last steps cycles."""
+        self.goto(max(self.cpu.cycles - steps, self.checkpoints[0].cycles))
+
+    def run_back_to(self, word: int) -> Optional[int]:
+        """
+        Go back to the most recent cycle that was about to execute the
+        instruction at word address word, and return it.  Returns None,
+        staying put, if that word hasn't run since the oldest checkpoint.
+        """
+        cpu = self.cpu
+        now = cpu.cycles
+        starts = [c.cycles for c in self.checkpoints if c.cycles < now]
+        for start, stop in reversed(list(zip(starts, starts[1:] + [now]))):
+            self.goto(start)
+            found = None
+            while cpu.cycles < stop:
+                if cpu.word_pc == word:
+                    found = cpu.cycles
+                self._advance(cpu.cycles + 1)
+            if found is not None:
+                self.goto(found)
+                return found
+        self.goto(now)
+        return None
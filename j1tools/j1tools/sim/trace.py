@@ -0,0 +1,311 @@
+"""
+Compact instruction traces of emulator runs, with random access by cycle.
+
+A trace holds the state at the start of every cycle -- pc, st0, dsp and
+rsp -- and the I/O bus events of the cycle.  Each step is one flags byte
+plus varints for only what the flags say changed:
+
+    bit 0  pc is not the next word: zigzag(pc - previous pc - 2)
+    bit 1  st0 changed: zigzag of the 16-bit difference
+    bit 2  dsp changed: zigzag of the 5-bit difference
+    bit 3  rsp changed: zigzag of the 5-bit difference
+    bit 4  I/O: event count, then per event its kind, address and
+           (except for rd) value
+
+so straight-line code costs one to three bytes a step before compression.
+Steps are grouped into zlib-compressed chunks of chunk_steps, each
+starting from a keyframe of full values, and the file ends with an index
+of chunk offsets.  Seeking to a cycle reads the index entry and decodes at
+most one chunk, however long the trace.
+
+    with TraceWriter("run.j1t") as writer:
+        trace(board, 10_000_000, writer)
+    with TraceReader("run.j1t") as reader:
+        for cycle, pc, st0, dsp, rsp in reader.window(5_000_000, 5_000_100):
+            ...
+"""
+
+import zlib
+import struct
+from array import array
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+MAGIC = b"J1TRACE"
+VERSION = 1
+
+_HEADER = struct.Struct("<7sHI")  # magic, version, chunk_steps
+_TRAILER = struct.Struct("<QQQ")  # index offset, first cycle, steps
+_CHUNK = struct.Struct("<I")  # compressed size
+
+_PC, _ST0, _DSP, _RSP, _IO = 1, 2, 4, 8, 16
+
+# I/O event kinds
+DIN, RD, WR = 0, 1, 2
+
+
+class TraceStep(NamedTuple):
+    cycle: int
+    pc: int
+    st0: int
+    dsp: int
+    rsp: int
+
+
+class IOEvent(NamedTuple):
+    cycle: int
+    kind: int  # DIN, RD or WR
+    addr: int
+    value: int  # read or written; 0 for RD
+
+
+def _varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    """The varint at position, and the position after it."""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _zigzag(delta: int) -> int:
+    return delta << 1 if delta >= 0 else (-delta << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+class TraceWriter:
+    """Write steps to a trace file, one chunk in memory at a time."""
+
+    def __init__(self, path, chunk_steps: int = 4096, level: int = 1):
+        if chunk_steps < 1:
+            raise ValueError("Chunks must hold at least one step")
+        self.chunk_steps = chunk_steps
+        self.level = level
+        self.first_cycle = None
+        self.steps = 0
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, chunk_steps))
+        self._offsets = array("Q")
+        self._chunk = bytearray()
+        self._previous = (0, 0, 0, 0)
+
+    def record(self, cycle: int, pc: int, st0: int, dsp: int, rsp: int,
+               events: Sequence[Tuple[int, int, int]] = ()) -> None:
+        """
+        Append the state at the start of cycle and the (kind, addr,
+        value) I/O events of the cycle.  Cycles must be consecutive.
+        """
+        if self.first_cycle is None:
+            self.first_cycle = cycle
+        elif cycle != self.first_cycle + self.steps:
+            raise ValueError(f"Expected cycle {self.first_cycle + self.steps}, not {cycle}")
+        chunk = self._chunk
+        if self.steps % self.chunk_steps == 0:
+            self._flush()
+            for value in (pc, st0, dsp, rsp):
+                _varint(chunk, value)
+            previous = (pc - 2, st0, dsp, rsp)
+        else:
+            previous = self._previous
+        flags = 0
+        fields = bytearray()
+        if pc != previous[0] + 2:
+            flags |= _PC
+            _varint(fields, _zigzag(pc - previous[0] - 2))
+        if st0 != previous[1]:
+            flags |= _ST0
+            delta = (st0 - previous[1]) & 0xFFFF
+            _varint(fields, _zigzag(delta - 0x10000 if delta & 0x8000 else delta))
+        if dsp != previous[2]:
+            flags |= _DSP
+            delta = (dsp - previous[2]) & 31
+            _varint(fields, _zigzag(delta - 32 if delta & 16 else delta))
+        if rsp != previous[3]:
+            flags |= _RSP
+            delta = (rsp - previous[3]) & 31
+            _varint(fields, _zigzag(delta - 32 if delta & 16 else delta))
+        if events:
+            flags |= _IO
+            _varint(fields, len(events))
+            for kind, addr, value in events:
+                fields.append(kind)
+                _varint(fields, addr)
+                if kind != RD:
+                    _varint(fields, value)
+        chunk.append(flags)
+        chunk += fields
+        self._previous = (pc, st0, dsp, rsp)
+        self.steps += 1
+
+    def _flush(self) -> None:
+        if self._chunk:
+            data = zlib.compress(bytes(self._chunk), self.level)
+            self._offsets.append(self._file.tell())
+            self._file.write(_CHUNK.pack(len(data)))
+            self._file.write(data)
+            self._chunk.clear()
+
+    def close(self) -> None:
+        """Write the last chunk and the index."""
+        if self._file.closed:
+            return
+        self._flush()
+        index = self._file.tell()
+        self._file.write(self._offsets.tobytes())
+        self._file.write(_TRAILER.pack(index, self.first_cycle or 0, self.steps))
+        self._file.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _TracingIO:
+    """Pass I/O through to io, logging each access for the step being traced."""
+
+    def __init__(self, io, events: List[Tuple[int, int, int]]):
+        self.io = io
+        self.events = events
+
+    def din(self, addr: int) -> int:
+        value = self.io.din(addr)
+        self.events.append((DIN, addr, value))
+        return value
+
+    def rd(self, addr: int) -> None:
+        self.events.append((RD, addr, 0))
+        self.io.rd(addr)
+
+    def wr(self, addr: int, value: int) -> None:
+        self.events.append((WR, addr, value))
+        self.io.wr(addr, value)
+
+
+def trace(machine, steps: int, writer: TraceWriter) -> None:
+    """Run a J1 or Board for steps cycles, recording each one to writer."""
+    cpu = getattr(machine, "cpu", machine)
+    run = machine.run
+    record = writer.record
+    events: List[Tuple[int, int, int]] = []
+    io = cpu.io
+    cpu.io = _TracingIO(io, events)
+    try:
+        for _ in range(steps):
+            cycle, pc, st0, dsp, rsp = cpu.cycles, cpu.pc, cpu.st0, cpu.dsp, cpu.rsp
+            run(1)
+            record(cycle, pc, st0, dsp, rsp, events)
+            events.clear()
+    finally:
+        cpu.io = io
+
+
+class TraceReader:
+    """Random access to a trace file written by TraceWriter."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        f = self._file
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+            f.close()
+            raise ValueError(f"{path}: not a J1 trace")
+        _, version, self.chunk_steps = _HEADER.unpack(header)
+        if version != VERSION:
+            f.close()
+            raise ValueError(f"{path}: trace version {version}, expected {VERSION}")
+        f.seek(-_TRAILER.size, 2)
+        index, self.first_cycle, self.steps = _TRAILER.unpack(f.read(_TRAILER.size))
+        chunks = -(-self.steps // self.chunk_steps)
+        f.seek(index)
+        self._offsets = array("Q")
+        self._offsets.frombytes(f.read(8 * chunks))
+
+    def __len__(self) -> int:
+        return self.steps
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _chunk(self, number: int) -> bytes:
+        f = self._file
+        f.seek(self._offsets[number])
+        (size,) = _CHUNK.unpack(f.read(_CHUNK.size))
+        return zlib.decompress(f.read(size))
+
+    def _decode(self, start: int, stop: int) -> Iterator[Tuple[int, int, int, int, int, list]]:
+        """(cycle, pc, st0, dsp, rsp, events) for the cycles in [start, stop)."""
+        begin = max(start, self.first_cycle) - self.first_cycle
+        end = min(stop - self.first_cycle, self.steps)
+        for number in range(begin // self.chunk_steps, -(-end // self.chunk_steps)):
+            data = self._chunk(number)
+            pc, position = _read_varint(data, 0)
+            st0, position = _read_varint(data, position)
+            dsp, position = _read_varint(data, position)
+            rsp, position = _read_varint(data, position)
+            pc -= 2
+            first = number * self.chunk_steps
+            for n in range(first, min(first + self.chunk_steps, end)):
+                flags = data[position]
+                position += 1
+                if flags & _PC:
+                    delta, position = _read_varint(data, position)
+                    pc += _unzigzag(delta) + 2
+                else:
+                    pc += 2
+                if flags & _ST0:
+                    delta, position = _read_varint(data, position)
+                    st0 = (st0 + _unzigzag(delta)) & 0xFFFF
+                if flags & _DSP:
+                    delta, position = _read_varint(data, position)
+                    dsp = (dsp + _unzigzag(delta)) & 31
+                if flags & _RSP:
+                    delta, position = _read_varint(data, position)
+                    rsp = (rsp + _unzigzag(delta)) & 31
+                events = []
+                if flags & _IO:
+                    count, position = _read_varint(data, position)
+                    for _ in range(count):
+                        kind = data[position]
+                        addr, position = _read_varint(data, position + 1)
+                        value = 0
+                        if kind != RD:
+                            value, position = _read_varint(data, position)
+                        events.append((kind, addr, value))
+                if n >= begin:
+                    yield self.first_cycle + n, pc, st0, dsp, rsp, events
+
+    def window(self, start: int, stop: int) -> Iterator[TraceStep]:
+        """Stream the state at the start of each cycle in [start, stop)."""
+        for cycle, pc, st0, dsp, rsp, _ in self._decode(start, stop):
+            yield TraceStep(cycle, pc, st0, dsp, rsp)
+
+    def io_events(self, start: int, stop: int) -> Iterator[IOEvent]:
+        """Stream the I/O events of the cycles in [start, stop), in order."""
+        for cycle, _, _, _, _, events in self._decode(start, stop):
+            for kind, addr, value in events:
+                yield IOEvent(cycle, kind, addr, value)
+
+    def __getitem__(self, cycle: int) -> TraceStep:
+        for step in self.window(cycle, cycle + 1):
+            return step
+        raise IndexError(f"Cycle {cycle} is not in the trace")
@@ -0,0 +1,288 @@
+"""
+Lockstep J1 emulator for running one image on thousands of inputs at once.
+
+VectorJ1 keeps the registers of every instance as NumPy columns (pc, st0,
+dsp, rsp and the return stack's circular index rtop), the stacks as
+instances x 32 arrays and memory as an instances x memwords array, and
+executes one clock cycle of every instance per step.  Literals, jumps,
+conditional jumps and calls are applied to all instances of their class
+with masks; ALU instances are grouped by the instruction at their PC, so
+while they run the same code (the usual case) a cycle is one decode and a
+few dozen array operations, and divergent branches only add a group.
+
+Each instance follows the same semantics as J1, starting from the state
+after reset.  Interrupts are not modelled.  NumPy is needed for this
+module only (pip install j1tools[vector]).
+"""
+
+from array import array
+from typing import Callable, Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    raise ImportError("j1tools.sim.vector needs NumPy: pip install j1tools[vector]") from None
+
+from .cpu import J1, MEMWORDS, FUNC_T_N, FUNC_T_R, FUNC_WRITE, FUNC_IOW, FUNC_IOR, FUNC_DINT, FUNC_EINT
+from .reference import STACK_FILL
+
+# st0N of each ALU operation on columns T (st0), N (st1), R (rst0), S (st2);
+# io[T] and mem[T] need the emulator and are computed in VectorJ1._alu
+# Key: insn[12:8], Value: function of (T, N, R, S, dsp, rsp)
+_ALU_OPS: Dict[int, Callable] = {
+    0x00: lambda T, N, R, S, d, r: T,
+    0x01: lambda T, N, R, S, d, r: N,
+    0x02: lambda T, N, R, S, d, r: (T + N) & 0xFFFF,
+    0x03: lambda T, N, R, S, d, r: T & N,
+    0x04: lambda T, N, R, S, d, r: T | N,
+    0x05: lambda T, N, R, S, d, r: T ^ N,
+    0x06: lambda T, N, R, S, d, r: T ^ 0xFFFF,
+    0x07: lambda T, N, R, S, d, r: np.where(N == T, 0xFFFF, 0),
+    0x08: lambda T, N, R, S, d, r: np.where((N ^ 0x8000) < (T ^ 0x8000), 0xFFFF, 0),
+    0x09: lambda T, N, R, S, d, r: (T & 0x8000) | (T >> 1),
+    0x0A: lambda T, N, R, S, d, r: (T << 1) & 0xFFFF,
+    0x0B: lambda T, N, R, S, d, r: R,
+    0x0C: lambda T, N, R, S, d, r: (N - T) & 0xFFFF,
+    0x0E: lambda T, N, R, S, d, r: d,
+    0x0F: lambda T, N, R, S, d, r: np.where(N < T, 0xFFFF, 0),
+    # Shifts of 16 or more clear (or sign-fill) the word
+    0x10: lambda T, N, R, S, d, r: (N << np.minimum(T, 16)) & 0xFFFF,
+    0x11: lambda T, N, R, S, d, r: N >> np.minimum(T, 16),
+    0x12: lambda T, N, R, S, d, r: (((N ^ 0x8000) - 0x8000) >> np.minimum(T, 16)) & 0xFFFF,
+    0x13: lambda T, N, R, S, d, r: r,
+    0x14: lambda T, N, R, S, d, r: (T * N) & 0xFFFF,
+    0x15: lambda T, N, R, S, d, r: (T * N) >> 16,
+    0x16: lambda T, N, R, S, d, r: (T + 1) & 0xFFFF,
+    0x17: lambda T, N, R, S, d, r: (T - 1) & 0xFFFF,
+    0x18: lambda T, N, R, S, d, r: S,
+}
+
+
+class NullVectorIO:
+    """
+    I/O space with nothing attached.  Vector I/O objects get the indices
+    of the instances doing I/O in this cycle and their addresses (and
+    values) as arrays.
+    """
+
+    def din(self, instances, addrs):
+        """Values on io_din for each instance"""
+        return np.zeros(len(instances), dtype=np.int64)
+
+    def rd(self, instances, addrs) -> None:
+        """io_rd strobes"""
+
+    def wr(self, instances, addrs, values) -> None:
+        """io_wr strobes"""
+
+
+class VectorJ1:
+    """
+    instances J1 CPUs running in lockstep, each with its own copy of
+    memory.  The register columns (pc, st0, dsp, rsp, rtop) and the stack
+    and memory arrays are public and may be set between runs, e.g. with
+    push() to give each instance its input.
+    """
+
+    def __init__(self, image: Sequence[int] = (), instances: int = 1024,
+                 memwords: int = MEMWORDS, io=None):
+        boot = J1(image, memwords)
+        self.instances = instances
+        self.mask = boot.mask
+        self.io = io or NullVectorIO()
+        self.cycles = boot.cycles
+        self._rows = np.arange(instances)
+
+        def column(value):
+            return np.full(instances, value, dtype=np.int64)
+
+        self.pc = column(boot.pc)
+        self.st0 = column(boot.st0)
+        self.dsp = column(boot.dsp)
+        self.rsp = column(boot.rsp)
+        self.rtop = column(boot.rtop)
+        self.ds = np.tile(np.array(boot.ds, dtype=np.int64), (instances, 1))
+        self.rs = np.tile(np.array(boot.rs, dtype=np.int64), (instances, 1))
+        self.mem = np.tile(np.frombuffer(boot.mem.tobytes(), dtype=np.uint16), (instances, 1))
+        # Instances that stored in the previous cycle, for the write-first
+        # mem[T] port
+        self.wrote = np.zeros(instances, dtype=bool)
+        self.write_value = column(0)
+
+    def push(self, values) -> None:
+        """Push one value (or a column of values) onto every data stack."""
+        rows = self._rows
+        dsp = (self.dsp + 1) & 31
+        self.ds[rows, dsp] = self.st0
+        self.dsp = dsp
+        self.st0 = np.broadcast_to(np.asarray(values, dtype=np.int64) & 0xFFFF, (self.instances,)).copy()
+
+    def step(self) -> None:
+        """Execute one clock cycle of every instance."""
+        rows = self._rows
+        insn = self.mem[rows, (self.pc >> 1) & self.mask].astype(np.int64)
+        wrote = np.zeros(self.instances, dtype=bool)
+        first, last = insn.min(), insn.max()
+        if first == last:
+            # Every instance runs the same instruction
+            kind = int(first) >> 13
+            if kind >= 4:
+                self._literal(rows, insn)
+            elif kind == 3:
+                self._alu(rows, int(first), wrote)
+            else:
+                (self._jump, self._zjump, self._call)[kind](rows, insn)
+        else:
+            kind = insn >> 13
+            for k, apply in enumerate((self._jump, self._zjump, self._call)):
+                idx = np.flatnonzero(kind == k)
+                if len(idx):
+                    apply(idx, insn[idx])
+            idx = np.flatnonzero(kind >= 4)
+            if len(idx):
+                self._literal(idx, insn[idx])
+            alu = np.flatnonzero(kind == 3)
+            if len(alu):
+                ops = insn[alu]
+                order = np.argsort(ops, kind="stable")
+                groups = np.split(alu[order], np.flatnonzero(np.diff(ops[order])) + 1)
+                for idx in groups:
+                    self._alu(idx, int(insn[idx[0]]), wrote)
+        self.wrote = wrote
+        self.cycles += 1
+
+    def run(self, steps: int) -> None:
+        """Execute steps clock cycles of every instance."""
+        for _ in range(steps):
+            self.step()
+
+    def _literal(self, idx, insn) -> None:
+        dsp = (self.dsp[idx] + 1) & 31
+        self.ds[idx, dsp] = self.st0[idx]
+        self.dsp[idx] = dsp
+        self.st0[idx] = insn & 0x7FFF
+        self.pc[idx] = (self.pc[idx] + 2) & 0xFFFF
+
+    def _jump(self, idx, insn) -> None:
+        self.pc[idx] = ((insn & 0x1FFF) << 1) | (self.pc[idx] & 1)
+
+    def _zjump(self, idx, insn) -> None:
+        T = self.st0[idx]
+        dsp = self.dsp[idx]
+        pc = self.pc[idx]
+        self.st0[idx] = self.ds[idx, dsp]
+        self.ds[idx, dsp] = STACK_FILL
+        self.dsp[idx] = (dsp - 1) & 31
+        self.pc[idx] = np.where(T != 0, (pc + 2) & 0xFFFF, ((insn & 0x1FFF) << 1) | (pc & 1))
+
+    def _call(self, idx, insn) -> None:
+        pc = self.pc[idx]
+        rt = (self.rtop[idx] + 1) & 31
+        self.rs[idx, rt] = (pc + 2) & 0xFFFF
+        self.rtop[idx] = rt
+        self.rsp[idx] = (self.rsp[idx] + 1) & 31
+        self.pc[idx] = ((insn & 0x1FFF) << 1) | (pc & 1)
+
+    def _alu(self, idx, insn: int, wrote) -> None:
+        """Execute the ALU instruction insn on the instances idx."""
+        alu = (insn >> 8) & 0x1F
+        func = (insn >> 4) & 7
+        rdelta = (insn >> 2) & 3
+        ddelta = insn & 3
+        ds, rs = self.ds, self.rs
+
+        T = self.st0[idx]
+        dsp = self.dsp[idx]
+        rt = self.rtop[idx]
+        N = ds[idx, dsp]
+        R = rs[idx, rt]
+        if alu == 0x0D:
+            value = np.asarray(self.io.din(idx, T), dtype=np.int64) & 0xFFFF
+        elif alu == 0x19:
+            value = np.where(self.wrote[idx], self.write_value[idx], self.mem[idx, (T >> 1) & self.mask])
+        elif alu in _ALU_OPS:
+            value = _ALU_OPS[alu](T, N, R, ds[idx, (dsp - 1) & 31], dsp, self.rsp[idx])
+        else:
+            value = T
+
+        # Memory and I/O strobes
+        if func == FUNC_WRITE:
+            self.mem[idx, (T >> 1) & self.mask] = N
+            wrote[idx] = True
+            self.write_value[idx] = N
+        elif func == FUNC_IOW:
+            self.io.wr(idx, T, N)
+        elif func == FUNC_IOR:
+            self.io.rd(idx, T)
+
+        # Data stack (stack3)
+        write = func == FUNC_T_N
+        if ddelta == 0:
+            if write:
+                ds[idx, dsp] = T
+        elif ddelta == 1:
+            dsp = (dsp + 1) & 31
+            ds[idx, dsp] = T if write else N
+        else:
+            ds[idx, dsp] = STACK_FILL
+            if ddelta == 2:
+                ds[idx, (dsp - 1) & 31] = STACK_FILL
+            dsp = (dsp - (1 if ddelta == 3 else 2)) & 31
+            if write:
+                ds[idx, dsp] = T
+        self.dsp[idx] = dsp
+
+        # Return stack (stack2): a delta of -2 moves rsp but not the contents
+        write = func == FUNC_T_R
+        if rdelta == 0:
+            if write:
+                rs[idx, rt] = T
+        elif rdelta == 1:
+            rs[idx, (rt + 1) & 31] = T if write else R
+            self.rtop[idx] = (rt + 1) & 31
+            self.rsp[idx] = (self.rsp[idx] + 1) & 31
+        elif rdelta == 2:
+            self.rsp[idx] = (self.rsp[idx] - 2) & 31
+        else:
+            rs[idx, rt] = STACK_FILL
+            rt = (rt - 1) & 31
+            if write:
+                rs[idx, rt] = T
+            self.rtop[idx] = rt
+            self.rsp[idx] = (self.rsp[idx] - 1) & 31
+
+        self.st0[idx] = value
+
+        # Program counter and interrupt enable
+        pc = self.pc[idx]
+        if insn & 0x80:
+            if func == FUNC_DINT:
+                pc = R & 0x7FFE
+            elif func == FUNC_EINT:
+                pc = (R & 0x7FFE) | 1
+            else:
+                pc = (R & 0x7FFE) | (R >> 15) | (pc & 1)
+        elif func == FUNC_DINT:
+            pc = (pc + 2) & 0xFFFE
+        elif func == FUNC_EINT:
+            pc = (pc + 2) & 0xFFFF | 1
+        else:
+            pc = (pc + 2) & 0xFFFF
+        self.pc[idx] = pc
+
+    def instance(self, i: int) -> J1:
+        """A scalar J1 with the state of instance i."""
+        cpu = J1(memwords=self.mask + 1)
+        cpu.mem = array("H", self.mem[i].tobytes())
+        cpu.pc, cpu.st0 = int(self.pc[i]), int(self.st0[i])
+        cpu.dsp, cpu.rsp, cpu.rtop = int(self.dsp[i]), int(self.rsp[i]), int(self.rtop[i])
+        cpu.ds = [int(x) for x in self.ds[i]]
+        cpu.rs = [int(x) for x in self.rs[i]]
+        cpu.cycles = self.cycles
+        if self.wrote[i]:
+            cpu.write_cycle, cpu.write_value = self.cycles - 1, int(self.write_value[i])
+        return cpu
+
+    def data_stack(self, i: int) -> List[int]:
+        """The data stack of instance i, top (st0) last."""
+        return self.instance(i).data_stack()
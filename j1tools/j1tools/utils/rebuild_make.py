@@ -6,18 +6,31 @@ This is useful after making changes to the grammar or source files in any direct
 Usage: rebuild_make [options]
 
 Options:
-  --verbose, -v       Show verbose output from make commands
-  --filter, -f STR    Only rebuild directories matching this substring
-  --dry-run, -n       Don't run commands, just show what would be done
-  --directory, -d DIR Start searching from this directory (default: current directory)
-  --help, -h          Show this help message and exit
+  --verbose, -v         Show verbose output from make commands
+  --filter, -f STR      Only rebuild directories matching this substring
+  --dry-run, -n         Don't run commands, just show what would be done
+  --directory, -d DIR   Start searching from this directory (default: current directory)
+  --jobs, -j N          Rebuild up to N directories in parallel (default: 1)
+  --skip-unchanged, -s  Skip directories whose sources, includes and assembler are unchanged
+  --help, -h            Show this help message and exit
 """
 
 import os
-import subprocess
-import argparse
+import re
 import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+import concurrent.futures
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from j1tools.assembler.config import AssemblerConfig
+from j1tools.assembler.grammar import cache_dir
+from j1tools.assembler.include_cache import toolchain_hash
 
 # ANSI color codes for terminal output
 GREEN = '\033[92m'
@@ -25,12 +38,17 @@ YELLOW = '\033[93m'
 RED = '\033[91m'
 RESET = '\033[0m'
 BOLD = '\033[1m'
+CLEAR_LINE = '\r\033[K'
+
+# include "file" statements (after // comments are stripped)
+INCLUDE_RE = re.compile(r'^\s*include\s+"([^"]+)"', re.MULTILINE)
+COMMENT_RE = re.compile(r'//[^\n]*')
 
 def parse_args():
     parser = argparse.ArgumentParser(
         description='Recursively find Makefiles and run make cleanall followed by make'
     )
-    parser.add_argument('--verbose', '-v', action='store_true', 
+    parser.add_argument('--verbose', '-v', action='store_true',
                         help='Show verbose output from make commands')
     parser.add_argument('--filter', '-f', type=str, default=None,
                         help='Only rebuild directories matching this substring')
@@ -38,168 +56,298 @@ def parse_args():
                         help="Don't run commands, just show what would be done")
     parser.add_argument('--directory', '-d', type=str, default=os.getcwd(),
                         help='Start searching from this directory (default: current directory)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Rebuild up to N directories in parallel (default: 1)')
+    parser.add_argument('--skip-unchanged', '-s', action='store_true',
+                        help='Skip directories whose .asm sources, their includes, '
+                             'j1.lark and the assembler are unchanged since the last rebuild')
     return parser.parse_args()
 
 def find_make_directories(start_dir):
     """Find all directories that contain a Makefile."""
     start_path = Path(start_dir)
-    
+
     # Validate the start directory exists
     if not start_path.exists():
         print(f"{RED}Error: Start directory not found at {start_path}{RESET}")
         sys.exit(1)
-    
+
     make_dirs = []
-    
+
     # Walk through all subdirectories
     for root, dirs, files in os.walk(start_path):
         root_path = Path(root)
-        
+
         # Check if this directory has a Makefile
         if (root_path / 'Makefile').exists():
             make_dirs.append(root_path)
-    
+
     return make_dirs
 
-def rebuild_directory(dir_path, verbose=False, dry_run=False):
-    """Run make cleanall and make in the specified directory."""
+def display_name(dir_path, base_dir):
+    """Return a path for display, relative to base_dir if possible."""
     try:
-        # Store the original directory
-        original_dir = os.getcwd()
-        
-        # Get a relative path for display, relative to starting directory if possible
+        relative_path = dir_path.relative_to(base_dir)
+        if str(relative_path) == '.':
+            return dir_path.name
+        return relative_path
+    except ValueError:
+        # If we can't get a relative path, use the full path
+        return dir_path
+
+def source_dependencies(asm_path, config, seen=None):
+    """
+    Return asm_path and every file it includes, transitively.
+
+    Includes are resolved the same way j1asm resolves them (the including
+    file's directory, then the standard library).  Includes that cannot be
+    resolved are skipped; j1asm will report them when the directory is built.
+    """
+    if seen is None:
+        seen = set()
+    asm_path = Path(asm_path).resolve()
+    if asm_path in seen:
+        return seen
+    seen.add(asm_path)
+
+    text = COMMENT_RE.sub('', asm_path.read_text())
+    for filename in INCLUDE_RE.findall(text):
+        resolved = config.resolve_include(filename, asm_path.parent)
+        if resolved is not None:
+            source_dependencies(resolved, config, seen)
+    return seen
+
+def directory_fingerprint(dir_path, config=None):
+    """
+    Return a fingerprint of everything that determines a directory's outputs:
+    its Makefile, its .asm files and their transitive includes, plus j1.lark
+    and the assembler sources.  Returns None if the directory has no .asm
+    files (it is then always rebuilt).
+    """
+    sources = sorted(Path(dir_path).glob('*.asm'))
+    if not sources:
+        return None
+
+    config = config or AssemblerConfig()
+    files: Set[Path] = {Path(dir_path, 'Makefile').resolve()}
+    for source in sources:
+        source_dependencies(source, config, files)
+
+    digest = hashlib.sha256(toolchain_hash().encode())
+    for path in sorted(files):
+        digest.update(str(path).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+def directory_listing(dir_path):
+    """Return the names of the files in a directory (to notice deleted outputs)."""
+    return sorted(p.name for p in Path(dir_path).iterdir() if p.is_file())
+
+class FingerprintStore:
+    """Fingerprints of the last successful rebuild of each directory."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else cache_dir() / 'rebuild_make.json'
+        # Key: absolute directory path
+        # Value: {"fingerprint": str, "files": [names after the rebuild]}
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                # A corrupt store just means everything is rebuilt
+                self.entries = {}
+
+    def is_current(self, dir_path, fingerprint):
+        entry = self.entries.get(str(dir_path))
+        return (
+            fingerprint is not None
+            and entry is not None
+            and entry.get('fingerprint') == fingerprint
+            and entry.get('files') == directory_listing(dir_path)
+        )
+
+    def update(self, dir_path, fingerprint):
+        if fingerprint is None:
+            self.entries.pop(str(dir_path), None)
+        else:
+            self.entries[str(dir_path)] = {
+                'fingerprint': fingerprint,
+                'files': directory_listing(dir_path),
+            }
+
+    def save(self):
         try:
-            relative_path = dir_path.relative_to(original_dir)
-            if str(relative_path) == '.':
-                display_path = dir_path.name
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(self.entries, indent=1, sort_keys=True))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"{YELLOW}Could not save fingerprints to {self.path}: {e}{RESET}")
+
+@dataclass
+class RebuildResult:
+    """Outcome of rebuilding one directory."""
+    dir_path: Path
+    success: bool
+    output: str = ''      # Captured output to show (errors, or everything if verbose)
+    elapsed: float = 0.0  # Seconds
+
+def rebuild_directory(dir_path, verbose=False, capture=True):
+    """
+    Run make cleanall and make in the specified directory.
+
+    Commands run with the directory as their working directory, so several
+    directories can be rebuilt at once.  With capture=False (and verbose)
+    make's output goes straight to the terminal.
+    """
+    start = time.perf_counter()
+    output = []
+    try:
+        for cmd in (['make', 'cleanall'], ['make']):
+            if verbose and not capture:
+                print(f"Running {' '.join(cmd)} in {dir_path}")
+                result = subprocess.run(cmd, cwd=dir_path, text=True)
             else:
-                display_path = relative_path
-        except ValueError:
-            # If we can't get a relative path, use the full path
-            display_path = dir_path
-        
-        print(f"{YELLOW}Rebuilding {BOLD}{display_path}{RESET}")
-        
-        # Prepare the commands
-        cleanall_cmd = ['make', 'cleanall']
-        make_cmd = ['make']
-        
-        # In dry run mode, just print the commands
-        if dry_run:
-            print(f"Would run: cd {dir_path} && {' '.join(cleanall_cmd)} && {' '.join(make_cmd)}")
-            return True
-        
-        # Change to the target directory
-        os.chdir(dir_path)
-        
-        # Run make cleanall
-        if verbose:
-            print(f"Running make cleanall in {dir_path}")
-            cleanall_result = subprocess.run(cleanall_cmd, text=True)
-        else:
-            cleanall_result = subprocess.run(cleanall_cmd, 
-                                           capture_output=True,
-                                           text=True)
-        
-        if cleanall_result.returncode != 0:
-            print(f"{RED}Error in make cleanall for {display_path}:{RESET}")
-            if not verbose:  # Already shown if verbose
-                print(cleanall_result.stderr)
-            
-            # Return to the original directory
-            os.chdir(original_dir)
-            return False
-        
-        # Run make
-        if verbose:
-            print(f"Running make in {dir_path}")
-            make_result = subprocess.run(make_cmd, text=True)
-        else:
-            make_result = subprocess.run(make_cmd, 
-                                       capture_output=True,
-                                       text=True)
-        
-        success = make_result.returncode == 0
-        
-        if not success:
-            print(f"{RED}Error in make for {display_path}:{RESET}")
-            if not verbose:  # Already shown if verbose
-                print(make_result.stderr)
-        
-        # Return to the original directory
-        os.chdir(original_dir)
-        
-        status = f"{GREEN}✓ Success{RESET}" if success else f"{RED}✗ Failed{RESET}"
-        print(f"{status} - {display_path}")
-        
-        return success
-    
+                result = subprocess.run(cmd, cwd=dir_path, capture_output=True, text=True)
+                if verbose:
+                    output.append(f"$ {' '.join(cmd)}\n{result.stdout}{result.stderr}")
+
+            if result.returncode != 0:
+                if not verbose:  # Already included if verbose
+                    output.append(f"{RED}Error in {' '.join(cmd)}:{RESET}\n{result.stderr}")
+                return RebuildResult(dir_path, False, ''.join(output),
+                                     time.perf_counter() - start)
+
+        return RebuildResult(dir_path, True, ''.join(output), time.perf_counter() - start)
+
     except Exception as e:
-        print(f"{RED}Error processing {dir_path}: {e}{RESET}")
-        # Make sure we're back in the original directory in case of error
-        try:
-            os.chdir(original_dir)
-        except:
-            pass
-        return False
+        return RebuildResult(dir_path, False, f"{RED}Error processing {dir_path}: {e}{RESET}\n",
+                             time.perf_counter() - start)
+
+def report(result, base_dir):
+    """Print the outcome of one directory."""
+    display_path = display_name(result.dir_path, base_dir)
+    if result.output:
+        print(result.output.rstrip('\n'))
+    status = f"{GREEN}✓ Success{RESET}" if result.success else f"{RED}✗ Failed{RESET}"
+    print(f"{status} - {display_path} ({result.elapsed:.1f}s)")
+
+def rebuild_all(make_dirs, jobs=1, verbose=False, base_dir=None):
+    """
+    Rebuild directories with up to `jobs` in parallel.
+
+    Results are reported in directory order as soon as every earlier
+    directory has finished; on a terminal a progress line shows which
+    directories are still running.
+    """
+    base_dir = base_dir or os.getcwd()
+    if jobs <= 1:
+        results = []
+        for dir_path in make_dirs:
+            print(f"{YELLOW}Rebuilding {BOLD}{display_name(dir_path, base_dir)}{RESET}")
+            result = rebuild_directory(dir_path, verbose, capture=False)
+            report(result, base_dir)
+            results.append(result)
+        return results
+
+    live = sys.stdout.isatty()
+    results: List[Optional[RebuildResult]] = [None] * len(make_dirs)
+    next_report = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(rebuild_directory, dir_path, verbose): index
+            for index, dir_path in enumerate(make_dirs)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                results[futures[future]] = future.result()
+
+            # Report finished directories in order
+            if live and next_report < len(make_dirs) and results[next_report] is not None:
+                print(CLEAR_LINE, end='')
+            while next_report < len(make_dirs) and results[next_report] is not None:
+                report(results[next_report], base_dir)
+                next_report += 1
+
+            if live and pending:
+                running = [display_name(make_dirs[futures[f]], base_dir)
+                           for f in pending if f.running()]
+                finished = sum(r is not None for r in results)
+                line = f"[{finished}/{len(make_dirs)}] running: {', '.join(map(str, running))}"
+                width = max(20, os.get_terminal_size().columns - 1)
+                print(f"{CLEAR_LINE}{line[:width]}", end='', flush=True)
+
+    return results
 
 def main():
     args = parse_args()
-    
+
     # Get absolute path of the starting directory
     start_dir = os.path.abspath(args.directory)
-    
+
     # Find all directories with Makefiles
     make_dirs = find_make_directories(start_dir)
-    
+
     # Apply filter if specified
     if args.filter:
         make_dirs = [d for d in make_dirs if args.filter in str(d)]
-    
+
     if not make_dirs:
         print(f"{YELLOW}No Makefiles found{RESET}")
         if args.filter:
             print(f"Check your filter: '{args.filter}'")
         return
-    
+
     print(f"Found {len(make_dirs)} directories with Makefiles to rebuild")
-    
-    # Store the current directory to restore it later
+
     original_dir = os.getcwd()
-    
-    try:
-        # Process directories sequentially
-        results = []
-        
+
+    # Leave out directories whose inputs match the last successful rebuild
+    store = None
+    fingerprints = {}
+    skipped = []
+    if args.skip_unchanged:
+        store = FingerprintStore()
+        config = AssemblerConfig()
         for dir_path in make_dirs:
-            success = rebuild_directory(dir_path, args.verbose, args.dry_run)
-            results.append((dir_path, success))
-        
-        # Only show summary if we actually ran the commands
-        if not args.dry_run:
-            # Print summary
-            success_count = sum(1 for _, success in results if success)
-            print(f"\n{BOLD}Summary:{RESET}")
-            print(f"Rebuilt {success_count} of {len(make_dirs)} directories successfully")
-            
-            if success_count < len(make_dirs):
-                # Try to get relative paths for failed directories
-                failed_dirs = []
-                for d, success in results:
-                    if not success:
-                        try:
-                            rel_path = d.relative_to(original_dir)
-                            failed_dirs.append(str(rel_path))
-                        except ValueError:
-                            failed_dirs.append(str(d))
-                
-                print(f"{RED}Failed directories:{RESET}")
-                for failed in failed_dirs:
-                    print(f"  - {failed}")
-    
-    finally:
-        # Return to the original directory
-        os.chdir(original_dir)
+            fingerprints[dir_path] = directory_fingerprint(dir_path, config)
+        skipped = [d for d in make_dirs if store.is_current(d, fingerprints[d])]
+        make_dirs = [d for d in make_dirs if d not in skipped]
+        print(f"Skipping {len(skipped)} unchanged directories")
+
+    # In dry run mode, just print the commands
+    if args.dry_run:
+        for dir_path in make_dirs:
+            print(f"{YELLOW}Rebuilding {BOLD}{display_name(dir_path, original_dir)}{RESET}")
+            print(f"Would run: cd {dir_path} && make cleanall && make")
+        return
+
+    results = rebuild_all(make_dirs, args.jobs, args.verbose, original_dir)
+
+    if store is not None:
+        for result in results:
+            if result.success:
+                store.update(result.dir_path, fingerprints[result.dir_path])
+        store.save()
+
+    # Print summary
+    success_count = sum(1 for result in results if result.success)
+    print(f"\n{BOLD}Summary:{RESET}")
+    print(f"Rebuilt {success_count} of {len(make_dirs)} directories successfully")
+    if skipped:
+        print(f"Skipped {len(skipped)} unchanged directories")
+
+    if success_count < len(make_dirs):
+        print(f"{RED}Failed directories:{RESET}")
+        for result in results:
+            if not result.success:
+                print(f"  - {display_name(result.dir_path, original_dir)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,14 @@
+"""Streaming VCD reader for J1 simulation dumps"""
+
+from ..assembler.instructionset_16kb_dualport import mnemonic
+from .reader import J1_SIGNALS, J1Sample, Timeline, Variable, VCDFile, samples
+
+__all__ = [
+    "J1_SIGNALS",
+    "J1Sample",
+    "Timeline",
+    "Variable",
+    "VCDFile",
+    "mnemonic",
+    "samples",
+]
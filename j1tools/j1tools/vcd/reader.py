@@ -0,0 +1,345 @@
+"""
+Streaming reader for VCD dumps of the hdl/tb simulations.
+
+VCDFile parses the header (scopes and variables) when opened, and read()
+then makes one pass over the value changes, a chunk of lines at a time,
+collecting the timelines of the wanted signals -- by default the J1's pc,
+insn, st0, dsp, rsp, io_addr, io_wr and the clock -- into arrays of change
+times and values.  Lines are never split in Python: each chunk is reversed
+and searched with one regular expression for timestamps and lines that
+start (reversed) with a wanted identifier code, so the lines of other
+signals fail on their first character.
+
+The same pass records a time index: the file offset and current time at
+the start of every chunk.  changes() uses it to seek straight to a time
+range and stream the raw changes of any signals from there.
+
+x and z bits read as 0.
+
+Usage: j1vcd dump.vcd [--start TIME] [--stop TIME] [--clock NAME]
+"""
+
+import re
+import sys
+import heapq
+import bisect
+import argparse
+from array import array
+from dataclasses import dataclass
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..assembler.instructionset_16kb_dualport import mnemonic
+
+# Bytes of dump searched at a time
+CHUNK_SIZE = 1 << 23
+
+# Signals read by default
+J1_SIGNALS = ("clk", "pc", "insn", "st0", "dsp", "rsp", "io_addr", "io_wr")
+
+_XZ = bytes.maketrans(b"xXzZ", b"0000")
+
+
+@dataclass
+class Variable:
+    """A $var of the header."""
+
+    path: str  # Scopes and reference, dotted: j1_tb.uut.pc
+    code: bytes  # Identifier code used in value changes
+    width: int
+
+
+@dataclass
+class Timeline:
+    """The changes of one signal: values[i] from times[i] on."""
+
+    name: str
+    width: int
+    times: array
+    values: array
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def at(self, time: int) -> Optional[int]:
+        """Value at time (after the changes at time), None before the first change."""
+        i = bisect.bisect_right(self.times, time) - 1
+        return self.values[i] if i >= 0 else None
+
+    def extend(self, times: Sequence[int], values: Sequence[int]) -> None:
+        """Append changes in time order; a later change at the same time replaces an earlier one."""
+        if len(set(times)) == len(times) and not (self.times and times and self.times[-1] == times[0]):
+            self.times.extend(times)
+            self.values.extend(values)
+            return
+        for time, value in zip(times, values):
+            if self.times and self.times[-1] == time:
+                self.values[-1] = value
+            else:
+                self.times.append(time)
+                self.values.append(value)
+
+    def before(self, time: int) -> Optional[int]:
+        """Value just before time, as a flip-flop clocked at time samples it."""
+        i = bisect.bisect_left(self.times, time) - 1
+        return self.values[i] if i >= 0 else None
+
+
+class J1Sample(NamedTuple):
+    """J1 state sampled at a rising clock edge."""
+
+    time: int
+    pc: int
+    insn: int
+    st0: int
+    dsp: int
+    rsp: int
+    io_addr: int
+    io_wr: int
+
+
+def _typecode(width: int) -> str:
+    if width <= 8:
+        return "B"
+    if width <= 16:
+        return "H"
+    if width <= 64:
+        return "Q"
+    raise ValueError(f"Signals wider than 64 bits are not supported ({width} bits)")
+
+
+class VCDFile:
+    """A VCD dump on disk: its header, and streaming access to its changes."""
+
+    def __init__(self, path, chunk_size: int = CHUNK_SIZE):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.timescale = ""
+        # Key: dotted path, Value: the variable
+        self.variables: Dict[str, Variable] = {}
+        # Time and file offset at the start of each chunk read so far
+        self.index_times = array("Q")
+        self.index_offsets = array("Q")
+        self._body = self._read_header()
+
+    def _read_header(self) -> int:
+        """Parse declarations up to $enddefinitions; return the body's offset."""
+        scopes: List[str] = []
+        tokens: List[str] = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                tokens += line.decode("ascii", "replace").split()
+                while "$end" in tokens:
+                    end = tokens.index("$end")
+                    command, args = tokens[0], tokens[1:end]
+                    del tokens[: end + 1]
+                    if command == "$scope":
+                        scopes.append(args[1])
+                    elif command == "$upscope":
+                        scopes.pop()
+                    elif command == "$timescale":
+                        self.timescale = "".join(args)
+                    elif command == "$var":
+                        _, width, code, reference = args[:4]
+                        path = ".".join(scopes + [reference])
+                        self.variables[path] = Variable(path, code.encode(), int(width))
+                    elif command == "$enddefinitions":
+                        return f.tell()
+        raise ValueError(f"{self.path}: no $enddefinitions in header")
+
+    def find(self, name: str) -> Variable:
+        """
+        The variable with dotted path name, or else the shallowest one
+        whose reference is name (so "pc" finds j1_tb.uut.pc).
+        """
+        if name in self.variables:
+            return self.variables[name]
+        matches = [v for path, v in self.variables.items() if path.rsplit(".", 1)[-1] == name]
+        if not matches:
+            raise ValueError(f"{self.path}: no signal named {name}")
+        return min(matches, key=lambda v: v.path.count("."))
+
+    def _scan(self, codes: Sequence[bytes], offset: int, time: int) -> Iterator[Dict[bytes, tuple]]:
+        """For each chunk from offset on, the change times and values of each of codes."""
+        pattern = _pattern(codes)
+        indexing = offset == self._body and not self.index_offsets
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            rest = b""
+            while True:
+                data = f.read(self.chunk_size)
+                if data:
+                    cut = data.rfind(b"\n") + 1
+                    if not cut:
+                        rest += data
+                        continue
+                    chunk, rest = rest + data[:cut], data[cut:]
+                else:
+                    chunk, rest = rest + b"\n", b""
+                    if not chunk.strip():
+                        return
+                if indexing:
+                    self.index_times.append(time)
+                    self.index_offsets.append(offset)
+                offset += len(chunk)
+                changes, time = _parse(chunk, pattern, codes, time)
+                yield changes
+                if not data:
+                    return
+
+    def read(self, signals: Sequence[str] = J1_SIGNALS) -> Dict[str, Timeline]:
+        """Timelines of signals, in one pass over the file."""
+        variables = {name: self.find(name) for name in signals}
+        timelines = {
+            name: Timeline(name, v.width, array("Q"), array(_typecode(v.width)))
+            for name, v in variables.items()
+        }
+        del self.index_times[:], self.index_offsets[:]
+        for changes in self._scan([v.code for v in variables.values()], self._body, 0):
+            for name, v in variables.items():
+                timelines[name].extend(*changes[v.code])
+        return timelines
+
+    def changes(self, start: int, stop: int, signals: Sequence[str]) -> Iterator[Tuple[int, str, int]]:
+        """
+        (time, name, value) for the changes of signals in [start, stop),
+        seeking with the time index built by read() when there is one.
+        """
+        codes = {name: self.find(name).code for name in signals}
+        # The last chunk that starts before start (its first changes may be at start)
+        i = bisect.bisect_left(self.index_times, start) - 1
+        if i >= 0:
+            offset, time = self.index_offsets[i], self.index_times[i]
+        else:
+            offset, time = self._body, 0
+        for changes in self._scan(list(codes.values()), offset, time):
+            merged = heapq.merge(
+                *(zip(changes[code][0], repeat(name), changes[code][1]) for name, code in codes.items()),
+                key=lambda change: change[0],
+            )
+            for change in merged:
+                if change[0] >= stop:
+                    return
+                if change[0] >= start:
+                    yield change
+
+
+    def edges(self, signals: Sequence[str], clock: str = "clk") -> Iterator[Tuple[int, tuple]]:
+        """
+        (time, values) at each rising edge of clock, where values are the
+        values of signals just before the edge.  Streams in constant
+        memory; signals not driven yet read 0.
+        """
+        codes = [self.find(name).code for name in signals]
+        clk = self.find(clock).code
+        current = dict.fromkeys(codes + [clk], 0)
+        # Changes at time group_time, applied once the time moves on
+        group_time = -1
+        group: List[Tuple[bytes, int]] = []
+        for changes in self._scan(list(current), self._body, 0):
+            merged = heapq.merge(
+                *(zip(times, repeat(code), values) for code, (times, values) in changes.items()),
+                key=lambda change: change[0],
+            )
+            for time, code, value in merged:
+                if time != group_time:
+                    if any(c == clk and v for c, v in group) and not current[clk]:
+                        yield group_time, tuple(current[c] for c in codes)
+                    current.update(group)
+                    group.clear()
+                    group_time = time
+                group.append((code, value))
+        if any(c == clk and v for c, v in group) and not current[clk]:
+            yield group_time, tuple(current[c] for c in codes)
+
+
+def _pattern(codes: Sequence[bytes]) -> "re.Pattern":
+    """
+    Matches, in reversed VCD text, the timestamp lines and the change
+    lines of codes.  Reversed, a change line starts with its code, so
+    every other line fails on its first character.
+    """
+    alternatives = b"|".join(re.escape(c[::-1]) for c in sorted(set(codes), key=len, reverse=True))
+    return re.compile(
+        rb"\n(?:(\d+)#|(" + alternatives + rb")(?:[ \t]+([01xXzZ]+)[bB]|([01xXzZ])))(?=\n)"
+    )
+
+
+def _parse(chunk: bytes, pattern: "re.Pattern", codes: Sequence[bytes],
+           time: int) -> Tuple[Dict[bytes, tuple], int]:
+    """
+    The changes of each code in a chunk of whole lines, as lists of times
+    and values in file order, and the time at the end of the chunk.
+    """
+    if b"\r" in chunk:
+        chunk = chunk.replace(b"\r\n", b"\n")
+    found = {code[::-1]: ([], []) for code in codes}
+    matches = pattern.findall(chunk[::-1] + b"\n")
+    matches.reverse()
+    for stamp, code, vector, bit in matches:
+        if stamp:
+            time = int(stamp[::-1])
+        else:
+            times, values = found[code]
+            times.append(time)
+            values.append(int(vector[::-1].translate(_XZ), 2) if vector else int(bit == b"1"))
+    return {code[::-1]: changes for code, changes in found.items()}, time
+
+
+def samples(timelines: Dict[str, Timeline], clock: str = "clk") -> Iterator[J1Sample]:
+    """
+    The J1 registers at each rising edge of clock, as the edge samples
+    them: the values from just before it.  Signals never driven read 0.
+    """
+    fields = J1Sample._fields[1:]
+    cursors = [(timelines[name].times, timelines[name].values) for name in fields]
+    positions = [0] * len(fields)
+    clk = timelines[clock]
+    previous = 0
+    for edge, level in zip(clk.times, clk.values):
+        rising = level and not previous
+        previous = level
+        if not rising:
+            continue
+        state = []
+        for n, (times, values) in enumerate(cursors):
+            i = positions[n]
+            while i < len(times) and times[i] < edge:
+                i += 1
+            positions[n] = i
+            state.append(values[i - 1] if i else 0)
+        yield J1Sample(edge, *state)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="List the J1 instructions executed in a VCD dump of hdl/tb"
+    )
+    parser.add_argument("dump", type=Path, help="VCD file")
+    parser.add_argument("--start", type=int, default=0, help="First time listed")
+    parser.add_argument("--stop", type=int, help="Time to stop listing at")
+    parser.add_argument("--clock", default="clk", help="Clock signal (default: clk)")
+    args = parser.parse_args(argv)
+
+    try:
+        vcd = VCDFile(args.dump)
+        timelines = vcd.read(J1_SIGNALS[1:] + (args.clock,))
+        print(f"{'TIME':>12}  {'PC':>4}  {'INSN':>4}  {'MNEMONIC':<20} {'ST0':>4} DSP RSP  IO")
+        for s in samples(timelines, args.clock):
+            if s.time < args.start:
+                continue
+            if args.stop is not None and s.time >= args.stop:
+                break
+            io = f"  ${s.io_addr:04X}" if s.io_wr else ""
+            print(
+                f"{s.time:>12}  {s.pc >> 1:04X}  {s.insn:04X}  {mnemonic(s.insn):<20} "
+                f"{s.st0:04X} {s.dsp:>3} {s.rsp:>3}{io}"
+            )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,22 @@ setup(
             "pytest>=7.0.0",
             "pytest-cov>=4.0.0",  # for coverage reporting
         ],
+        "vector": [
+            "numpy>=1.20",  # for j1tools.sim.vector
+        ],
     },
     entry_points={
         "console_scripts": [
-            "j1asm=j1tools.assembler.asm:main",
+            "j1asm=j1tools.assembler.asm:cli",
             "hex2coe=j1tools.memory.memory:main",
             "hex2mif=j1tools.memory.memory:main",
             "mif2mem=j1tools.memory.memory:main",
+            "memconvert=j1tools.memory.convert:main",
+            "j1patch=j1tools.bitstream.patch:main",
+            "j1sim=j1tools.sim.bridge:main",
+            "j1prof=j1tools.sim.profile:main",
+            "j1vcd=j1tools.vcd.reader:main",
+            "j1check=j1tools.sim.diffcheck:main",
             "rebuild_make=j1tools.utils.rebuild_make:main",
         ],
     },
@@ -1,5 +1,6 @@
 import pytest
 import logging
+import os
 import sys
 
 
@@ -13,6 +14,18 @@ def pytest_addoption(parser):
     )
 
 
+@pytest.fixture(autouse=True, scope="session")
+def isolated_cache_dir(tmp_path_factory):
+    """Keep parser and include caches written by tests out of the user's cache"""
+    previous = os.environ.get("J1TOOLS_CACHE_DIR")
+    os.environ["J1TOOLS_CACHE_DIR"] = str(tmp_path_factory.mktemp("j1tools-cache"))
+    yield
+    if previous is None:
+        del os.environ["J1TOOLS_CACHE_DIR"]
+    else:
+        os.environ["J1TOOLS_CACHE_DIR"] = previous
+
+
 @pytest.fixture(autouse=True)
 def setup_logging(request):
     """Configure logging for all tests"""
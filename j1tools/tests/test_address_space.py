@@ -0,0 +1,58 @@
+import pytest
+from j1tools.assembler.address_space import AddressSpace
+
+
+def test_advance_returns_previous_address():
+    space = AddressSpace()
+    assert space.advance() == 0
+    assert space.advance(3) == 1
+    assert space.get_word_address() == 4
+    assert space.get_byte_address() == 8
+
+
+def test_used_ranges_coalesce():
+    space = AddressSpace()
+    for _ in range(10):
+        space.advance()
+    space.set_org(0x100)
+    space.advance(4)
+    space.advance()
+    assert space.used_ranges == [(0, 10), (0x100, 0x105)]
+
+
+def test_org_collision_and_backward_move():
+    space = AddressSpace()
+    space.advance(8)
+    with pytest.raises(ValueError, match="backward"):
+        space.set_org(4)
+
+    space.current_section = ".data"
+    with pytest.raises(ValueError, match="collision at 0004"):
+        space.set_org(4)
+    space.set_org(8)  # First free word
+    space.set_org(0x7F0)  # Beyond anything emitted
+
+
+def test_undo_advance():
+    space = AddressSpace()
+    space.advance(5)
+    space.undo_advance()
+    space.undo_advance(2)
+    assert space.get_word_address() == 2
+    assert space.used_ranges == [(0, 2)]
+
+    # Retracted words are free again
+    space.current_section = ".data"
+    space.set_org(3)
+
+    with pytest.raises(ValueError):
+        space.undo_advance()
+
+
+def test_undo_advance_past_the_map():
+    space = AddressSpace()
+    space.advance()
+    space.set_org(100)
+    with pytest.raises(ValueError, match="Cannot retract"):
+        space.undo_advance(1)
+    assert space.get_word_address() == 100
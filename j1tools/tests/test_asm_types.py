@@ -0,0 +1,65 @@
+import pickle
+import pytest
+from lark import Token
+from j1tools.assembler.asm import J1Assembler
+from j1tools.assembler.asm_types import InstructionMetadata, InstructionType
+
+
+def make_record(lines, line=2):
+    token = Token("T", "T", line=line, column=5)
+    return InstructionMetadata.from_token(
+        inst_type=InstructionType.BYTE_CODE,
+        value=0x6000,
+        token=token,
+        filename="prog.asm",
+        source_lines=lines,
+        instr_text="T",
+    )
+
+
+def test_record_is_slotted_and_keeps_no_token():
+    record = make_record(["first", "    T  // second"])
+    assert not hasattr(record, "__dict__")
+    assert not hasattr(record, "token")
+    assert (record.line, record.column) == (2, 5)
+
+
+def test_source_line_comes_from_shared_table():
+    lines = ["first", "    T  // second"]
+    a = make_record(lines, line=1)
+    b = make_record(lines, line=2)
+    assert a.lines is b.lines
+    assert a.source_line == "first"
+    assert b.source_line == "    T  // second"
+    assert make_record(lines, line=9).source_line == ""
+
+
+def test_names_are_interned():
+    name = "".join(["prog", ".asm"])
+    record = InstructionMetadata(
+        type=InstructionType.BYTE_CODE, value=0, filename=name, instr_text="T[RET,r-1]"
+    )
+    assert record.filename is make_record([]).filename
+
+
+def test_copy_and_pickle():
+    record = make_record(["first", "second"])
+    moved = record.copy(word_addr=7, macro_name="dup")
+    assert (moved.word_addr, moved.macro_name, moved.source_line) == (7, "dup", "second")
+    assert record.word_addr == -1
+
+    restored = pickle.loads(pickle.dumps(moved))
+    assert [getattr(restored, n) for n in InstructionMetadata.__slots__] == [
+        getattr(moved, n) for n in InstructionMetadata.__slots__
+    ]
+
+
+def test_macro_expansion_lists_body_source():
+    """Expanded words sit at the call site but show the macro body's source."""
+    assembler = J1Assembler()
+    source = "macro: two ( -- ) T N endmacro // defined here\n\nT\n  two\n"
+    assembler.transform(assembler.parse(source, "prog.asm"))
+
+    expanded = [i for i in assembler.instructions if i.macro_name == "two"]
+    assert [(i.line, i.column) for i in expanded] == [(4, 3), (4, 3)]
+    assert all(i.source_line.startswith("macro: two") for i in expanded)
@@ -120,7 +120,7 @@ def test_invalid_syntax(assembler):
 def test_undefined_label(assembler):
     """Test undefined label handling."""
     with pytest.raises((ValueError, VisitError)) as exc_info:
-        assembler.transform(assembler.parse("JMP undefined_label"))
+        assembler.transform(assembler.parse("JMP 'undefined_label"))
     assert "Undefined label" in str(exc_info.value)
 
 
@@ -317,3 +317,81 @@ def test_loop_index_warnings(tmp_path, caplog):
     for expected, actual in zip(expected_warnings, actual_warnings):
         assert expected == actual, \
             f"Expected warning '{expected}' not found in '{actual}'"
+
+
+@pytest.mark.parametrize(
+    "asm_path",
+    [
+        "tests/test_files/control/do_plus_loop/do_plus_loop.asm",
+        "tests/test_files/include/nested_include/nested_include.asm",
+        "tests/test_files/variables/chars/chars.asm",
+        "../firmware/count/count.asm",
+    ],
+)
+def test_earley_fallback_matches_lalr(asm_path, tmp_path):
+    """The Earley fallback parser produces the same hex, listing and symbols."""
+    asm_file = Path(__file__).parent.parent / asm_path
+    source = asm_file.read_text()
+
+    outputs = {}
+    for parser in ("lalr", "earley"):
+        assembler = J1Assembler(parser=parser)
+        assembler.transform(assembler.parse(source, str(asm_file)))
+        out = tmp_path / parser
+        out.mkdir()
+        assembler.generate_output(out / "out.hex")
+        assembler.generate_listing(out / "out.lst")
+        assembler.generate_symbols(out / "out.sym")
+        outputs[parser] = [
+            (out / name).read_text() for name in ("out.hex", "out.lst", "out.sym")
+        ]
+
+    assert outputs["lalr"] == outputs["earley"]
+
+
+def test_depfile_lists_transitive_includes(tmp_path):
+    """The .d file names every resolved include, stdlib included."""
+    (tmp_path / "inner.asm").write_text("N\n")
+    (tmp_path / "outer.asm").write_text('include "inner.asm"\n')
+    main_file = tmp_path / "main.asm"
+    main_file.write_text('include "outer.asm"\ninclude "core/j1_base_macros.asm"\nT\n')
+
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(main_file.read_text(), str(main_file)))
+    assembler.generate_depfile(tmp_path / "main.d", "main.hex")
+
+    rule, *phony = (tmp_path / "main.d").read_text().split("\n\n")
+    target, prerequisites = rule.split(":", 1)
+    prerequisites = prerequisites.replace("\\\n", " ").split()
+    stdlib = str(assembler.config.stdlib_path / "core" / "j1_base_macros.asm")
+
+    assert target == "main.hex"
+    assert prerequisites == [
+        str(main_file),
+        str(tmp_path / "outer.asm"),
+        str(tmp_path / "inner.asm"),
+        stdlib,
+    ]
+    assert [p.strip() for p in phony] == [f"{p}:" for p in prerequisites[1:]]
+
+
+def test_depfile_cli_option(tmp_path, monkeypatch):
+    """-MD writes the .d file next to the output, --depfile anywhere."""
+    from click.testing import CliRunner
+    from j1tools.assembler.asm import main
+
+    (tmp_path / "words.asm").write_text("N\n")
+    (tmp_path / "my prog.asm").write_text('include "words.asm"\nT\n')
+    monkeypatch.chdir(tmp_path)
+
+    runner = CliRunner()
+    result = runner.invoke(main, ["my prog.asm", "-o", "my prog.hex", "-MD"])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "my prog.d").read_text().startswith(
+        "my\\ prog.hex: my\\ prog.asm \\\n words.asm\n"
+    )
+
+    (tmp_path / "deps").mkdir()
+    result = runner.invoke(main, ["my prog.asm", "--depfile", "deps/out.d"])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "deps" / "out.d").read_text().startswith("aout.hex: ")
@@ -0,0 +1,127 @@
+import sys
+import pytest
+from pathlib import Path
+from click.testing import CliRunner
+from j1tools.assembler import asm
+from j1tools.assembler.asm import assemble_file
+from j1tools.assembler.batch import batch, collect_sources, run_batch
+from j1tools.assembler.include_cache import IncludeCache
+
+TEST_FILES = Path(__file__).parent / "test_files"
+
+
+@pytest.fixture
+def programs(tmp_path):
+    """A few programs, one in a subdirectory, sharing a stdlib include."""
+    (tmp_path / "sub").mkdir()
+    sources = {
+        "a.asm": 'include "core/j1_base_macros.asm"\n#1 #2 + drop\n',
+        "b.asm": "T N T+N\n",
+        "sub/c.asm": 'include "core/j1_base_macros.asm"\n: loop dup drop JMP \'loop\n',
+    }
+    for name, text in sources.items():
+        (tmp_path / name).write_text(text)
+    return tmp_path
+
+
+def reference_outputs(source, tmp_path):
+    """Outputs of assembling source on its own, as j1asm does."""
+    out = tmp_path / "reference" / source.with_suffix(".hex").name
+    out.parent.mkdir(exist_ok=True)
+    assemble_file(
+        str(source), str(out), symbols=True, listing=True,
+        include_cache=IncludeCache(enabled=False),
+    )
+    return [out.with_suffix(ext).read_bytes() for ext in (".hex", ".lst", ".sym")]
+
+
+def test_collect_sources(programs):
+    found = collect_sources([str(programs), str(programs / "b.asm")])
+    assert sorted(p.relative_to(programs).as_posix() for p in found) == [
+        "a.asm", "b.asm", "sub/c.asm",
+    ]
+    assert len(collect_sources([str(programs / "*.asm")])) == 2
+    with pytest.raises(FileNotFoundError):
+        collect_sources([str(programs / "missing*.asm")])
+
+
+def test_collect_sources_skips_includes(programs):
+    (programs / "words.asm").write_text(": one #1 ;\n")
+    (programs / "lib").mkdir()
+    (programs / "lib" / "more.asm").write_text(": two #2 ;\n")
+    (programs / "b.asm").write_text('include "words.asm"\ninclude "more.asm"\nT\n')
+    found = collect_sources([str(programs)], include=[str(programs / "lib")])
+    assert sorted(p.relative_to(programs).as_posix() for p in found) == [
+        "a.asm", "b.asm", "sub/c.asm",
+    ]
+    # Without -I, lib/more.asm is just another program
+    assert len(collect_sources([str(programs)])) == 4
+
+
+def test_batch_does_not_emit_include_fixtures():
+    found = {p.name for p in collect_sources([str(TEST_FILES / "include")])}
+    assert found == {"basic_include.asm", "nested_include.asm"}
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch_matches_single_assembly(programs, tmp_path, jobs):
+    sources = collect_sources([str(programs)])
+    out_dir = tmp_path / "out"
+    results = list(
+        run_batch(sources, jobs=jobs, output_dir=out_dir, symbols=True, listing=True)
+    )
+
+    assert [r.source for r in results] == sources
+    assert all(r.ok for r in results)
+    for result in results:
+        assert result.output.is_relative_to(out_dir)
+        outputs = [
+            result.output.with_suffix(ext).read_bytes() for ext in (".hex", ".lst", ".sym")
+        ]
+        assert outputs == reference_outputs(result.source, tmp_path)
+
+
+def test_batch_writes_next_to_sources(programs):
+    results = list(run_batch([programs / "b.asm"], jobs=1))
+    assert results[0].output == programs / "b.hex"
+    assert results[0].words == 3
+    assert (programs / "b.hex").exists()
+
+
+def test_batch_reports_failures(programs):
+    (programs / "bad.asm").write_text("T ]]]\n")
+    results = {r.source.name: r for r in run_batch(collect_sources([str(programs)]), jobs=1)}
+    assert not results["bad.asm"].ok
+    assert results["bad.asm"].messages[0].startswith("ERROR:")
+    assert results["b.asm"].ok
+
+
+def test_batch_cli_summary(programs):
+    (programs / "bad.asm").write_text("T ]]]\n")
+    runner = CliRunner()
+    result = runner.invoke(batch, [str(programs), "-j", "1", "-q"])
+    assert result.exit_code == 1
+    assert "FAILED" in result.output
+    assert "a.asm" not in result.output
+    assert result.output.strip().splitlines()[-1].startswith("3 assembled, 1 failed")
+
+
+def test_corpus_batch_is_byte_identical(tmp_path):
+    """Batch output for the test corpus matches the checked-in references."""
+    sources = [
+        s for s in collect_sources([str(TEST_FILES)]) if s.with_suffix(".hex").exists()
+    ]
+    results = list(run_batch(sources, jobs=2, output_dir=tmp_path))
+    for result in results:
+        assert result.ok, result.messages
+        assert result.output.read_bytes() == result.source.with_suffix(".hex").read_bytes()
+
+
+def test_cli_dispatches_batch(programs, monkeypatch):
+    calls = []
+    monkeypatch.setattr(sys, "argv", ["j1asm", "batch", str(programs)])
+    monkeypatch.setattr(
+        "j1tools.assembler.batch.batch", lambda **kwargs: calls.append(kwargs)
+    )
+    asm.cli()
+    assert calls == [{"args": [str(programs)], "prog_name": "j1asm batch"}]
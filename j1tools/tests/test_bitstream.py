@@ -0,0 +1,97 @@
+import shutil
+import pytest
+from pathlib import Path
+from j1tools.bitstream import Bitstream, BramMap, read_mmi
+from j1tools.bitstream.bitfile import crc_update
+from j1tools.bitstream.bram import data_slot, parity_slot
+from j1tools.bitstream.mmi import BitLane, MemoryMap
+from j1tools.bitstream.patch import main
+from j1tools.memory.convert import read_image
+from j1tools.memory.image import MemoryImage
+
+REPO = Path(__file__).parent.parent.parent
+BIT = REPO / "bitstream" / "j1_base.bit"
+MMI = REPO / "bitstream" / "j1_base.mmi"
+# The image built into j1_base.bit
+FORTH = REPO / "firmware" / "mecrisp-ice-forth" / "mecrisp-ice-forth.hex"
+BLINKY = REPO / "firmware" / "blinky" / "blinky.hex"
+
+pytestmark = pytest.mark.skipif(not BIT.exists(), reason="no prebuilt bitstream")
+
+
+def load():
+    return BramMap(read_mmi(MMI), Bitstream.read(BIT))
+
+
+def test_reads_header_and_frames():
+    bitstream = Bitstream.read(BIT)
+    assert bitstream.part == "7s50csga324"
+    assert bitstream.idcode & 0x0FFFFFFF == 0x362F093
+    assert bitstream.frame_count == 5420
+    assert bitstream.compute_crc() == bitstream.words[bitstream._crc_index]
+
+
+def test_slots_cover_frame_bits_once():
+    data = [data_slot(bit) for bit in range(256)]
+    parity = [parity_slot(bit) for bit in range(32)]
+    assert len(set(data + parity)) == 288
+    assert max(data + parity) < 320
+
+
+def test_extracts_built_in_image():
+    assert load().extract().tolist() == read_image(FORTH).tolist()
+
+
+def test_round_trip_extract_patch_extract(tmp_path):
+    bram = load()
+    original = bram.extract()
+    blinky = read_image(BLINKY)
+    bram.patch(blinky)
+    patched = tmp_path / "blinky.bit"
+    bram.bitstream.write(patched)
+
+    bitstream = Bitstream.read(patched)
+    # The incrementally updated CRC matches a full recompute
+    assert bitstream.compute_crc() == bitstream.words[bitstream._crc_index]
+    bram = BramMap(read_mmi(MMI), bitstream)
+    assert bram.extract().tolist() == blinky.padded(4096).tolist()
+
+    bram.patch(original)
+    assert bram.bitstream.to_bytes() == BIT.read_bytes()
+
+
+def test_crc_update_is_linear():
+    crc = crc_update(crc_update(0, 2, 0x12345678), 2, 0x9ABCDEF0)
+    delta = crc_update(crc_update(0, 0, 0x00000100), 0, 0)
+    assert crc_update(crc_update(0, 2, 0x12345778), 2, 0x9ABCDEF0) == crc ^ delta
+
+
+def test_rejects_bad_placements_and_sizes():
+    bitstream = Bitstream.read(BIT)
+    missing = MemoryMap("cpu", "xc7s50csga324-1", [BitLane("RAMB36_X6Y35", 15, 0, 0, 1023)])
+    with pytest.raises(ValueError, match="does not exist"):
+        BramMap(missing, bitstream)
+    too_deep = MemoryMap("cpu", "xc7s50csga324-1", [BitLane("RAMB36_X0Y6", 15, 0, 0, 4095)])
+    with pytest.raises(ValueError, match="don't fit"):
+        BramMap(too_deep, bitstream)
+    other_part = MemoryMap("cpu", "xc7a35tcpg236-1", [BitLane("RAMB36_X0Y6", 7, 0, 0, 4095)])
+    with pytest.raises(ValueError, match="is for"):
+        BramMap(other_part, bitstream)
+    with pytest.raises(ValueError, match="does not fit"):
+        load().patch(MemoryImage.zeros(4097))
+
+
+def test_cli_patch_and_extract(tmp_path, capsys):
+    bit = tmp_path / "base.bit"
+    shutil.copy(BIT, bit)
+    shutil.copy(MMI, tmp_path / "base.mmi")
+    out = tmp_path / "blinky.bit"
+    main(["patch", str(bit), str(BLINKY), "-o", str(out)])
+    assert "Patched 119 words" in capsys.readouterr().out
+
+    extracted = tmp_path / "blinky.hex"
+    main(["extract", str(out), "-m", str(MMI), "-o", str(extracted), "--trim"])
+    assert extracted.read_text() == BLINKY.read_text()
+
+    with pytest.raises(SystemExit):
+        main(["patch", str(bit), str(tmp_path / "missing.hex"), "-o", str(out)])
@@ -0,0 +1,144 @@
+import io
+import pytest
+from j1tools.memory import convert as convert_module
+from j1tools.memory.convert import convert, convert_many, detect, main
+from j1tools.memory.image import MemoryImage
+
+WORDS = [0x6000, 0x6011, 0x6103, 0x6D50, 0x0000, 0xFFFF]
+
+
+def write_image(path, fmt, words=WORDS):
+    mode = "wb" if fmt == "bin" else "w"
+    with open(path, mode) as f:
+        MemoryImage(words).write(fmt, f)
+    return path
+
+
+@pytest.mark.parametrize("src", ["hex", "coe", "mif", "mem", "bin"])
+@pytest.mark.parametrize("dst", ["hex", "coe", "mif", "mem", "bin"])
+def test_convert_matches_image_writers(tmp_path, src, dst):
+    source = write_image(tmp_path / f"in.{src}", src)
+    expected = write_image(tmp_path / f"expected.{dst}", dst)
+    output = tmp_path / f"out.{dst}"
+    assert convert(source, output, dst) == len(WORDS)
+    assert output.read_bytes() == expected.read_bytes()
+
+
+def test_streams_across_chunks(tmp_path, monkeypatch):
+    """Results don't depend on where chunk boundaries fall."""
+    monkeypatch.setattr(convert_module, "CHUNK_SIZE", 16)
+    words = list(range(0, 0x10000, 257))
+    for src in ("hex", "coe", "mif", "mem", "bin"):
+        source = write_image(tmp_path / f"in.{src}", src, words)
+        output = tmp_path / f"out_{src}.hex"
+        convert(source, output, "hex")
+        assert output.read_text() == "".join(f"{w:04x}\n" for w in words)
+
+
+def test_detects_format_and_width(tmp_path):
+    wide = tmp_path / "wide.dat"
+    wide.write_text("0123456789abcdef // 64-bit word\nfedcba9876543210\n")
+    assert detect(wide) == ("hex", 64)
+
+    words = tmp_path / "words.txt"
+    words.write_text("@0000 12345678\n@0001 9ABCDEF0\n")
+    assert detect(words) == ("mem", 32)
+    out = io.StringIO()
+    convert(words, out, "mif")
+    assert out.getvalue() == "00010010001101000101011001111000\n10011010101111001101111011110000\n"
+
+    mif = tmp_path / "prog.txt"
+    mif.write_text("0110000000000000\n")
+    assert detect(mif) == ("mif", 16)
+    coe = tmp_path / "prog.img"
+    coe.write_text("memory_initialization_radix=2;\nmemory_initialization_vector=\n0110000000000000;\n")
+    assert detect(coe) == ("coe", 16)
+    assert detect(tmp_path / "prog.img", width=32) == ("coe", 32)
+
+
+def test_hex_keeps_input_digits_and_pads_short_words(tmp_path):
+    source = tmp_path / "prog.hex"
+    source.write_text("6D50\n1\n")
+    out = io.StringIO()
+    convert(source, out, "coe")
+    assert out.getvalue().splitlines()[2:] == ["6D50,", "0001;"]
+
+
+def test_mem_gaps_are_zero_filled(tmp_path):
+    source = tmp_path / "prog.mem"
+    source.write_text("@0000 6000\n@0003 6100 6200\n")
+    out = io.StringIO()
+    convert(source, out, "hex")
+    assert out.getvalue() == "6000\n0000\n0000\n6100\n6200\n"
+
+    source.write_text("@0004 6000\n@0002 6100\n")
+    with pytest.raises(ValueError, match="below the current address"):
+        convert(source, io.StringIO(), "hex")
+
+
+@pytest.mark.parametrize(
+    "name, text, message",
+    [
+        ("bad.hex", "6000\nZZZZ\n", "Invalid hexadecimal value: ZZZZ"),
+        ("wide.hex", "6000\n123456\n", "wider than 16 bits"),
+        ("bad.mif", "0110000000000000\n0110000000000002\n", "Invalid binary value"),
+        ("bad.coe", "memory_initialization_radix=8;\nmemory_initialization_vector=\n1;\n",
+         "Unsupported COE radix"),
+    ],
+)
+def test_invalid_input(tmp_path, name, text, message):
+    source = tmp_path / name
+    source.write_text(text)
+    with pytest.raises(ValueError, match=message):
+        convert(source, io.StringIO(), "hex")
+
+
+def test_bad_input_leaves_no_output(tmp_path):
+    source = tmp_path / "bad.hex"
+    source.write_text("6000\nzz12\n")
+    with pytest.raises(ValueError, match="Invalid hexadecimal value: zz12"):
+        convert(source, tmp_path / "out.coe", "coe")
+    assert list(tmp_path.iterdir()) == [source]
+
+    # An existing output is kept until a conversion succeeds
+    (tmp_path / "out.coe").write_text("old")
+    with pytest.raises(ValueError):
+        convert(source, tmp_path / "out.coe", "coe")
+    assert (tmp_path / "out.coe").read_text() == "old"
+    source.write_text("6000\n")
+    assert convert(source, tmp_path / "out.coe", "coe") == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bad.hex", "out.coe"]
+
+
+def test_mixed_widths_need_the_width(tmp_path):
+    source = tmp_path / "wide.hex"
+    source.write_text("6000\n12345678\n")
+    with pytest.raises(ValueError, match="use --width"):
+        convert(source, io.StringIO(), "coe")
+    out = io.StringIO()
+    convert(source, out, "coe", width=32)
+    assert out.getvalue().endswith("00006000,\n12345678;\n")
+
+
+def test_convert_many_in_parallel(tmp_path):
+    sources = [write_image(tmp_path / f"p{i}.hex", "hex", WORDS[i:]) for i in range(3)]
+    (tmp_path / "bad.hex").write_text("XYZW\n")
+    sources.append(tmp_path / "bad.hex")
+    results = list(convert_many(sources, "coe", tmp_path / "out", jobs=2))
+
+    assert [r.ok for r in results] == [True, True, True, False]
+    assert [r.words for r in results[:3]] == [6, 5, 4]
+    assert results[3].error == "Invalid hexadecimal value: XYZW"
+    assert (tmp_path / "out" / "p1.coe").read_text().endswith("0000,\nffff;\n")
+
+
+def test_cli(tmp_path, capsys):
+    source = write_image(tmp_path / "prog.hex", "hex")
+    main([str(source), "-t", "mem", "-o", "-"])
+    assert capsys.readouterr().out.startswith("@0000 6000\n@0001 6011\n")
+
+    main([str(source), "-t", "bin", "-d", str(tmp_path / "bin")])
+    assert (tmp_path / "bin" / "prog.bin").read_bytes()[:4] == b"\x00\x60\x11\x60"
+
+    with pytest.raises(SystemExit):
+        main([str(source), str(source), "-t", "coe", "-o", "out.coe"])
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import pytest
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import J1, BlockJ1
+from j1tools.sim.bridge import UartBridge
+from j1tools.sim.devices import Board, Uart
+
+
+def assemble(source):
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(source, "prog.asm"))
+    return assembler.memory_image()
+
+
+ECHO = assemble(
+    """
+    ORG $0000
+    JMP 'start
+    include "core/j1_base_macros.asm"
+    include "io/terminal_io.asm"
+
+    : start
+        key #1 + emit
+        JMP 'start
+    """
+)
+
+
+@pytest.mark.parametrize("engine", [None, BlockJ1])
+def test_terminal_io_echo(engine):
+    board = Board(ECHO, engine=engine) if engine else Board(ECHO)
+    board.uart.receive(b"HAL")
+    board.run(2000)
+    assert board.uart.take_tx() == b"IBM"
+    assert not board.uart.rx
+
+
+def test_status_and_counters():
+    # JMP 1 / #$2000 io@ / #$7FFF invert io@ (reads $8000 in cycle 6)
+    board = Board([0x0001, 0xA000, 0x6D50, 0xFFFF, 0x6600, 0x6D50, 0x0006])
+    board.uart.receive(b"x")
+    board.run(6)
+    assert board.cpu.data_stack() == [0b11, 6]
+
+
+def test_transmitter_busy():
+    uart = Uart(tx_cycles=10)
+    uart.write(0x41, cycle=5)
+    assert not uart.ready(15) and uart.ready(16)
+
+
+def test_ticks_overflow_interrupts():
+    image = assemble(
+        """
+        ORG $0000
+        JMP 'start
+        JMP 'irq
+        include "core/j1_base_macros.asm"
+
+        : irq
+            #1 +
+            #$F invert #$4000 io!
+        ;
+        : start
+            #0
+            #$F invert #$4000 io!
+            eint
+        : idle
+            JMP 'idle
+        """
+    )
+    # Single-cycle slices can't run past an overflow, so they are exact
+    exact, board = Board(image, quantum=1), Board(image, engine=BlockJ1)
+    exact.run(2000)
+    board.run(2000)
+    assert board.cpu.st0 == exact.cpu.st0 == 86
+    assert (board.cpu.pc, board.cpu.cycles) == (exact.cpu.pc, exact.cpu.cycles)
+
+
+# Counts the ISR runs in st0; the ISR reloads ticks every 1024 cycles
+TIMER = assemble(
+    """
+    ORG $0000
+    JMP 'start
+    JMP 'irq
+    include "core/j1_base_macros.asm"
+
+    : irq
+        #1 +
+        #$03FF invert #$4000 io!
+    ;
+    : start
+        #0
+        #$03FF invert #$4000 io!
+        eint
+    : idle
+        JMP 'idle
+    """
+)
+
+
+@pytest.mark.parametrize("engine", [J1, BlockJ1])
+def test_short_ticks_period_runs_each_cycle_once(engine):
+    class Counting(engine):
+        ran = 0
+
+        def run(self, steps):
+            start = self.cycles
+            super().run(steps)
+            Counting.ran += self.cycles - start
+
+    exact, board = Board(TIMER, quantum=1), Board(TIMER, engine=Counting)
+    exact.run(20000)
+    ran = Counting.ran
+    board.run(20000)
+    # A write to ticks ends the slice instead of replaying it
+    assert Counting.ran - ran <= 20000
+    assert board.cpu.st0 == exact.cpu.st0 == 19
+    assert (board.cpu.pc, board.cpu.cycles) == (exact.cpu.pc, exact.cpu.cycles)
+
+
+def test_bridge_over_tcp():
+    async def session():
+        bridge = UartBridge(Board(ECHO), slice_cycles=500)
+        server = await bridge.serve_tcp()
+        port = server.sockets[0].getsockname()[1]
+        running = asyncio.ensure_future(bridge.run())
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"0123")
+        reply = await asyncio.wait_for(reader.readexactly(4), 10)
+        writer.close()
+        bridge.stop()
+        await running
+        server.close()
+        await server.wait_closed()
+        return reply
+
+    assert asyncio.run(session()) == b"1234"
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pty")
+def test_bridge_over_pty():
+    async def session():
+        bridge = UartBridge(Board(ECHO), slice_cycles=500)
+        path = bridge.open_pty()
+        running = asyncio.ensure_future(bridge.run())
+        fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        os.write(fd, b"ab")
+        reply = b""
+        while len(reply) < 2:
+            await asyncio.sleep(0.01)
+            os.set_blocking(fd, False)
+            try:
+                reply += os.read(fd, 16)
+            except BlockingIOError:
+                pass
+        os.close(fd)
+        bridge.stop()
+        await running
+        return reply
+
+    assert asyncio.run(asyncio.wait_for(session(), 10)) == b"bc"
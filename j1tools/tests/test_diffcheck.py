@@ -0,0 +1,133 @@
+import random
+import pytest
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import J1
+from j1tools.sim.diffcheck import (
+    RTLStep, check, csv_steps, format_divergence, main, read_listing, vcd_steps,
+)
+from j1tools.sim.profile import listing_lines
+from j1tools.sim.reference import IRQOPCODE, reference_step
+
+SOURCE = """
+ORG $0000
+JMP 'start
+JMP 'irq
+include "core/j1_base_macros.asm"
+: irq
+    #1 + ;
+: start
+    #0 eint
+: loop
+    #$1000 io@ +
+    dup #$2000 io!
+    JMP 'loop
+"""
+
+
+class _RTL:
+    """Stand-in for the RTL: the reference model with random io_din."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.din_value = 0
+        self.wrote = False
+
+    def din(self, addr):
+        return self.din_value
+
+    def rd(self, addr):
+        pass
+
+    def wr(self, addr, value):
+        self.wrote = True
+
+
+def record(image, cycles, seed=23):
+    """RTLSteps of a run with random io_din and interrupt_request."""
+    rng = random.Random(seed)
+    io = _RTL(rng)
+    cpu = J1(image, io=io)
+    steps = []
+    for cycle in range(1, cycles + 1):
+        irq = int(rng.random() < 0.05)
+        din = rng.randrange(0x10000)
+        insn = IRQOPCODE if irq and cpu.pc & 1 else cpu.mem[cpu.word_pc]
+        before = (cpu.pc, insn, cpu.st0, cpu.dsp, cpu.rsp)
+        io.din_value, io.wrote = din, False
+        reference_step(cpu, irq)
+        steps.append(RTLStep(cycle, *before, int(io.wrote), din, irq))
+    return steps
+
+
+@pytest.fixture(scope="module")
+def program():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(SOURCE, "prog.asm"))
+    return assembler
+
+
+def write_csv(path, steps):
+    lines = ["cycle,pc,insn,st0,dsp,rsp,io_wr,io_din,interrupt_request"]
+    lines += [",".join(str(v) if i in (0, 4, 5) else hex(v) for i, v in enumerate(s)) for s in steps]
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("engine", ["reference", "dispatch", "blocks"])
+def test_matching_trace(tmp_path, program, engine):
+    steps = record(program.memory_image(), 2000)
+    assert any(s.io_wr for s in steps) and any(s.pc == 2 for s in steps)  # wrote, interrupted
+    path = tmp_path / "trace.csv"
+    write_csv(path, steps)
+    assert check(program.memory_image(), csv_steps(path), engine) == (2000, None)
+
+
+def test_reports_first_divergence(tmp_path, program):
+    steps = record(program.memory_image(), 500)
+    bad = steps[300]
+    steps[300] = bad._replace(st0=bad.st0 ^ 4)
+    steps[400] = steps[400]._replace(dsp=7)
+    lst = tmp_path / "prog.lst"
+    lst.write_text("".join(listing_lines(program)))
+    compared, divergence = check(program.memory_image(), iter(steps), listing=read_listing(lst))
+    assert compared == 300
+    assert divergence.cycle == 301
+    assert divergence.registers == {"st0": (bad.st0 ^ 4, bad.st0)}
+    assert divergence.source.startswith(f"{bad.pc & ~1:04x}")
+    report = format_divergence(divergence)
+    assert "cycle 301" in report and "st0" in report and divergence.source in report
+
+
+def test_vcd_trace_from_reset(tmp_path, program):
+    steps = record(program.memory_image(), 200)
+    names = ["clk", "resetq", "pc", "insn", "st0", "dsp", "rsp", "io_wr", "io_din", "interrupt_request"]
+    codes = {name: chr(33 + i) for i, name in enumerate(names)}
+    lines = ["$timescale 1ns $end\n$scope module j1_tb $end\n"]
+    lines += [f"$var wire 16 {codes[n]} {n} $end\n" for n in names]
+    lines.append("$upscope $end\n$enddefinitions $end\n#0\n")
+    # Five cycles in reset, the boot cycle, then the run
+    rows = [dict.fromkeys(names[2:], 0)] * 6 + [dict(zip(names[2:], s[1:])) for s in steps]
+    for k, row in enumerate(rows):
+        lines.append(f"#{10 * k + 1}\n" + "".join(f"b{v:b} {codes[n]}\n" for n, v in row.items()))
+        lines.append(f"b{int(k >= 5):b} {codes['resetq']}\n")
+        lines.append(f"#{10 * k + 5}\nb1 {codes['clk']}\n#{10 * k + 10}\nb0 {codes['clk']}\n")
+    path = tmp_path / "trace.vcd"
+    path.write_text("".join(lines))
+    assert [s.cycle for s in vcd_steps(path)][:2] == [0, 1]
+    assert list(vcd_steps(path))[1:] == steps
+    assert check(program.memory_image(), vcd_steps(path), "dispatch") == (200, None)
+
+
+def test_main_exit_status(tmp_path, program, capsys):
+    image = tmp_path / "prog.hex"
+    image.write_text("".join(f"{word:04x}\n" for word in program.memory_image()))
+    steps = record(program.memory_image(), 100)
+    trace = tmp_path / "trace.csv"
+    write_csv(trace, steps)
+    main([str(image), str(trace)])
+    assert "100 cycles match" in capsys.readouterr().out
+    steps[50] = steps[50]._replace(rsp=9)
+    write_csv(trace, steps)
+    with pytest.raises(SystemExit) as exit:
+        main([str(image), str(trace), "--engine", "dispatch"])
+    assert exit.value.code == 1
+    assert "rsp" in capsys.readouterr().out
@@ -0,0 +1,96 @@
+import pytest
+import lark
+from j1tools.assembler.asm import J1Assembler
+from j1tools.assembler.grammar import (
+    get_parser,
+    grammar_hash,
+    parser_cache_path,
+    clear_parser_cache,
+)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the on-disk cache at a temporary directory."""
+    monkeypatch.setenv("J1TOOLS_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize("parser", ["lalr", "earley"])
+def test_parser_shared_between_instances(parser):
+    """All assemblers in a process use the same parser object."""
+    first = J1Assembler(parser=parser)
+    second = J1Assembler(parser=parser)
+    assert first.parser is second.parser
+
+
+def test_unknown_parser_type():
+    with pytest.raises(ValueError):
+        J1Assembler(parser="cyk")
+
+
+def test_lalr_parse_transforms_inline():
+    """The LALR parser runs the assembler callbacks and keeps no tree."""
+    assembler = J1Assembler(parser="lalr")
+    assert assembler.parse("T N") is None
+    assert assembler.get_bytecodes() == [0x6000, 0x6100]
+
+
+@pytest.mark.parametrize(
+    "source,expected",
+    [
+        ("2dup< drop", [0x6811, 0x6103]),  # Number-prefixed identifier
+        ("$10, $20,", [0x0010, 0x0020]),  # Memory init, comma after number
+        ("#'A' drop", [0x8041, 0x6103]),  # Char literal
+        ("io[T][IORD]", [0x6D50]),  # Bracketed ALU op
+        ("macro: DONE ( -- ) T endmacro DONE", [0x6000]),  # Keyword prefix
+    ],
+)
+def test_lalr_lexing_matches_earley(source, expected):
+    """The LALR contextual lexer tokenizes like the Earley dynamic lexer."""
+    source = 'include "core/j1_base_macros.asm"\n' + source
+    for parser in ("lalr", "earley"):
+        assembler = J1Assembler(parser=parser)
+        assembler.transform(assembler.parse(source))
+        assert assembler.get_bytecodes() == expected, parser
+
+
+def test_shared_parser_does_not_leak_state():
+    """Assemblers sharing a parser still produce independent results."""
+    first = J1Assembler()
+    second = J1Assembler()
+    first.transform(first.parse("T N"))
+    second.transform(second.parse("T+N"))
+    assert first.get_bytecodes() == [0x6000, 0x6100]
+    assert second.get_bytecodes() == [0x6200]
+
+
+def test_cache_path_keyed_by_grammar_and_lark_version(cache_dir):
+    path = parser_cache_path("lalr")
+    assert path.parent == cache_dir
+    assert grammar_hash()[:16] in path.name
+    assert lark.__version__ in path.name
+
+
+def test_lalr_parser_disk_cache(cache_dir):
+    """LALR tables are written to disk and reloaded by a fresh process cache."""
+    clear_parser_cache()
+    built = get_parser("lalr")
+    assert parser_cache_path("lalr").exists()
+
+    clear_parser_cache()
+    loaded = get_parser("lalr")
+    assert loaded is not built
+    assert loaded.parse("T N") == built.parse("T N")
+
+    clear_parser_cache(disk=True)
+    assert not parser_cache_path("lalr").exists()
+
+
+def test_corrupt_disk_cache_is_rebuilt(cache_dir):
+    clear_parser_cache()
+    path = parser_cache_path("lalr")
+    path.write_bytes(b"not a parser")
+    parser = get_parser("lalr")
+    assert parser.parse("T") is not None
+    clear_parser_cache(disk=True)
@@ -0,0 +1,188 @@
+import pytest
+from pathlib import Path
+from j1tools.assembler.asm import J1Assembler
+from j1tools.assembler.config import AssemblerConfig
+from j1tools.assembler import include_cache
+from j1tools.assembler.include_cache import IncludeCache
+
+
+LIBRARY = """\
+// Small library with macros, words and labels
+macro: dup ( a -- a a ) T[T->N,d+1] endmacro
+macro: drop ( a -- ) N[d-1] endmacro
+
+: double
+    dup T+N[d-1]
+    T[RET,r-1]
+"""
+
+MAIN = """\
+#5
+include "lib.asm"
+{extra}
+: loop
+    dup CALL 'double
+    drop
+    JMP 'loop
+"""
+
+
+def assemble(tmp_path, main, cache):
+    """Assemble main.asm and return its hex, listing and symbol output."""
+    main_file = tmp_path / "main.asm"
+    main_file.write_text(main)
+    assembler = J1Assembler(include_cache=cache)
+    assembler.transform(assembler.parse(main, str(main_file)))
+    outputs = []
+    for name, method in [
+        ("out.hex", assembler.generate_output),
+        ("out.lst", assembler.generate_listing),
+        ("out.sym", assembler.generate_symbols),
+    ]:
+        path = tmp_path / name
+        method(str(path))
+        outputs.append(path.read_text())
+    return outputs
+
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "lib.asm").write_text(LIBRARY)
+    return tmp_path / "lib.asm"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return IncludeCache(directory=tmp_path / "cache")
+
+
+def test_warm_build_matches_cold(tmp_path, library, cache):
+    uncached = assemble(tmp_path, MAIN.format(extra=""), IncludeCache(enabled=False))
+    cold = assemble(tmp_path, MAIN.format(extra=""), cache)
+    warm = assemble(tmp_path, MAIN.format(extra=""), cache)
+    assert cold == uncached
+    assert warm == uncached
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_cache_hit_skips_parser(tmp_path, library, cache, monkeypatch):
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+
+    parsed = []
+    original = J1Assembler._parse_source
+
+    def counting_parse(self, source):
+        parsed.append(source)
+        return original(self, source)
+
+    monkeypatch.setattr(J1Assembler, "_parse_source", counting_parse)
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+    assert parsed == [MAIN.format(extra="")]
+
+
+def test_cached_include_is_relocated(tmp_path, library, cache):
+    """A record made at one address replays correctly at another."""
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+    shifted = "#1 #2 #3\n" + MAIN.format(extra="")
+    warm = assemble(tmp_path, shifted, cache)
+    assert cache.hits == 1
+    assert warm == assemble(tmp_path, shifted, IncludeCache(enabled=False))
+
+
+def test_changed_include_is_reassembled(tmp_path, library, cache):
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+    library.write_text(LIBRARY.replace("T+N", "T^N"))
+    result = assemble(tmp_path, MAIN.format(extra=""), cache)
+    assert cache.hits == 0
+    assert result == assemble(tmp_path, MAIN.format(extra=""), IncludeCache(enabled=False))
+
+
+def test_one_record_per_include(tmp_path, library, cache):
+    """Each edit replaces the include's record in memory and on disk."""
+    keys = []
+    for n in range(5):
+        library.write_text(LIBRARY.replace("T+N[d-1]", f"T+N[d-1] #{n} N[d-1]"))
+        assemble(tmp_path, MAIN.format(extra=""), cache)
+        keys.append(include_cache._latest[str(library)])
+    assert len(set(keys)) == 5
+    assert [key in include_cache._memory for key in keys] == [False] * 4 + [True]
+    assert len(list((tmp_path / "cache").glob("*.pickle"))) == 1
+    # The latest version still hits
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+    assert cache.hits == 1
+
+
+def test_changed_nested_include_is_reassembled(tmp_path, cache):
+    (tmp_path / "outer.asm").write_text(
+        'include "inner.asm"\n: outer CALL \'inner T[RET,r-1]\n'
+    )
+    inner = tmp_path / "inner.asm"
+    inner.write_text(": inner T T[RET,r-1]\n")
+    main = 'include "outer.asm"\nCALL \'outer\n'
+
+    assemble(tmp_path, main, cache)
+    inner.write_text(": inner N T[RET,r-1]\n")
+    result = assemble(tmp_path, main, cache)
+    assert result == assemble(tmp_path, main, IncludeCache(enabled=False))
+    assert "6100" in result[0]
+
+
+def test_changed_external_macro_is_reassembled(tmp_path, cache):
+    """An include that expands a macro defined by its includer depends on it."""
+    (tmp_path / "lib.asm").write_text(": word helper T[RET,r-1]\n")
+    template = "macro: helper ( -- ) {body} endmacro\ninclude \"lib.asm\"\nCALL 'word\n"
+
+    assemble(tmp_path, template.format(body="T"), cache)
+    result = assemble(tmp_path, template.format(body="N"), cache)
+    assert "6100" in result[0]
+    assert result == assemble(
+        tmp_path, template.format(body="N"), IncludeCache(enabled=False)
+    )
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "ORG $100\nT\n",  # Absolute placement
+        ": word IF T THEN T[RET,r-1]\n",  # Generated labels
+    ],
+)
+def test_uncacheable_includes(tmp_path, cache, body):
+    (tmp_path / "lib.asm").write_text(body)
+    main = '#1\ninclude "lib.asm"\n'
+    first = assemble(tmp_path, main, cache)
+    second = assemble(tmp_path, main, cache)
+    assert first == second
+    assert cache.hits == 0
+    assert not list((tmp_path / "cache").glob("*.pickle"))
+
+
+def test_disabled_cache(tmp_path, library):
+    cache = IncludeCache(directory=tmp_path / "cache", enabled=False)
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+    assemble(tmp_path, MAIN.format(extra=""), cache)
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert not (tmp_path / "cache").exists()
+
+
+def test_resolve_include_is_memoized(tmp_path, monkeypatch):
+    (tmp_path / "lib.asm").write_text("T\n")
+    config = AssemblerConfig()
+
+    calls = []
+    original = AssemblerConfig._resolve_include
+
+    def counting_resolve(self, filename, current_dir=None):
+        calls.append(filename)
+        return original(self, filename, current_dir)
+
+    monkeypatch.setattr(AssemblerConfig, "_resolve_include", counting_resolve)
+    first = config.resolve_include("lib.asm", tmp_path)
+    second = config.resolve_include("lib.asm", tmp_path)
+    assert first == second == tmp_path / "lib.asm"
+    assert calls == ["lib.asm"]
+
+    # Changing the search path invalidates the memo
+    config.add_include_path(str(tmp_path))
+    config.resolve_include("lib.asm", tmp_path)
+    assert calls == ["lib.asm", "lib.asm"]
@@ -0,0 +1,128 @@
+import io
+import pytest
+from j1tools.assembler.asm import J1Assembler
+from j1tools.memory.image import MemoryImage, parse_formats, write_bin
+from j1tools.memory.memory import hex_to_coe, hex_to_mif, mif_to_mem
+
+WORDS = [0x6000, 0x6011, 0x6103, 0x6D50]
+
+
+def assemble(source):
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(source, "prog.asm"))
+    return assembler
+
+
+def render(image, fmt):
+    f = io.StringIO()
+    image.write(fmt, f)
+    return f.getvalue()
+
+
+def test_words_view_is_zero_copy():
+    image = MemoryImage.zeros(4)
+    view = image.words
+    image[2] = 0x1234
+    assert view[2] == 0x1234
+    assert len(image) == 4 and image.tolist() == [0, 0, 0x1234, 0]
+
+
+def test_writers_match_converters(tmp_path, capsys):
+    image = MemoryImage(WORDS)
+    hex_file = tmp_path / "prog.hex"
+    hex_file.write_text(render(image, "hex"))
+    assert hex_file.read_text() == "6000\n6011\n6103\n6d50\n"
+
+    hex_to_coe(hex_file)
+    assert render(image, "coe") == capsys.readouterr().out
+
+    hex_to_mif(hex_file)
+    mif = capsys.readouterr().out
+    assert render(image, "mif") == mif
+
+    mif_file = tmp_path / "prog.mif"
+    mif_file.write_text(mif)
+    mif_to_mem(mif_file)
+    assert render(image, "mem") == capsys.readouterr().out
+
+
+def test_binary_writer_byte_order():
+    image = MemoryImage([0x1234, 0xABCD])
+    f = io.BytesIO()
+    image.write("bin", f)
+    assert f.getvalue() == bytes([0x34, 0x12, 0xCD, 0xAB])
+
+    f = io.BytesIO()
+    write_bin(image.words, f, byteorder="big")
+    assert f.getvalue() == bytes([0x12, 0x34, 0xAB, 0xCD])
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="Unknown memory format"):
+        render(MemoryImage(), "srec")
+
+
+def test_sparse_image_fills_gaps_with_zero():
+    assembler = assemble("T\nORG $7F0\nN\n")
+    image = assembler.memory_image()
+    assert len(image) == 0x7F1
+    assert image[0] == 0x6000 and image[0x7F0] == 0x6100
+    assert not any(image.words[1:0x7F0])
+    assert assembler.get_bytecodes() == image.tolist()
+
+
+def test_image_is_built_once():
+    assembler = assemble("T N\n")
+    assert assembler.memory_image() is assembler.memory_image()
+
+
+def test_image_requires_assembly():
+    with pytest.raises(ValueError, match="before assembling"):
+        J1Assembler().memory_image()
+
+
+def test_oversized_word_reports_location():
+    assembler = assemble("T\nN\n")
+    assembler.instruction_metadata[1].value = 0x12345
+    with pytest.raises(ValueError, match=r"prog.asm:2:1: Value 0x12345"):
+        assembler.memory_image()
+
+
+def test_padded_image():
+    image = MemoryImage(WORDS)
+    padded = image.padded(8)
+    assert padded.tolist() == WORDS + [0] * 4
+    assert len(image) == 4
+    with pytest.raises(ValueError, match="does not fit in a memory depth of 2"):
+        image.padded(2)
+
+
+def test_parse_formats():
+    assert parse_formats("coe, MIF,coe") == ("coe", "mif")
+    with pytest.raises(ValueError, match="Unknown memory format: srec"):
+        parse_formats("hex,srec")
+
+
+def test_cli_writes_all_formats(tmp_path, monkeypatch):
+    from click.testing import CliRunner
+    from j1tools.assembler.asm import main
+
+    (tmp_path / "prog.asm").write_text("T\nN\n")
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    result = runner.invoke(
+        main, ["prog.asm", "-o", "prog.hex", "--format", "coe,mif,mem,bin", "--depth", "$8"]
+    )
+    assert result.exit_code == 0, result.output
+
+    padded = MemoryImage([0x6000, 0x6100]).padded(8)
+    assert (tmp_path / "prog.hex").read_text() == render(padded, "hex")
+    for fmt in ("coe", "mif", "mem"):
+        assert (tmp_path / f"prog.{fmt}").read_text() == render(padded, fmt)
+    assert (tmp_path / "prog.bin").read_bytes() == b"\x00\x60\x00\x61" + bytes(12)
+
+    result = runner.invoke(main, ["prog.asm", "--format", "srec"])
+    assert result.exit_code == 2
+    assert "Unknown memory format" in result.output
+    result = runner.invoke(main, ["prog.asm", "--depth", "1"])
+    assert result.exit_code != 0
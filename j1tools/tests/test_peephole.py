@@ -0,0 +1,268 @@
+import os
+import random
+
+import pytest
+from j1tools.assembler.asm import J1Assembler, assemble_file
+from j1tools.assembler.peephole import DEFAULT_RULES, format_stats, load_rules, optimize
+from j1tools.sim import J1
+from j1tools.sim.profile import listing_lines
+
+HEADER = """
+ORG $0000
+JMP 'start
+include "core/j1_base_macros.asm"
+include "core/j1_extended_macros.asm"
+"""
+
+
+def assemble(source):
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(HEADER + source, "prog.asm"))
+    return assembler
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return load_rules()
+
+
+class _Recorder:
+    def __init__(self):
+        self.writes = []
+
+    def din(self, addr):
+        return 0
+
+    def rd(self, addr):
+        pass
+
+    def wr(self, addr, value):
+        self.writes.append((addr, value))
+
+
+def writes(image, steps=3000):
+    io = _Recorder()
+    J1(image, io=io).run(steps)
+    return io.writes
+
+
+def run_from(words, seed, steps=None):
+    """Run words from random stacks; the state the rest of the program can see."""
+    rng = random.Random(seed)
+    cpu = J1(list(words))
+    cpu.ds = [rng.randrange(0x10000) for _ in range(32)]
+    cpu.rs = [rng.randrange(0x10000) for _ in range(32)]
+    cpu.st0 = rng.randrange(0x10000)
+    cpu.dsp = rng.randrange(32)
+    cpu.rsp = cpu.rtop = rng.randrange(32)
+    cpu.pc = rng.randrange(2)  # The interrupt enable
+    cpu.run(len(words) if steps is None else steps)
+    # Cells above the tops were popped and are written before they're read
+    return (
+        cpu.st0, cpu.dsp, cpu.rsp,
+        [cpu.ds[(cpu.dsp - i) & 31] for i in range(24)],
+        [cpu.rs[(cpu.rtop - i) & 31] for i in range(24)],
+        cpu.pc,
+    )
+
+
+def test_default_rules(rules):
+    by_name = {rule.name: rule for rule in rules}
+    assert by_name["swap-swap"].pattern == (0x6110, 0x6110)
+    assert by_name["swap-swap"].replacement == ()
+    assert by_name["dup-tor"].replacement == (0x6024,)
+    assert by_name["dup-tor"].texts == ("T[T->R,r+1]",)
+    assert all(rule.saved > 0 for rule in rules)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_default_rules_match_on_the_emulator(rules, seed):
+    for rule in rules:
+        pattern = run_from(rule.pattern, seed)
+        replacement = run_from(rule.replacement, seed)
+        # Both fall through to the next instruction
+        assert pattern[-1] & ~1 == 2 * len(rule.pattern)
+        assert replacement[-1] & ~1 == 2 * len(rule.replacement)
+        assert pattern[:-1] == replacement[:-1], rule.name
+
+
+def test_rewrites_and_relocates(rules):
+    source = """
+: double
+    dup drop #0 + 2* ;
+: start
+    #3 swap swap double
+    'double drop
+    #1 + #$2000 io!
+    JMP 'start
+"""
+    plain = assemble(source)
+    optimized = assemble(source)
+    rewrites = optimize(optimized, rules, fold_returns=False)
+    assert sorted(rewrite.name for rewrite in rewrites) == ["add-0", "add-1", "dup-drop", "swap-swap"]
+    assert len(optimized.memory_image()) == len(plain.memory_image()) - 7
+    assert optimized.labels["start"] == plain.labels["start"] - 4
+    # CALL and 'double follow the moved label; JMP 'start at word 0 too
+    image = optimized.memory_image()
+    assert image[0] == optimized.labels["start"]
+    assert 0x4000 | optimized.labels["double"] in image.tolist()
+    assert 0x8000 | optimized.labels["double"] << 1 in image.tolist()
+    assert writes(optimized.memory_image())[:3] == writes(plain.memory_image())[:3]
+
+
+def test_patterns_never_span_labels(rules):
+    optimized = assemble("""
+: start
+    #1 swap
+: inner
+    swap #1 dup
+: gone
+    dup drop
+    JMP 'inner
+""")
+    rewrites = optimize(optimized, rules)
+    # Only the dup drop at 'gone is removed; its label moves to the JMP
+    assert [rewrite.name for rewrite in rewrites] == ["dup-drop"]
+    gone = optimized.labels["gone"]
+    assert optimized.instruction_metadata[gone].instr_text == "JMP 'inner"
+    assert optimized.instruction_metadata[gone].opt_name == "after dup-drop"
+    assert optimized.memory_image()[gone] == optimized.labels["inner"]
+
+
+def test_org_regions_stay_put(rules):
+    optimized = assemble("""
+: start
+    swap swap dup >r rdrop
+    JMP 'start
+ORG $0020
+: handler
+    #0 + ;
+""")
+    optimize(optimized, rules)
+    assert optimized.labels["handler"] == 0x20
+    assert optimized.memory_image()[0x20] == 0x608C  # ; alone
+    words = [optimized.memory_image()[addr] for addr in range(optimized.labels["start"], 0x20)]
+    assert words[:3] == [0x6024, 0x600C, optimized.labels["start"]]
+
+
+def test_rewrites_repeat_until_none_match(rules):
+    optimized = assemble("""
+: start
+    swap dup drop swap
+    r> dup drop >r rdrop
+    JMP 'start
+""")
+    rewrites = optimize(optimized, rules)
+    assert [rewrite.name for rewrite in rewrites] == [
+        "dup-drop", "swap-swap", "dup-drop", "fromr-tor",
+    ]
+    image = optimized.memory_image()
+    start = optimized.labels["start"]
+    assert image[start:start + 2].tolist() == [0x600C, start]
+    stats = format_stats(rewrites, [1] * 0x100)
+    assert "fromr-tor" in stats and stats.splitlines()[-1].split() == ["total", "4", "8", "8"]
+
+
+def test_listing_names_the_rule(tmp_path, rules):
+    source = tmp_path / "prog.asm"
+    source.write_text(HEADER + ": start\n    r> dup >r JMP 'start\n")
+    assembler = assemble_file(str(source), str(tmp_path / "prog.hex"), listing=True, optimize=True)
+    assert [rewrite.name for rewrite in assembler.rewrites] == ["fromr-dup-tor"]
+    listing = (tmp_path / "prog.lst").read_text()
+    assert "rT[T->N,d+1]" in listing and "(opt: fromr-dup-tor)" in listing
+    assert "".join(listing_lines(assembler)) in listing
+
+
+def test_returns_fold_into_alu_and_calls(rules):
+    source = """
+: equal
+    = ;
+: pop
+    rdrop ;
+: flag
+    dup #$4000 and IF drop #0 invert THEN ;
+: twice
+    equal ;
+: start
+    #5 #5 twice #$2000 io!
+    #$4004 flag #$2000 io!
+    JMP 'start
+"""
+    plain = assemble(source)
+    optimized = assemble(source)
+    rewrites = optimize(optimized, rules)
+    assert [(r.name, r.words, r.cycles) for r in rewrites] == [
+        ("ret-fold", 1, 1),  # = ;
+        ("ret-fold", 0, 1),  # invert THEN ; keeps the ; that THEN jumps to
+        ("tail-call", 1, 1),  # equal ;
+    ]
+    image = optimized.memory_image()
+    assert image[optimized.labels["equal"]] == 0x678F  # N==T[RET,r-1,d-1]
+    pop = optimized.labels["pop"]
+    assert image[pop:pop + 2].tolist() == [0x600C, 0x608C]  # rdrop ; can't fold
+    then = optimized.labels["if_false_0"]
+    assert image[then - 1:then + 1].tolist() == [0x668C, 0x608C]
+    assert image[optimized.labels["twice"]] == optimized.labels["equal"]  # JMP 'equal
+    texts = {inst.opt_name: inst.instr_text for inst in optimized.instruction_metadata.values()}
+    assert texts["ret-fold"] == "~T[RET,r-1]" and texts["tail-call"] == "JMP 'equal"
+    expected = [(0x2000, 0xFFFF)] * 4
+    assert writes(image)[:4] == writes(plain.memory_image())[:4] == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_folded_returns_match_on_the_emulator(rules, seed):
+    words = ["=", "invert", "dup", "nip", "r@", "io@", "dint", "eint"]
+    source = "".join(f": w{i}\n    {word} ;\n" for i, word in enumerate(words))
+    plain = assemble(source + ": start\n    JMP 'start\n")
+    optimized = assemble(source + ": start\n    JMP 'start\n")
+    optimize(optimized, rules)
+    for i, word in enumerate(words):
+        before = plain.labels[f"w{i}"]
+        after = optimized.labels[f"w{i}"]
+        folded = optimized.labels[f"w{i + 1}" if i + 1 < len(words) else "start"] - after
+        # dint and eint set the interrupt enable that ; takes from rst0[15]
+        assert folded == (2 if word in ("dint", "eint") else 1), word
+        expected = run_from(plain.memory_image()[before:before + 2], seed)
+        assert run_from(optimized.memory_image()[after:after + folded], seed) == expected, word
+
+
+def test_depfile_lists_the_rules(tmp_path):
+    (tmp_path / "extra.asm").write_text("macro: nop2 ( -- ) T endmacro\n")
+    rules = tmp_path / "my.rules"
+    rules.write_text('include "core/j1_base_macros.asm"\ninclude "extra.asm"\nswap-swap: swap swap =>\n')
+    source = tmp_path / "prog.asm"
+    source.write_text(HEADER + ": start\n    swap swap JMP 'start\n")
+    assemble_file(str(source), str(tmp_path / "prog.hex"), depfile=str(tmp_path / "prog.d"),
+                  optimize=True, rules=str(rules))
+    prerequisites = (tmp_path / "prog.d").read_text().split("\n\n")[0].replace("\\\n", " ").split()
+    assert str(rules) in prerequisites and str(tmp_path / "extra.asm") in prerequisites
+    assert len(prerequisites) == len(set(prerequisites))
+
+    # The default rules when -O is given without --rules, and nothing without -O
+    assemble_file(str(source), str(tmp_path / "prog.hex"), depfile=str(tmp_path / "prog.d"),
+                  optimize=True)
+    assert str(DEFAULT_RULES.resolve()) in (tmp_path / "prog.d").read_text()
+    assemble_file(str(source), str(tmp_path / "prog.hex"), depfile=str(tmp_path / "prog.d"))
+    assert ".rules" not in (tmp_path / "prog.d").read_text()
+
+
+def test_rules_reload_when_an_include_changes(tmp_path):
+    (tmp_path / "extra.asm").write_text("macro: flip ( a b -- b a ) N[T->N] endmacro\n")
+    rules = tmp_path / "my.rules"
+    rules.write_text('include "extra.asm"\nflip-flip: flip flip =>\n')
+    assert load_rules(rules)[0].pattern == (0x6110, 0x6110)
+    st = (tmp_path / "extra.asm").stat()
+    (tmp_path / "extra.asm").write_text("macro: flip ( a -- ~a ) ~T endmacro\n")
+    os.utime(tmp_path / "extra.asm", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert load_rules(rules)[0].pattern == (0x6600, 0x6600)
+
+
+@pytest.mark.parametrize("rule, message", [
+    ("grow: dup => dup dup", "fewer words"),
+    ("jump: dup JMP 'x => drop", "only use ALU"),
+])
+def test_bad_rules(tmp_path, rule, message):
+    path = tmp_path / "bad.rules"
+    path.write_text(f'include "core/j1_base_macros.asm"\n: x\n{rule}\n')
+    with pytest.raises(ValueError, match=f"bad.rules:3: .*{message}"):
+        load_rules(path)
@@ -0,0 +1,99 @@
+import random
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import J1, Board
+from j1tools.sim.profile import (
+    ProfilingJ1, annotate_listing, format_profile, listing_lines, read_symbols,
+)
+
+SOURCE = """
+ORG $0000
+JMP 'start
+include "core/j1_base_macros.asm"
+
+: inc ( n -- n+1 )
+    #1 + ;
+
+: start
+    #0
+    #9 #0 DO
+        inc
+    LOOP
+: done
+    JMP 'done
+"""
+
+
+def assembled():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(SOURCE, "prog.asm"))
+    return assembler
+
+
+def test_hits_and_subroutine_cycles():
+    assembler = assembled()
+    cpu = ProfilingJ1(assembler.memory_image())
+    cpu.run(300)
+    labels = assembler.labels
+    assert sum(cpu.hits) == 300
+    assert cpu.hits[labels["inc"]] == 10
+    routines = {r.name: r for r in cpu.profile(labels)}
+    # CALL, #1, +, RET
+    assert (routines["inc"].calls, routines["inc"].inclusive, routines["inc"].exclusive) == (10, 40, 30)
+    assert routines["done"].exclusive == cpu.hits[labels["done"]] > 100
+    assert cpu.data_stack() == [10]
+
+
+def test_counts_on_a_board_with_a_timer():
+    # The ISR reloads ticks every 1024 cycles and returns from the io!
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse("""
+ORG $0000
+JMP 'start
+JMP 'irq
+include "core/j1_base_macros.asm"
+: irq
+    #1 +
+    #$03FF invert #$4000 3OS[N->io[T],RET,r-1,d-2]
+: start
+    #0
+    #$03FF invert #$4000 io!
+    eint
+: idle
+    JMP 'idle
+""", "timer.asm"))
+    board = Board(assembler.memory_image(), engine=ProfilingJ1)
+    cpu = board.cpu
+    start = cpu.cycles
+    board.run(200000)
+    assert sum(cpu.hits) == cpu.cycles - start == 200000
+    assert cpu.calls[1] == cpu.st0 == 193
+    # IRQ, JMP 'irq and the six words of irq, for every call
+    assert len(cpu._frames) <= 1
+    assert cpu.inclusive[1] == 8 * 193
+
+
+def test_profiling_does_not_change_execution():
+    rng = random.Random(18)
+    image = [rng.randrange(0x10000) for _ in range(4096)]
+    plain, profiled = J1(image), ProfilingJ1(image)
+    for steps in (1, 10, 1000, 5000):
+        plain.run(steps)
+        profiled.run(steps)
+        assert (plain.pc, plain.st0, plain.dsp, plain.rsp, plain.ds, plain.rs, plain.mem) == (
+            profiled.pc, profiled.st0, profiled.dsp, profiled.rsp, profiled.ds, profiled.rs, profiled.mem
+        )
+
+
+def test_annotated_listing_and_report(tmp_path):
+    assembler = assembled()
+    cpu = ProfilingJ1(assembler.memory_image())
+    cpu.run(300)
+    lines = annotate_listing(listing_lines(assembler), cpu.hits).splitlines()
+    inc = next(line for line in lines if "#1 " in line)
+    assert inc.split()[:2] == ["10", "3.33"]
+    assert all(line.startswith(" " * 21) for line in lines if ":inc" in line)
+
+    (tmp_path / "prog.sym").write_text("0001 inc\n0004 start\n")
+    report = format_profile(cpu.profile(read_symbols(tmp_path / "prog.sym")), sum(cpu.hits))
+    assert report.splitlines()[0].split()[:3] == ["CALLS", "EXCLUSIVE", "%"]
+    assert "inc" in report and "start" in report
@@ -0,0 +1,94 @@
+import time
+import pytest
+from pathlib import Path
+from j1tools.utils import rebuild_make
+from j1tools.utils.rebuild_make import (
+    FingerprintStore,
+    RebuildResult,
+    directory_fingerprint,
+    rebuild_all,
+    source_dependencies,
+)
+from j1tools.assembler.config import AssemblerConfig
+
+
+@pytest.fixture
+def project(tmp_path):
+    """A program directory that includes a local library and the stdlib."""
+    prog = tmp_path / "prog"
+    prog.mkdir()
+    (prog / "Makefile").write_text("all:\n\ttrue\n")
+    (prog / "prog.asm").write_text(
+        '// include "commented.asm"\n'
+        'include "lib.asm"\n'
+        'include "core/j1_base_macros.asm"\n'
+        "T\n"
+    )
+    (prog / "lib.asm").write_text('include "inner.asm"\n')
+    (prog / "inner.asm").write_text("N\n")
+    return prog
+
+
+def test_source_dependencies_are_transitive(project):
+    deps = source_dependencies(project / "prog.asm", AssemblerConfig())
+    names = {p.name for p in deps}
+    assert {"prog.asm", "lib.asm", "inner.asm", "j1_base_macros.asm"} <= names
+    assert "commented.asm" not in names
+
+
+def test_fingerprint_follows_includes(project):
+    before = directory_fingerprint(project)
+    assert directory_fingerprint(project) == before
+
+    (project / "inner.asm").write_text("T\n")
+    assert directory_fingerprint(project) != before
+
+
+def test_fingerprint_covers_toolchain(project, monkeypatch):
+    before = directory_fingerprint(project)
+    monkeypatch.setattr(rebuild_make, "toolchain_hash", lambda: "changed grammar")
+    assert directory_fingerprint(project) != before
+
+
+def test_directory_without_sources_is_never_current(tmp_path):
+    (tmp_path / "Makefile").write_text("all:\n")
+    store = FingerprintStore(tmp_path / "store.json")
+    assert directory_fingerprint(tmp_path) is None
+    assert not store.is_current(tmp_path, None)
+
+
+def test_store_round_trip_and_deleted_outputs(project, tmp_path):
+    store = FingerprintStore(tmp_path / "store.json")
+    fingerprint = directory_fingerprint(project)
+    (project / "prog.hex").write_text("0000\n")
+    store.update(project, fingerprint)
+    store.save()
+
+    reloaded = FingerprintStore(tmp_path / "store.json")
+    assert reloaded.is_current(project, fingerprint)
+
+    # Removing an output (e.g. make cleanall) makes the directory stale
+    (project / "prog.hex").unlink()
+    assert not reloaded.is_current(project, fingerprint)
+
+
+def test_corrupt_store_is_ignored(tmp_path):
+    (tmp_path / "store.json").write_text("{not json")
+    assert FingerprintStore(tmp_path / "store.json").entries == {}
+
+
+def test_parallel_results_reported_in_order(tmp_path, monkeypatch, capsys):
+    dirs = [tmp_path / name for name in ("a", "b", "c")]
+    delays = {"a": 0.2, "b": 0.0, "c": 0.1}
+
+    def fake_rebuild(dir_path, verbose=False, capture=True):
+        time.sleep(delays[dir_path.name])
+        return RebuildResult(dir_path, dir_path.name != "b", elapsed=0.0)
+
+    monkeypatch.setattr(rebuild_make, "rebuild_directory", fake_rebuild)
+    results = rebuild_all(dirs, jobs=3, base_dir=tmp_path)
+
+    assert [r.dir_path for r in results] == dirs
+    assert [r.success for r in results] == [True, False, True]
+    lines = [line for line in capsys.readouterr().out.splitlines() if " - " in line]
+    assert [line.split(" - ")[1].split()[0] for line in lines] == ["a", "b", "c"]
@@ -0,0 +1,285 @@
+import random
+import pytest
+from array import array
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import BlockJ1, J1, reference_step
+from j1tools.sim.cpu import alu_source
+
+
+class RecordingIO:
+    def __init__(self):
+        self.log = []
+
+    def din(self, addr):
+        self.log.append(("din", addr))
+        return (addr * 7 + 3) & 0xFFFF
+
+    def rd(self, addr):
+        self.log.append(("rd", addr))
+
+    def wr(self, addr, value):
+        self.log.append(("wr", addr, value))
+
+
+def state(cpu):
+    return (
+        cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, list(cpu.ds), list(cpu.rs),
+        cpu.mem.tobytes(), cpu.cycles, cpu.io.log,
+    )
+
+
+def assemble(source):
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(source, "prog.asm"))
+    return assembler.memory_image()
+
+
+def test_every_opcode_matches_reference_model():
+    """The dispatch table agrees with the bit-level model for all 65536 opcodes."""
+    rng = random.Random(14)
+    memory = array("H", (rng.randrange(0x10000) for _ in range(4096)))
+    fast, reference = J1(), J1()
+    for insn in range(0x10000):
+        pc = rng.randrange(0x10000)
+        write_cycle = 99 if rng.random() < 0.3 else -2
+        for cpu in (fast, reference):
+            values = random.Random(insn)
+            cpu.mem = array("H", memory)
+            cpu.mem[(pc >> 1) & cpu.mask] = insn
+            cpu.pc = pc
+            cpu.st0 = values.choice([0, 1, 15, 16, 0x8000, 0xFFFF, values.randrange(0x10000)])
+            cpu.dsp, cpu.rsp, cpu.rtop = (values.randrange(32) for _ in range(3))
+            cpu.ds = [values.randrange(0x10000) for _ in range(32)]
+            cpu.rs = [values.randrange(0x10000) for _ in range(32)]
+            cpu.cycles = 100
+            cpu.write_cycle = write_cycle
+            cpu.write_value = 0x1234
+            cpu.io = RecordingIO()
+        fast.step()
+        reference_step(reference)
+        assert state(fast) == state(reference), f"{insn:#06x}\n{alu_source(insn)}"
+
+
+def test_boot_cycle_runs_stack_effects_of_word_zero():
+    # The RTL holds the PC at 0 for the first cycle after reset but still
+    # applies the data stack effects of the word there
+    cpu = J1([0x8005, 0x0001])
+    assert (cpu.pc, cpu.cycles, cpu.data_stack()) == (0, 1, [5])
+    cpu.step()
+    assert cpu.data_stack() == [5, 5]
+
+
+def test_runs_assembled_program():
+    image = assemble(
+        """
+        ORG $0000
+        JMP 'start
+        include "core/j1_base_macros.asm"
+
+        : start
+            #0
+            #9 #0 DO        // 0 to 9 inclusive
+                i +
+            LOOP
+        : done
+            JMP 'done
+        """
+    )
+    cpu = J1(image)
+    cpu.run(500)
+    assert cpu.data_stack() == [45]
+    assert cpu.return_stack() == []
+    assert cpu.word_pc == len(image) - 1
+    assert cpu.cycles == 501
+
+
+def test_stacks_are_shift_registers():
+    # 33 pushes lose the first value; popping past empty shifts in 55AA
+    cpu = J1([0x8000 | n for n in range(1, 34)] + [0x6103] * 40)
+    cpu.run(33)
+    assert cpu.dsp == 2 and cpu.st0 == 33
+    cpu.run(40)
+    assert cpu.ds[cpu.dsp] == 0x55AA and cpu.st0 == 0x55AA
+
+
+def test_fetch_after_store_sees_stored_value():
+    # #$1234 #$40 N->[T] then mem[T] at once, and again a cycle later
+    cpu = J1([0x0001, 0x9234, 0x8040, 0x6030, 0x7900, 0x7900])
+    cpu.mem[0x20] = 0x5555
+    cpu.run(4)
+    assert cpu.mem[0x20] == 0x1234
+    cpu.mem[0x20] = 0x4321  # not visible until the port is read again
+    cpu.step()
+    assert cpu.st0 == 0x1234
+    cpu.st0 = 0x40
+    cpu.step()
+    assert cpu.st0 == 0x4321
+
+
+def test_interrupt_enters_and_returns():
+    # 0: JMP 3 / 1: RET, reenabling interrupts via bit 15 of the return address
+    # 3: eint / 4: JMP 4
+    cpu = J1([0x0003, 0x608C, 0, 0x6070, 0x0004])
+    cpu.run(3)
+    assert cpu.pc == (4 << 1) | 1
+    cpu.interrupt_request = True
+    cpu.run(1)
+    assert cpu.pc == 2 and cpu.return_stack() == [0x8009]
+    cpu.interrupt_request = False
+    cpu.run(1)
+    assert cpu.pc == (4 << 1) | 1 and cpu.return_stack() == []
+
+
+def test_io_strobes():
+    io = RecordingIO()
+    # #$1000 io@ / #$41 #$1000 io!
+    cpu = J1([0x9000, 0x6D50, 0x8041, 0x9000, 0x7843], io=io)
+    cpu.run(5)
+    assert io.log == [("din", 0x1000), ("rd", 0x1000), ("wr", 0x1000, 0x41)]
+
+
+def test_image_must_fit():
+    with pytest.raises(ValueError, match="does not fit"):
+        J1([0] * 4097)
+    with pytest.raises(ValueError, match="power of two"):
+        J1(memwords=3000)
+
+
+def random_program(rng, words=4096):
+    """Memory soup biased towards ALU ops, literals and short branches."""
+    program = []
+    for _ in range(words):
+        kind = rng.random()
+        if kind < 0.45:
+            insn = 0x6000 | rng.randrange(0x2000)
+        elif kind < 0.7:
+            insn = 0x8000 | rng.randrange(0x8000)
+        else:
+            insn = rng.choice([0x0000, 0x2000, 0x4000]) | rng.randrange(64)
+        program.append(insn)
+    return program
+
+
+def test_blocks_match_dispatch_table():
+    """BlockJ1 reaches the same state as J1 at every chunk boundary."""
+    for seed in range(6):
+        rng = random.Random(seed)
+        image = random_program(rng)
+        plain, blocks = J1(image, io=RecordingIO()), BlockJ1(image, io=RecordingIO())
+        for _ in range(300):
+            steps = rng.choice([1, 2, 3, 7, 50, 400])
+            request = rng.random() < 0.05
+            plain.interrupt_request = blocks.interrupt_request = request
+            plain.run(steps)
+            blocks.run(steps)
+            assert state(blocks) == state(plain), seed
+
+
+def test_blocks_run_assembled_program():
+    image = assemble(
+        """
+        ORG $0000
+        JMP 'start
+        include "core/j1_base_macros.asm"
+
+        : start
+            #0
+            #9 #0 DO
+                i +
+            LOOP
+        : done
+            JMP 'done
+        """
+    )
+    cpu = BlockJ1(image)
+    cpu.run(500)
+    assert cpu.data_stack() == [45] and cpu.cycles == 501
+    assert cpu.word_pc == len(image) - 1
+
+
+def test_store_into_code_drops_block():
+    # 0: JMP 1 / 1: #$7FF8 invert #$A N->[T] (word 5 becomes #7) / 5: #1 / 6: JMP 6
+    image = [0x0001, 0xFFF8, 0x6600, 0x800A, 0x6133, 0x8001, 0x0006]
+    cpu, plain = BlockJ1(image, io=RecordingIO()), J1(image, io=RecordingIO())
+    cpu.run(20)
+    plain.run(20)
+    assert state(cpu) == state(plain)
+    assert cpu.data_stack() == [0x8007, 7]
+
+
+def test_blocks_stop_for_device_interrupt():
+    class Ticker(RecordingIO):
+        def wr(self, addr, value):
+            super().wr(addr, value)
+            cpu.interrupt_request = True
+
+    # 0: JMP 3 / 1: RET / 3: eint #1 #$4000 io! / 6: #9 / 7: JMP 7
+    cpu = BlockJ1([0x0003, 0x608C, 0, 0x6070, 0x8001, 0xC000, 0x6143, 0x8009, 0x0007], io=Ticker())
+    # The block from word 3 ends after io!, so the interrupt is taken (and
+    # returns) before #9
+    cpu.run(7)
+    assert cpu.pc == (7 << 1) | 1 and cpu.data_stack() == [1]
+
+
+class VectorRecordingIO:
+    """RecordingIO for every instance of a VectorJ1."""
+
+    def __init__(self, instances):
+        self.ios = [RecordingIO() for _ in range(instances)]
+
+    def din(self, instances, addrs):
+        return [self.ios[i].din(int(addr)) for i, addr in zip(instances, addrs)]
+
+    def rd(self, instances, addrs):
+        for i, addr in zip(instances, addrs):
+            self.ios[i].rd(int(addr))
+
+    def wr(self, instances, addrs, values):
+        for i, addr, value in zip(instances, addrs, values):
+            self.ios[i].wr(int(addr), int(value))
+
+
+def test_vector_instances_match_scalar_emulator():
+    np = pytest.importorskip("numpy")
+    from j1tools.sim.vector import VectorJ1
+
+    rng = random.Random(16)
+    image = random_program(rng, 512)
+    vector = VectorJ1(image, instances=64, memwords=512, io=VectorRecordingIO(64))
+    for _ in range(3):
+        vector.push(np.array([rng.randrange(0x10000) for _ in range(64)]))
+    scalars = [vector.instance(i) for i in range(64)]
+    for i, cpu in enumerate(scalars):
+        cpu.io = vector.io.ios[i]
+    for _ in range(20):
+        steps = rng.choice([1, 5, 40])
+        vector.run(steps)
+        for i, cpu in enumerate(scalars):
+            cpu.run(steps)
+            copy = vector.instance(i)
+            copy.io = cpu.io
+            assert state(copy) == state(cpu), i
+
+
+def test_vector_runs_each_input():
+    np = pytest.importorskip("numpy")
+    from j1tools.sim.vector import VectorJ1
+
+    image = assemble(
+        """
+        ORG $0000
+        JMP 'start
+        include "core/j1_base_macros.asm"
+
+        : start     ( n -- n*3 or n/2 )
+            dup #1 and IF dup 2* + ELSE 2/ THEN
+        : done
+            JMP 'done
+        """
+    )
+    vector = VectorJ1(image, instances=100)
+    vector.push(np.arange(100))
+    vector.run(30)
+    assert [vector.data_stack(i) for i in range(100)] == [
+        [n * 3 if n & 1 else n // 2] for n in range(100)
+    ]
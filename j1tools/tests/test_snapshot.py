@@ -0,0 +1,63 @@
+import random
+import struct
+from pathlib import Path
+import pytest
+from j1tools.sim import BlockJ1, Board, J1
+from j1tools.sim.snapshot import load, save
+
+MECRISP = Path(__file__).parents[2] / "firmware" / "mecrisp-ice-forth" / "mecrisp-ice-forth.hex"
+
+
+def state(cpu):
+    return (cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, list(cpu.ds), list(cpu.rs),
+            cpu.mem.tobytes(), cpu.cycles, cpu.write_cycle, cpu.write_value)
+
+
+@pytest.mark.parametrize("engine", [J1, BlockJ1])
+def test_cpu_round_trip(tmp_path, engine):
+    rng = random.Random(20)
+    image = [rng.randrange(0x10000) for _ in range(4096)]
+    cpu = J1(image)
+    cpu.run(3000)
+    path = tmp_path / "soup.j1s"
+    save(cpu, path, image)
+    restored = load(path, image, engine=engine)
+    assert type(restored) is engine
+    saved = state(cpu)
+    assert state(restored) == saved
+    cpu.run(3000)
+    restored.run(3000)
+    assert state(restored) == state(cpu)
+    # Memory is a private mapping: the file keeps the saved state
+    assert state(load(path)) == saved
+    # Board options only apply to Board snapshots
+    with pytest.raises(TypeError, match="quantum"):
+        load(path, quantum=64)
+
+
+def test_forth_warm_start(tmp_path):
+    board = Board.from_file(MECRISP)
+    board.run(150_000)
+    assert b"Mecrisp-Ice" in board.uart.take_tx()
+    path = tmp_path / "forth.j1s"
+    save(board, path, MECRISP)
+    warm = load(path, MECRISP, engine=BlockJ1)
+    assert isinstance(warm, Board) and warm.cpu.cycles == board.cpu.cycles
+    warm.uart.receive(b"6 7 * .\n")
+    warm.run(500_000)
+    assert warm.uart.take_tx() == b"6 7 * . 42  ok.\n"
+
+
+def test_rejects_other_images_and_versions(tmp_path):
+    path = tmp_path / "snap.j1s"
+    save(J1([0x0000]), path, [0x0000])
+    with pytest.raises(ValueError, match="different image"):
+        load(path, [0x0001])
+    data = bytearray(path.read_bytes())
+    data[6:8] = struct.pack("<H", 99)
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match="version 99"):
+        load(path)
+    path.write_bytes(b"not a snapshot, just text")
+    with pytest.raises(ValueError, match="not a J1 snapshot"):
+        load(path)
@@ -0,0 +1,95 @@
+import random
+import pytest
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import Board, J1
+from j1tools.sim.timetravel import TimeTravel
+
+
+def state(cpu):
+    return (cpu.pc, cpu.st0, cpu.dsp, cpu.rsp, cpu.rtop, list(cpu.ds), list(cpu.rs),
+            cpu.mem.tobytes(), cpu.cycles)
+
+
+def soup(seed):
+    rng = random.Random(seed)
+    return [rng.randrange(0x10000) for _ in range(4096)]
+
+
+def run_fresh(image, cycles):
+    cpu = J1(image)
+    cpu.run(cycles - cpu.cycles)
+    return cpu
+
+
+def test_goto_matches_straight_run():
+    image = soup(19)
+    tt = TimeTravel(J1(image), interval=500)
+    tt.run(5000)
+    for cycle in (4999, 3000, 1, 2500, 5000, 4321):
+        tt.goto(cycle)
+        assert state(tt.cpu) == state(run_fresh(image, cycle)), cycle
+
+
+def test_step_back_and_run_back_to():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(
+        """
+        ORG $0000
+        JMP 'start
+        include "core/j1_base_macros.asm"
+        : inc #1 + ;
+        : start
+            #0 #9 #0 DO inc LOOP
+        : done
+            JMP 'done
+        """, "prog.asm"))
+    image = assembler.memory_image()
+    tt = TimeTravel(J1(image), interval=64)
+    tt.goto(401)
+    tt.step_back()
+    assert tt.cycles == 400
+    assert state(tt.cpu) == state(run_fresh(image, 400))
+    inc = assembler.labels["inc"]
+    cycle = tt.run_back_to(inc)
+    assert tt.cpu.cycles == cycle and tt.cpu.word_pc == inc
+    # The tenth and last call: nine have returned
+    assert tt.cpu.st0 == 9
+    assert tt.run_back_to(0x7FF) is None and tt.cpu.cycles == cycle
+
+
+def test_checkpoints_share_unchanged_pages():
+    tt = TimeTravel(J1([0x0000]), interval=10, max_checkpoints=5)
+    tt.run(100)
+    assert len(tt.checkpoints) == 5
+    first, last = tt.checkpoints[0], tt.checkpoints[-1]
+    assert all(a is b for a, b in zip(first.pages, last.pages))
+    with pytest.raises(ValueError, match="before the oldest checkpoint"):
+        tt.goto(5)
+
+
+def test_board_input_is_replayed():
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(
+        """
+        ORG $0000
+        JMP 'start
+        include "core/j1_base_macros.asm"
+        include "io/terminal_io.asm"
+        : start
+            key #1 + emit
+            JMP 'start
+        """, "prog.asm"))
+    board = Board(assembler.memory_image())
+    tt = TimeTravel(board, interval=100)
+    tt.run(250)
+    tt.send(b"ab")
+    tt.run(500)
+    assert board.uart.take_tx() == b"bc"
+    tt.goto(200)
+    tt.run(550)
+    assert board.uart.take_tx() == b"bc"
+    # New input after going back replaces the old future
+    tt.goto(100)
+    tt.send(b"x")
+    tt.run(400)
+    assert board.uart.take_tx() == b"y"
@@ -0,0 +1,65 @@
+import random
+import pytest
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import Board, J1
+from j1tools.sim.devices import UART_DATA, UART_STATUS
+from j1tools.sim.trace import DIN, RD, WR, IOEvent, TraceReader, TraceWriter, trace
+
+
+def test_windows_match_stepping(tmp_path):
+    rng = random.Random(21)
+    image = [rng.randrange(0x10000) for _ in range(4096)]
+    expected = []
+    cpu = J1(image)
+    for _ in range(5000):
+        expected.append((cpu.cycles, cpu.pc, cpu.st0, cpu.dsp, cpu.rsp))
+        cpu.step()
+    path = tmp_path / "soup.j1t"
+    with TraceWriter(path, chunk_steps=300) as writer:
+        trace(J1(image), 5000, writer)
+    with TraceReader(path) as reader:
+        assert len(reader) == 5000 and reader.first_cycle == 1
+        assert list(reader.window(0, 10_000)) == expected
+        for start, stop in ((1, 2), (299, 902), (4700, 5001), (2500, 2500)):
+            assert list(reader.window(start, stop)) == expected[start - 1 : stop - 1]
+        assert reader[4321] == expected[4320]
+        with pytest.raises(IndexError):
+            reader[5001]
+
+
+def test_io_events(tmp_path):
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(
+        """
+        ORG $0000
+        JMP 'start
+        include "core/j1_base_macros.asm"
+        include "io/terminal_io.asm"
+        : start
+            key #1 + emit
+            JMP 'start
+        """, "prog.asm"))
+    board = Board(assembler.memory_image())
+    board.uart.receive(b"A")
+    path = tmp_path / "echo.j1t"
+    with TraceWriter(path, chunk_steps=64) as writer:
+        trace(board, 400, writer)
+    assert board.uart.take_tx() == b"B"
+    with TraceReader(path) as reader:
+        events = list(reader.io_events(0, 400))
+    data = [(e.kind, e.value) for e in events if e.addr == UART_DATA]
+    assert data == [(DIN, 0x41), (RD, 0), (WR, 0x42)]
+    assert any(e.addr == UART_STATUS for e in events)
+    assert all(isinstance(e, IOEvent) and 0 < e.cycle < 401 for e in events)
+
+
+def test_rejects_gaps_and_other_files(tmp_path):
+    path = tmp_path / "gap.j1t"
+    with TraceWriter(path) as writer:
+        writer.record(10, 0, 0, 0, 0)
+        with pytest.raises(ValueError, match="Expected cycle 11"):
+            writer.record(12, 0, 0, 0, 0)
+    other = tmp_path / "other.j1t"
+    other.write_bytes(b"something else entirely")
+    with pytest.raises(ValueError, match="not a J1 trace"):
+        TraceReader(other)
@@ -0,0 +1,109 @@
+import random
+import pytest
+from j1tools.assembler.asm import J1Assembler
+from j1tools.sim import J1
+from j1tools.vcd import VCDFile, mnemonic, samples
+from j1tools.vcd.reader import main
+
+HEADER = """$date today $end
+$timescale 1ps $end
+$scope module j1_tb $end
+$var reg 1 ! clk $end
+$var wire 16 " io_addr [15:0] $end
+$var wire 1 # io_wr $end
+$var reg 16 $ noise [15:0] $end
+$scope module uut $end
+$var wire 16 " io_addr [15:0] $end
+$var reg 16 % pc [15:0] $end
+$var wire 16 & insn [15:0] $end
+$var reg 16 ' st0 [15:0] $end
+$var reg 5 ( dsp [4:0] $end
+$var reg 5 ) rsp [4:0] $end
+$upscope $end
+$upscope $end
+$enddefinitions $end
+"""
+
+
+def write_vcd(path, image, cycles):
+    """Dump a run of the emulator the way a simulator would; return the states."""
+    cpu = J1(image)
+    states = []
+    lines = [HEADER, "#0\n$dumpvars\n0!\nbx \"\n0#\nb0 $\n$end\n"]
+    previous = {}
+    for k in range(cycles):
+        insn = cpu.mem[cpu.word_pc]
+        state = {"%": cpu.pc, "&": insn, "'": cpu.st0, "(": cpu.dsp, ")": cpu.rsp,
+                 '"': cpu.st0, "#": int(insn & 0xE070 == 0x6040)}
+        states.append(state)
+        lines.append(f"#{10 * k + 1}\n")
+        for code, value in state.items():
+            if previous.get(code) != value:
+                lines.append(f"{value}{code}\n" if code == "#" else f"b{value:b} {code}\n")
+        previous = state
+        lines.append(f"#{10 * k + 5}\n1!\nb{k:b} $\n#{10 * k + 10}\n0!\n")
+        cpu.step()
+    path.write_text("".join(lines))
+    return states
+
+
+def soup():
+    rng = random.Random(22)
+    return [rng.randrange(0x10000) for _ in range(4096)]
+
+
+def test_samples_follow_the_run(tmp_path):
+    path = tmp_path / "soup.vcd"
+    states = write_vcd(path, soup(), 500)
+    vcd = VCDFile(path, chunk_size=1000)
+    assert vcd.timescale == "1ps"
+    assert vcd.find("io_addr").path == "j1_tb.io_addr"
+    timelines = vcd.read()
+    assert len(vcd.index_offsets) > 10
+    got = list(samples(timelines))
+    assert len(got) == 500
+    for sample, state in zip(got, states):
+        assert (sample.pc, sample.insn, sample.st0, sample.dsp, sample.rsp, sample.io_wr) == (
+            state["%"], state["&"], state["'"], state["("], state[")"], state["#"]
+        )
+    assert timelines["io_addr"].at(0) == 0  # bx
+    assert timelines["st0"].before(2505) == states[250]["'"]
+
+
+def test_changes_seek_with_the_index(tmp_path):
+    path = tmp_path / "soup.vcd"
+    write_vcd(path, soup(), 300)
+    vcd = VCDFile(path, chunk_size=512)
+    everything = list(vcd.changes(0, 10**9, ["noise", "pc"]))
+    vcd.read(["pc"])
+    assert list(vcd.changes(1201, 2001, ["noise", "pc"])) == [
+        c for c in everything if 1201 <= c[0] < 2001
+    ]
+    assert ("noise" in {name for _, name, _ in everything}) and everything[0][0] == 0
+
+
+@pytest.mark.parametrize("text", [
+    "T[T->N,d+1]", "N[T->R,r+1,d-1]", "rT[T->N,r-1,d+1]", "T[RET,r-1]",
+    "3OS[N->io[T],d-2]", "io[T][IORD]", "mem[T]", "T+N[d-1]", "L-UM*[fEINT]",
+])
+def test_mnemonic_reassembles(text):
+    assembler = J1Assembler()
+    assembler.transform(assembler.parse(f"ORG $0000\n{text}\n", "prog.asm"))
+    assert mnemonic(assembler.memory_image()[0]) == text
+
+
+def test_mnemonic_literals_and_jumps():
+    assert mnemonic(0x9234) == "#$1234"
+    assert mnemonic(0x0010) == "JMP $0010"
+    assert mnemonic(0x2010) == "ZJMP $0010"
+    assert mnemonic(0x5FFF) == "CALL $1FFF"
+
+
+def test_main_lists_instructions(tmp_path, capsys):
+    path = tmp_path / "soup.vcd"
+    states = write_vcd(path, soup(), 20)
+    main([str(path), "--start", "50", "--stop", "100"])
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[0].split()[:4] == ["TIME", "PC", "INSN", "MNEMONIC"]
+    assert len(rows) == 6
+    assert mnemonic(states[5]["&"]) in rows[1]
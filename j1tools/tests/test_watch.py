@@ -0,0 +1,146 @@
+import os
+import pytest
+from pathlib import Path
+from j1tools.assembler.watch import (
+    AssemblyDaemon,
+    InotifyWatcher,
+    PollingWatcher,
+    create_watcher,
+)
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "words.asm").write_text(": word T T[RET,r-1]\n")
+    (tmp_path / "main.asm").write_text('include "words.asm"\nCALL \'word\n')
+    return tmp_path
+
+
+def touch(path, text):
+    """Rewrite a file and make sure its mtime moves even on coarse clocks."""
+    st = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def hex_words(path):
+    return [line.strip() for line in path.read_text().splitlines() if line.strip()]
+
+
+def test_daemon_build_tracks_includes(project):
+    daemon = AssemblyDaemon(
+        str(project / "main.asm"), str(project / "main.hex"), symbols=True, listing=True
+    )
+    assert daemon.build()
+    assert {p.name for p in daemon.files} == {"main.asm", "words.asm"}
+    assert (project / "main.sym").exists()
+    assert (project / "main.lst").exists()
+
+
+def test_daemon_rebuilds_changed_include(project):
+    daemon = AssemblyDaemon(str(project / "main.asm"), str(project / "main.hex"))
+    daemon.build()
+    assert "6000" in hex_words(project / "main.hex")
+
+    (project / "words.asm").write_text(": word N T[RET,r-1]\n")
+    assert daemon.build()
+    words = hex_words(project / "main.hex")
+    assert "6100" in words
+    assert "6000" not in words
+
+
+def test_daemon_survives_errors(project):
+    daemon = AssemblyDaemon(str(project / "main.asm"), str(project / "main.hex"))
+    daemon.build()
+    files = set(daemon.files)
+
+    (project / "words.asm").write_text(": word ]]] \n")
+    assert not daemon.build()
+    assert daemon.files == files
+
+    (project / "words.asm").write_text(": word T T[RET,r-1]\n")
+    assert daemon.build()
+
+
+@pytest.mark.parametrize("watcher_class", [PollingWatcher, InotifyWatcher])
+def test_watcher_reports_changes(project, watcher_class):
+    try:
+        watcher = watcher_class(interval=0.01)
+    except OSError:
+        pytest.skip("inotify not available")
+    try:
+        watcher.watch([project / "main.asm", project / "words.asm"])
+        assert watcher.wait(timeout=0.05) == set()
+
+        touch(project / "words.asm", ": word N T[RET,r-1]\n")
+        changed = watcher.wait(timeout=2)
+        assert {p.name for p in changed} == {"words.asm"}
+    finally:
+        watcher.close()
+
+
+def test_run_rebuilds_until_interrupted(project):
+    class ScriptedWatcher(PollingWatcher):
+        """Reports one change to words.asm, then stops the daemon."""
+
+        def __init__(self):
+            super().__init__()
+            self.waits = 0
+
+        def wait(self, timeout=None):
+            self.waits += 1
+            if self.waits == 1:
+                (project / "words.asm").write_text(": word N T[RET,r-1]\n")
+                return {project / "words.asm"}
+            raise KeyboardInterrupt
+
+    daemon = AssemblyDaemon(str(project / "main.asm"), str(project / "main.hex"))
+    daemon.run(watcher=ScriptedWatcher())
+    assert "6100" in hex_words(project / "main.hex")
+
+
+def test_edit_during_build_triggers_rebuild(project, monkeypatch):
+    from j1tools.assembler import watch
+
+    builds = []
+
+    def build_and_edit(*args, **kwargs):
+        assembler = assemble_file(*args, **kwargs)
+        builds.append(assembler)
+        if len(builds) == 1:
+            # Saved after the build read words.asm, before it finished
+            touch(project / "words.asm", ": word N T[RET,r-1]\n")
+        return assembler
+
+    class OnceWatcher(PollingWatcher):
+        def wait(self, timeout=None):
+            changed = self.changed()
+            if not changed:
+                raise KeyboardInterrupt
+            return changed
+
+    assemble_file = watch.assemble_file
+    monkeypatch.setattr(watch, "assemble_file", build_and_edit)
+    daemon = AssemblyDaemon(str(project / "main.asm"), str(project / "main.hex"))
+    daemon.run(watcher=OnceWatcher())
+    assert len(builds) == 2
+    assert "6100" in hex_words(project / "main.hex")
+
+
+def test_daemon_watches_the_rules_under_optimize(project):
+    rules = project / "my.rules"
+    rules.write_text('include "core/j1_base_macros.asm"\nswap-swap: swap swap =>\n')
+    daemon = AssemblyDaemon(
+        str(project / "main.asm"), str(project / "main.hex"), optimize=True, rules=str(rules)
+    )
+    assert daemon.build()
+    names = {p.name for p in daemon.files}
+    assert {"main.asm", "words.asm", "my.rules", "j1_base_macros.asm"} <= names
+
+
+def test_create_watcher_falls_back_to_polling(monkeypatch):
+    def unavailable(self, interval=0.25):
+        raise OSError("no inotify")
+
+    monkeypatch.setattr(InotifyWatcher, "__init__", unavailable)
+    assert type(create_watcher(0.1)) is PollingWatcher